@@ -1,17 +1,20 @@
 import re
-from storage_github import gh_list_csv, gh_upload_bytes
 import streamlit as st
 import pandas as pd
 import os
-import glob
-import matplotlib.pyplot as plt
+import tempfile
+from datetime import date
+from typing import Callable
 
-# Eigene Module
-from constants import STATIONEN, DATENORDNER
-from data_utils import lade_daten, speichere_daten
-from pdf_utils import create_pdf
-from plot_utils import plot_balken, plot_verlauf
-from summary_utils import create_summary_pdf
+# Eigene Module (PDF, Diagramme, Bilder und Export werden erst im jeweiligen Zweig importiert,
+# damit der erste Seitenaufbau nicht auf matplotlib/fpdf/Pillow wartet)
+from constants import STATIONEN
+from data_utils import lade_daten, lade_klasse, speichere_bild, speichere_daten
+from namensraum_utils import (ALTBESTAND, Namensraum, aktuelles_schuljahr, archiviere, eintraege as namensraum_eintraege,
+                              lege_an, namensraum, sitzungen)
+from save_queue import get_queue, write_behind_enabled
+from storage_backend import get_backend, git_blob_sha, storage_cfg
+from storage_metrics import METRICS
 
 
 def safe_component(s: str) -> str:
@@ -23,13 +26,40 @@ def safe_component(s: str) -> str:
     # nur erlaubte Zeichen
     return re.sub(r'[^A-Za-z0-9_\-\.]', "_", s)
 
-def make_zielname(gruppen_id: str, stationsname: str) -> str | None:
-    """Gibt den Dateinamen für GitHub zurück oder None, wenn keine Gruppen-ID vorhanden ist."""
+def make_zielname(gruppen_id: str, stationsname: str, ns: Namensraum = ALTBESTAND) -> str | None:
+    """
+    Gibt den Dateinamen für GitHub im Verzeichnis der Sitzung ns zurück (Altbestand: direkt im
+    Datenordner) oder None, wenn keine Gruppen-ID vorhanden ist.
+    """
     if not gruppen_id:
         return None
     gid = safe_component(gruppen_id)
     stn = safe_component(stationsname)
-    return f"{gid}_{stn}.csv"
+    return f"{ns.praefix}{gid}_{stn}.csv"
+
+def speicher_meldung(status: str, zielname: str) -> str:
+    if status == "unchanged":
+        return f"Keine Änderungen – {zielname} ist bereits gespeichert."
+    if status == "pending" or get_backend().name == "sqlite":
+        return f"Ergebnisse gespeichert: {zielname} – wird im Hintergrund mit GitHub synchronisiert."
+    return f"Ergebnisse gespeichert in GitHub: {zielname}"
+
+def beim_klick(archiv) -> Callable[[], bytes]:
+    """
+    Download-Daten eines Spool-Archivs, gelesen erst beim Klick auf den Button. Streamlit liefert
+    Downloads immer als Ganzes aus dem Speicher aus, gestreamt wird nicht – bis zum Klick liegt
+    das ZIP aber nur im Spool (ab 32 MB auf der Platte) statt zusätzlich als Kopie im Speicher der
+    Session. Die Datei schließt sich mit dem Button: beim nächsten Rerun verwirft Streamlit den Callable.
+    """
+    def lesen() -> bytes:
+        archiv.seek(0)
+        return archiv.read()
+    return lesen
+
+def gruppe_station(dateiname: str) -> tuple[str, str]:
+    """Zerlegt einen Zielnamen 'Gruppe_Station.csv' wieder in (Gruppe, Station)."""
+    teile = os.path.basename(dateiname).split("_")
+    return teile[0], "_".join(teile[1:]).replace(".csv", "")
 
 
 # Streamlit Setup
@@ -47,13 +77,111 @@ else:
     if lehrkraft_passwort != "":
         st.sidebar.error("Zugang verweigert")
 
+# Write-behind: Stand der Hintergrund-Synchronisation
+if write_behind_enabled():
+    sync = get_queue().status()
+    if sync["pending"]:
+        st.sidebar.info(f"🕓 {sync['pending']} Speicherung(en) warten auf Synchronisation")
+    else:
+        st.sidebar.caption("✅ Alle Speicherungen synchronisiert")
+    if sync["last_error"]:
+        st.sidebar.warning(f"Synchronisation wird wiederholt: {sync['last_error']}")
+    if sync["failed"]:
+        st.sidebar.error(f"{len(sync['failed'])} Speicherung(en) dauerhaft fehlgeschlagen (Details in der Diagnose)")
+
+# Offline-first (SQLite): gespeichert ist sofort lokal, GitHub wird im Hintergrund nachgezogen
+if get_backend().name == "sqlite":
+    sync = get_backend().status()
+    if sync["pending"]:
+        st.sidebar.info(f"🕓 {sync['pending']} Datei(en) noch nicht mit {sync['remote']} synchronisiert")
+    elif sync["remote"]:
+        st.sidebar.caption(f"✅ Alles mit {sync['remote']} synchronisiert")
+    if sync["last_error"]:
+        st.sidebar.warning(f"Offline – Synchronisation wird wiederholt: {sync['last_error']}")
+    if sync["failed"]:
+        st.sidebar.error(f"{len(sync['failed'])} Datei(en) von {sync['remote']} dauerhaft abgelehnt (Details in der Diagnose)")
+
 # Lehrkraftmodus
 if lehrkraft_aktiv:
     st.header("👩‍🏫 Lehrkraftmodus – Gruppenauswertung")
+
+    # Sitzung (Schuljahr/Klasse/Termin): alles Weitere bezieht sich nur auf deren Verzeichnis
+    st.subheader("🗓️ Sitzung")
     try:
-        files = gh_list_csv()  # CSVs aus GitHub
+        alle_sitzungen = sitzungen(mit_archiv=st.toggle("Archivierte Sitzungen anzeigen", key="archiv_anzeigen"))
     except Exception as e:
-        st.error("Konnte die Dateiliste aus GitHub nicht laden.")
+        st.error("Konnte die Sitzungen nicht laden.")
+        st.caption(str(e))
+        alle_sitzungen = []
+    sitzungsauswahl = {n.praefix: n for n in alle_sitzungen + [ALTBESTAND]}
+    if st.session_state.get("lehrkraft_sitzung") not in sitzungsauswahl:
+        st.session_state.pop("lehrkraft_sitzung", None)
+    if st.session_state.get("sitzung_neu") in sitzungsauswahl:
+        st.session_state["lehrkraft_sitzung"] = st.session_state.pop("sitzung_neu")
+    ns = sitzungsauswahl[st.selectbox(
+        "Klasse / Sitzung", list(sitzungsauswahl), key="lehrkraft_sitzung",
+        format_func=lambda p: sitzungsauswahl[p].titel + (" – archiviert" if sitzungsauswahl[p].archiviert else ""))]
+    with st.expander("Sitzungen verwalten"):
+        with st.form("sitzung_anlegen", clear_on_submit=True):
+            spalte_jahr, spalte_klasse, spalte_termin = st.columns(3)
+            schuljahr = spalte_jahr.text_input("Schuljahr", value=aktuelles_schuljahr())
+            klasse = spalte_klasse.text_input("Klasse", placeholder="z. B. 8b")
+            termin = spalte_termin.text_input("Sitzung", value=date.today().isoformat())
+            if st.form_submit_button("➕ Sitzung anlegen"):
+                try:
+                    neu = namensraum(schuljahr, klasse, termin)
+                    lege_an(neu)
+                except Exception as e:
+                    st.error(f"Sitzung konnte nicht angelegt werden: {e}")
+                else:
+                    st.session_state["sitzung_neu"] = neu.praefix
+                    st.rerun()
+        if ns.praefix:
+            if st.button("📂 Sitzung wieder öffnen" if ns.archiviert else "🗄️ Sitzung archivieren",
+                         key="sitzung_archivieren"):
+                archiviere(ns, archivieren=not ns.archiviert)
+                st.rerun()
+            st.caption("Archivierte Sitzungen bleiben hier lesbar, erscheinen im Schülermodus aber nicht mehr.")
+        else:
+            st.caption("Altbestand: Abgaben aus der Zeit vor den Sitzungen, direkt im Datenordner.")
+    # für Dateinamen von Downloads, z. B. "_2025-26_8b_2025-10-18"
+    ns_suffix = "_" + ns.praefix.strip("/").replace("/", "_") if ns.praefix else ""
+
+    # Live-Übersicht: gepollt wird nur die Version des Speichers (bei GitHub der Branch-Head);
+    # nach einer Änderung werden nur die geänderten CSVs geladen
+    st.subheader("📡 Klassenübersicht")
+    live = st.toggle("Live aktualisieren", value=True, key="uebersicht_live")
+
+    @st.fragment(run_every=float(storage_cfg("dashboard_intervall", "10") or 10) if live else None)
+    def klassenuebersicht_anzeigen():
+        from dashboard_utils import BUCHSTABEN, MIT_DIAGRAMM, beobachtet_seit, klassen_uebersicht
+        try:
+            tabelle, geaendert = klassen_uebersicht(ns)
+        except Exception as e:
+            st.warning(f"Übersicht konnte nicht aktualisiert werden: {e}")
+            return
+        if tabelle.empty:
+            st.info("Noch keine Abgaben.")
+            return
+        spalten = {b: st.column_config.TextColumn(b, help=name, width="small") for b, name in zip(BUCHSTABEN, STATIONEN)}
+        for b in MIT_DIAGRAMM:
+            diagramm = st.column_config.LineChartColumn if b == "E" else st.column_config.BarChartColumn
+            spalten[f"{b} Werte"] = diagramm(f"{b} Werte", y_min=0)
+        spalten["Letzte Änderung"] = st.column_config.DatetimeColumn("Letzte Änderung", format="HH:mm:ss")
+        st.dataframe(tabelle, column_config=spalten, hide_index=True, width="stretch")
+        if geaendert:
+            st.toast(f"{len(geaendert)} Datei(en) neu oder geändert")
+        st.caption(f"{len(tabelle)} Gruppen · ✅ abgegeben · ◐ angefangen · "
+                   f"Änderungen beobachtet seit {beobachtet_seit(ns):%H:%M}")
+
+    klassenuebersicht_anzeigen()
+
+    st.subheader("🔎 Einzelne Abgabe")
+    try:
+        # Dateiindex der Sitzung aus dem konfigurierten Speicher (GitHub/lokal/fake), nur die Messwert-CSVs
+        files = [e.pfad for e in namensraum_eintraege(ns) if e.art == "csv"]
+    except Exception as e:
+        st.error("Konnte die Dateiliste nicht laden.")
         st.caption(str(e))  # zeigt z. B. "GitHub list error 403: Resource not accessible by integration"
         files = []
     if not files:
@@ -68,39 +196,205 @@ if lehrkraft_aktiv:
         st.write("🧠 Auswertung:")
         st.write(auswertung_text)
 
-        fig = None
-        # Diagramm für Station E im Lehrkraftmodus
-        if "Vergleich Thermos vs. Becher" in selected_file:
-            required_cols_E = ["Zeit [min]", "Temperatur Thermos [°C]", "Temperatur Becher [°C]"]
+        fig_png = None
+        # Diagramm für Station E im Lehrkraftmodus (Dateinamen enthalten "_" statt Leerzeichen)
+        required_cols_E = ["Zeit [min]", "Temperatur Thermos [°C]", "Temperatur Becher [°C]"]
         if all(col in df.columns for col in required_cols_E):
             st.subheader("📈 Temperaturverlauf – Station E")
             try:
+                from plot_utils import plot_verlauf_png
                 # station_label = "E – Vergleich Thermos vs. Becher"  # falls du es im Plot brauchst
-                fig = plot_verlauf(df, "E – Vergleich Thermos vs. Becher", os.path.basename(selected_file).split("_")[0])
-                st.pyplot(fig)
+                fig_png = plot_verlauf_png(df, "E – Vergleich Thermos vs. Becher", gruppe_station(selected_file)[0])
+                st.image(fig_png)
             except Exception as e:
                 st.warning(f"Fehler beim Zeichnen des Diagramms: {e}")
 
 
-        pdf = create_pdf(
-            os.path.basename(selected_file).split("_")[0],
-            "_".join(os.path.basename(selected_file).split("_")[1:]).replace(".csv", ""),
-            df,
-            auswertung_text,
-            fig
+        # PDF erst beim Klick erzeugen (und pro Inhalt nur einmal, siehe create_pdf_cached)
+        from pdf_utils import create_pdf_cached
+        st.download_button(
+            "📄 PDF herunterladen",
+            data=lambda: create_pdf_cached(*gruppe_station(selected_file), df, auswertung_text, fig_png),
+            file_name=os.path.basename(selected_file).replace(".csv", ".pdf"),
+            mime="application/pdf",
+        )
+
+    # Ganze Klasse parallel laden (statt Datei für Datei)
+    st.subheader("👥 Ganze Klasse")
+    if files and st.button("👥 Ganze Klasse laden", key="klasse_laden"):
+        fortschritt = st.progress(0.0, text="Lade Klassendaten …")
+        st.session_state["klasse"] = ns.praefix, lade_klasse(
+            files, fortschritt=lambda n, gesamt: fortschritt.progress(n / gesamt, text=f"{n}/{gesamt} Dateien geladen"))
+        fortschritt.empty()
+    if st.session_state.get("klasse", (None,))[0] == ns.praefix:
+        klasse_df, klasse_fehler = st.session_state["klasse"][1]
+        st.dataframe(klasse_df)
+        if klasse_fehler:
+            st.warning(f"{len(klasse_fehler)} Datei(en) konnten nicht geladen werden.")
+            st.dataframe(pd.DataFrame(klasse_fehler))
+
+    # Station E: Abkühlung aller Gruppen im Vergleich (Newton-Fit für Thermos und Becher)
+    st.subheader("❄️ Station E – Abkühlung im Klassenvergleich")
+    dateien_e = [f for f in files if f.endswith(f"_{safe_component(STATIONEN[4])}.csv")]
+    if dateien_e and st.toggle("Abkühlung aller Gruppen auswerten", key="abkuehlung_klasse"):
+        from abkuehlung_utils import klassen_abkuehlung, verteilung
+        from plot_utils import plot_abkuehlung_klasse_png
+        messwerte, fehler_e = lade_klasse(dateien_e)
+        anpassung = klassen_abkuehlung(messwerte)
+        if anpassung.empty:
+            st.info("Noch keine Messwerte für Station E vorhanden.")
+        else:
+            st.image(plot_abkuehlung_klasse_png(messwerte, anpassung))
+            st.caption("Newtonsches Abkühlungsgesetz T(t) = T_U + (T₀ − T_U)·e^(−k·t); je größer k, "
+                       "desto schneller kühlt die Probe ab. Rot gestrichelt: auffällige Gruppen. "
+                       f"Umgebungstemperatur der Klasse: {anpassung.attrs['T_U Klasse']:.1f} °C.")
+            st.dataframe(anpassung.style.apply(
+                lambda z: ["background-color: #fde2e2" if z["Auffällig"] else ""] * len(z), axis=1),
+                hide_index=True, column_config={
+                    c: st.column_config.NumberColumn(format="%.3f") for c in anpassung.columns
+                    if c.startswith(("k ", "R² "))})
+            st.dataframe(verteilung(anpassung).round(3))
+        if fehler_e:
+            st.warning(f"{len(fehler_e)} Datei(en) konnten nicht geladen werden.")
+
+    # Station B: Galerie aus den kleinen Vorschaubildern statt der vollen Fotos
+    st.subheader("📷 Station B – Beobachtungen")
+    if st.toggle("Galerie anzeigen", key="galerie_b"):
+        from bild_utils import vorschau
+        eintraege = namensraum_eintraege(ns)
+        vorschauen = {e.gruppe: e.pfad for e in eintraege if e.art == "vorschau"}
+        # ältere Uploads ohne Vorschau: volles Bild laden und hier verkleinern
+        ohne_vorschau = {e.gruppe: e.pfad for e in eintraege if e.art == "bild" and e.gruppe not in vorschauen}
+        galerie = sorted({**vorschauen, **ohne_vorschau}.items())
+        if not galerie:
+            st.info("Noch keine Bilder vorhanden.")
+        bilder = {p: res[0] for p, res, _ in get_backend().get_many([p for _, p in galerie]) if res is not None}
+        spalten = st.columns(4)
+        for i, (gruppe, pfad) in enumerate(galerie):
+            if pfad in bilder:
+                daten = bilder[pfad] if gruppe in vorschauen else vorschau(bilder[pfad])
+                spalten[i % 4].image(daten, caption=f"Gruppe {gruppe}")
+
+    # Sammel-Export: alle Berichte + gemeinsame Messwerttabelle als ZIP
+    st.subheader("🗂️ Sammel-Export")
+    if files and st.button("🗂️ Alle Berichte als ZIP erstellen", key="export_zip"):
+        from export_utils import exportiere_klasse
+        fortschritt = st.progress(0.0, text="Erstelle Berichte …")
+        archiv = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+        ergebnis = exportiere_klasse(
+            archiv,
+            files,
+            fortschritt=lambda n, gesamt: fortschritt.progress(n / gesamt, text=f"{n}/{gesamt} Berichte"),
         )
-        st.download_button("📄 PDF herunterladen", data=pdf, file_name=os.path.basename(selected_file).replace(".csv", ".pdf"))
+        fortschritt.empty()
+        st.download_button("📥 ZIP herunterladen", data=beim_klick(archiv),
+                           file_name=f"Berichte_Waermeuebertragung{ns_suffix}.zip", mime="application/zip")
+        if ergebnis["fehler"]:
+            st.warning(f"{len(ergebnis['fehler'])} Bericht(e) fehlen, Details in fehler.txt im ZIP.")
+    # Klassendatensatz zurück ins Einzeldatei-Layout (je Gruppe/Station CSV + Auswertung)
+    if getattr(get_backend(), "format", None) == "datensatz" and st.button(
+            "🧮 Klassendatensatz als Einzeldateien (ZIP)", key="export_einzeldateien"):
+        import zipfile
+        from storage_datensatz import als_einzeldateien
+        archiv = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+        with zipfile.ZipFile(archiv, "w", zipfile.ZIP_DEFLATED) as z:
+            for pfad, daten in sorted(als_einzeldateien(get_backend(), ns.praefix).items()):
+                z.writestr(pfad[len(ns.praefix):], daten)
+        st.download_button("📥 ZIP herunterladen", data=beim_klick(archiv),
+                           file_name=f"Klassendatensatz_Einzeldateien{ns_suffix}.zip", mime="application/zip",
+                           key="einzeldateien_zip")
 
     # Zusammenfassungs-PDF
     st.subheader("📋 Zusammenfassung aller Gruppen")
     if st.button("📄 Zusammenfassungs-PDF erstellen"):
-        pdf = create_summary_pdf()
-        st.download_button("📥 PDF herunterladen", data=pdf, file_name="Zusammenfassung_Waermeuebertragung.pdf")
+        from summary_utils import create_summary_pdf
+        pdf = create_summary_pdf(ns)
+        st.download_button("📥 PDF herunterladen", data=pdf,
+                           file_name=f"Zusammenfassung_Waermeuebertragung{ns_suffix}.pdf")
+
+    # Diagnose: Ist Speichern langsam wegen Latenz, Konflikten (409/422) oder Rate-Limit?
+    with st.expander("🩺 Diagnose Speicher / GitHub-API"):
+        backend = get_backend()
+        st.caption(f"Speicher-Backend: {backend.name}")
+        if write_behind_enabled() and get_queue().status()["failed"]:
+            st.warning("Write-behind: diese Speicherungen scheitern dauerhaft und werden nicht mehr versucht "
+                       "(die Eingaben bleiben im Journal, erneutes Speichern plant sie wieder ein):")
+            st.dataframe(pd.DataFrame(list(get_queue().status()["failed"].items()), columns=["Datei", "Fehler"]),
+                         hide_index=True)
+        if backend.name == "sqlite":
+            sync = backend.status()
+            letzter = (pd.Timestamp(sync["last_sync"], unit="s", tz="UTC").tz_convert("Europe/Berlin")
+                       .strftime("%H:%M:%S") if sync["last_sync"] else "noch nie")
+            st.caption(f"Offline-first: {sync['pending']} Datei(en) offen, letzter Sync {letzter}, "
+                       f"{sync['conflicts']} Konflikt(e)")
+            if sync["failed"]:
+                st.warning(f"Offline-first: diese Dateien lehnt {sync['remote']} dauerhaft ab und werden nicht mehr "
+                           "hochgeladen (lokal bleiben sie erhalten, erneutes Speichern plant sie wieder ein):")
+                st.dataframe(pd.DataFrame(list(sync["failed"].items()), columns=["Datei", "Fehler"]), hide_index=True)
+            if sync["conflicts"]:
+                st.warning("Konflikte: lokal und in GitHub gleichzeitig geändert. Der lokale Stand wurde "
+                           "hochgeladen, der überschriebene GitHub-Stand steht unten zum Download.")
+                for i, k in enumerate(backend.konflikte(limit=20)):
+                    if k["remote_daten"] is not None:
+                        st.download_button(f"⬇️ {k['pfad']} (GitHub-Stand {k['remote_version'][:7]})",
+                                           data=k["remote_daten"], file_name=k["pfad"], key=f"konflikt_{i}")
+                    else:
+                        st.caption(f"{k['pfad']}: in GitHub gelöscht, lokal geändert")
+        if backend.name == "github" and st.button("🔌 Verbindung testen", key="gh_self_test"):
+            from storage_github import gh_self_test
+            try:
+                test = gh_self_test()
+                st.success(f"Verbunden mit {test['branch']} @ {(test['head'] or '')[:7]} in {test['latency_ms']} ms")
+            except Exception as e:
+                st.error(f"Selbsttest fehlgeschlagen: {e}")
+        if backend.name == "github":
+            from storage_github import gh_cache_status, gh_scheduler_status
+            plan = gh_scheduler_status()
+            st.caption(f"Scheduler: {plan['tokens']} Token frei, {plan['rate_per_s']}/s Nachschub, "
+                       f"{plan['waiting']} Anfrage(n) wartend"
+                       + (f", pausiert noch {plan['blocked_s']} s (Rate-Limit)" if plan["blocked_s"] else ""))
+            ablage = gh_cache_status()
+            zugriffe = ablage["hits"] + ablage["misses"]
+            st.caption(f"Gemeinsamer Cache aller Sessions: {ablage['entries']} Einträge, "
+                       f"{ablage['bytes'] / 2 ** 20:.1f} / {ablage['max_bytes'] / 2 ** 20:.0f} MB"
+                       + (f", Trefferquote {100 * ablage['hits'] / zugriffe:.0f} %" if zugriffe else "")
+                       + (f", Head {ablage['head'][:7]} vor {ablage['head_age_s']} s" if ablage["head"] else ""))
+        messwerte = METRICS.snapshot()
+        rate = messwerte["rate_limit"]
+        if rate["remaining"] is not None:
+            reset = pd.Timestamp(rate["reset"], unit="s", tz="UTC").tz_convert("Europe/Berlin").strftime("%H:%M:%S")
+            st.metric("Rate-Limit übrig", f"{rate['remaining']} / {rate['limit']}", help=f"Zurückgesetzt um {reset}")
+        if messwerte["secondary_limits"]:
+            st.warning(f"{messwerte['secondary_limits']}× sekundäres Rate-Limit (zu viele Anfragen kurz hintereinander)")
+        if messwerte["ops"]:
+            st.dataframe(pd.DataFrame([
+                {"Operation": op, "Anfragen": m["requests"], "Ø ms": m["mean_ms"],
+                 "p95 ≤ s": m["p95_le_s"], "Wiederholungen": m["retries"], "Wartezeit s": m["wait_s"],
+                 **{f"#{k}": v for k, v in m["outcomes"].items()}}
+                for op, m in messwerte["ops"].items()
+            ]).fillna(0))
+            st.download_button("📈 Metriken (Prometheus-Text)", data=METRICS.prometheus_text(),
+                               file_name="kalorik_metrics.txt", mime="text/plain")
+        else:
+            st.caption("Noch keine GitHub-Aufrufe in diesem Prozess.")
 
 # Schülermodus
 else:
     st.header("👨‍🎓 Schülermodus – Datenerfassung & Auswertung")
 
+    # Sitzung wählen; solange die Lehrkraft keine angelegt hat, wird wie bisher direkt im Datenordner gespeichert
+    try:
+        offene_sitzungen = sitzungen()
+    except Exception as e:
+        st.error(f"Sitzungen konnten nicht geladen werden: {e}")
+        st.stop()
+    if offene_sitzungen:
+        sitzungsauswahl = {n.praefix: n for n in offene_sitzungen}
+        ns = sitzungsauswahl[st.selectbox("🏫 Klasse / Sitzung", list(sitzungsauswahl), key="sitzung_schueler",
+                                          format_func=lambda p: sitzungsauswahl[p].titel)]
+    else:
+        ns = ALTBESTAND
+
     gruppen_id = st.text_input("🔢 Gruppen-ID eingeben", max_chars=30)
     station = st.selectbox("Station auswählen", STATIONEN, key="station_schueler")
 
@@ -108,11 +402,18 @@ else:
     stationsname = safe_component(station)
 
     # Zielname festlegen (oder None, wenn noch keine ID vorhanden)
-    zielname = make_zielname(gruppen_id, stationsname)
+    zielname = make_zielname(gruppen_id, stationsname, ns)
 
     # Daten laden NUR wenn eine Gruppen-ID vorhanden ist
     if zielname:
         df, auswertung_vorlage = lade_daten(zielname)
+        if write_behind_enabled():
+            zustand = get_queue().status(zielname)["state"]
+            if zustand == "pending":
+                st.caption("🕓 Deine letzte Speicherung wird gerade mit GitHub synchronisiert.")
+            elif zustand == "failed":
+                st.error("Deine letzte Speicherung konnte nicht synchronisiert werden. "
+                         "Bitte sag deiner Lehrkraft Bescheid.")
     else:
         df, auswertung_vorlage = pd.DataFrame(), ""
 
@@ -129,40 +430,41 @@ else:
         )
 
         if uploaded_file is not None:
-            # Bild in der App anzeigen
-            st.image(uploaded_file, caption="Deine Beobachtung", use_column_width=True)
+            # Ausrichten, verkleinern, neu komprimieren, Vorschau erzeugen (einmal pro Upload)
+            try:
+                from bild_utils import bild_aufbereiten
+                bild = bild_aufbereiten(uploaded_file.getvalue())
+            except Exception as e:
+                st.error(f"Bild konnte nicht gelesen werden: {e}")
+                bild = None
 
-            # Dateiendung/Bytes
-            import os
-            ext = os.path.splitext(uploaded_file.name)[1].lower()
-            if ext not in [".jpg", ".jpeg", ".png"]:
-                ext = ".png"
-            file_bytes = uploaded_file.getvalue()
+        if uploaded_file is not None and bild is not None:
+            st.image(bild.daten, caption="Deine Beobachtung", use_column_width=True)
+            st.caption(f"Bildgröße: {bild.original_groesse / 1e6:.1f} MB → {len(bild.daten) / 1e6:.2f} MB")
 
             # Dateiname konsistent & sicher
-            bild_dateiname = f"{safe_component(gruppen_id)}_{stationsname}_bild{ext}"
+            bild_dateiname = f"{ns.praefix}{safe_component(gruppen_id)}_{stationsname}_bild{bild.endung}"
 
-            # Lokal speichern (optional)
-            try:
-                os.makedirs(DATENORDNER, exist_ok=True)
-                with open(os.path.join(DATENORDNER, bild_dateiname), "wb") as f:
-                    f.write(file_bytes)
-            except Exception as e:
-                st.warning(f"Lokales Speichern des Bildes fehlgeschlagen: {e}")
+            # Streamlit rerunnt bei jeder Eingabe – dasselbe Bild nur einmal hochladen
+            bild_kennung = (bild_dateiname, git_blob_sha(bild.daten))
 
-            # Persistentes Speichern in GitHub (nur mit Gruppen-ID)
-            if gruppen_id:
+            # Persistentes Speichern in GitHub (nur mit Gruppen-ID); unverändert = kein Upload
+            if gruppen_id and st.session_state.get("b_bild_kennung") != bild_kennung:
                 try:
-                    gh_upload_bytes(
+                    speichere_bild(
                         bild_dateiname,
-                        file_bytes,
-                        message=f"Bildupload Gruppe {gruppen_id} – {station}"
+                        bild.daten,
+                        message=f"Bildupload Gruppe {gruppen_id} – {station}",
+                        vorschau=bild.vorschau,
                     )
-                    st.success("Bild wurde zusätzlich in GitHub gespeichert.")
+                    st.session_state["b_bild_kennung"] = bild_kennung
+                    st.success("Bild wurde in GitHub gespeichert.")
                 except Exception as e:
                     st.warning(f"Bild konnte nicht in GitHub gespeichert werden: {e}")
+            elif gruppen_id:
+                st.success("Bild wurde in GitHub gespeichert.")
             else:
-                st.info("Tipp: Mit Gruppen-ID speichern wir das Bild auch in GitHub.")
+                st.info("Tipp: Mit Gruppen-ID speichern wir das Bild in GitHub.")
 
     # ---------------------------------------------------------
     # Stationen A & C – Balkendiagramm
@@ -179,11 +481,10 @@ else:
             )
         df = st.data_editor(df, num_rows="dynamic", use_container_width=True, key="editor_ac")
 
-        fig = None
         st.subheader("📈 Balkendiagramm")
         try:
-            fig = plot_balken(df, station, gruppen_id)
-            st.pyplot(fig)
+            from plot_utils import plot_balken_png
+            st.image(plot_balken_png(df, station, gruppen_id))
         except Exception as e:
             st.warning(f"Fehler beim Zeichnen des Diagramms: {e}")
 
@@ -200,12 +501,12 @@ else:
                 st.error("Bitte zuerst eine Gruppen-ID eingeben.")
                 st.stop()
             try:
-                speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
+                status = speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
             except Exception as e:
                 st.error(f"GitHub-Fehler beim Speichern: {e}")
                 st.stop()
             else:
-                st.success(f"Ergebnisse gespeichert in GitHub: {zielname}")
+                st.success(speicher_meldung(status, zielname))
 
     # ---------------------------------------------------------
     # Station E – Temperaturverlauf
@@ -223,11 +524,10 @@ else:
             )
         df = st.data_editor(df, num_rows="dynamic", use_container_width=True, key="editor_e")
 
-        fig = None
         st.subheader("📈 Temperaturverlauf")
         try:
-            fig = plot_verlauf(df, station, gruppen_id)
-            st.pyplot(fig)
+            from plot_utils import plot_verlauf_png
+            st.image(plot_verlauf_png(df, station, gruppen_id))
         except Exception as e:
             st.warning(f"Fehler beim Zeichnen des Diagramms: {e}")
 
@@ -244,12 +544,12 @@ else:
                 st.error("Bitte zuerst eine Gruppen-ID eingeben.")
                 st.stop()
             try:
-                speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
+                status = speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
             except Exception as e:
                 st.error(f"GitHub-Fehler beim Speichern: {e}")
                 st.stop()
             else:
-                st.success(f"Ergebnisse gespeichert in GitHub: {zielname}")
+                st.success(speicher_meldung(status, zielname))
 
     # ---------------------------------------------------------
     # Station D – Nur Text
@@ -269,9 +569,9 @@ else:
                 st.error("Bitte zuerst eine Gruppen-ID eingeben.")
                 st.stop()
             try:
-                speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
+                status = speichere_daten("IGNORIERT", df, auswertung, zielname=zielname)
             except Exception as e:
                 st.error(f"GitHub-Fehler beim Speichern: {e}")
                 st.stop()
             else:
-                st.success(f"Ergebnisse gespeichert in GitHub: {zielname}")
+                st.success(speicher_meldung(status, zielname))
@@ -0,0 +1,216 @@
+# abkuehlung_utils.py
+"""
+Station E für die ganze Klasse: Newtonsches Abkühlungsgesetz dT/dt = −k·(T − T_U) für Thermos
+und Becher aller Gruppen, dazu Ausreißer und die Verteilung in der Klasse.
+
+Angepasst wird die linearisierte Form dT/dt = −k·T + k·T_U: Differenzenquotienten gegen die
+Temperatur in der Intervallmitte, eine Ausgleichsgerade je Gruppe. Alle Gruppen stehen als Zeilen
+in einem aufgefüllten Array (Gruppen × Messpunkte, NaN = kein Wert) und werden gemeinsam über
+ihre 2×2-Normalgleichungen gelöst – keine Python-Schleife über Gruppen, auch einige hundert
+Gruppen dauern nur Millisekunden.
+
+T_U ist nur bestimmbar, wenn die Probe in der Messzeit deutlich abkühlt. Bei einer guten
+Thermosflasche (k nahe 0) wird k deshalb mit der Umgebungstemperatur der Klasse angepasst,
+ebenfalls für alle Gruppen gemeinsam. Ob eine Probe deutlich abkühlt, entscheidet dieser Fit mit
+fester T_U, nicht der verrauschte Differenzenquotient; auffällig ist eine Gruppe erst, wenn ihr
+k von der Klasse abweicht oder die Messwerte nicht zur Abkühlungskurve passen.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SPALTE_ZEIT = "Zeit [min]"
+PROBEN = {"Thermos": "Temperatur Thermos [°C]", "Becher": "Temperatur Becher [°C]"}
+
+# robuster z-Wert (Median/MAD) ab dem eine Gruppe als auffällig gilt
+MAD_SCHWELLE = 3.5
+# plausibler Bereich für die geschätzte Umgebungstemperatur
+T_UMGEBUNG_BEREICH = (0.0, 40.0)
+# T_U gilt als frei bestimmbar, wenn k·Messdauer mindestens so groß ist (≈ 40 % des Weges zu T_U)
+BESTIMMBAR_AB = 0.5
+# Umgebungstemperatur, falls in der ganzen Klasse keine Probe deutlich abkühlt
+T_RAUM = 20.0
+# mittlere Abweichung [°C] der Messwerte von der Abkühlungskurve, ab der die Messung auffällt
+RESIDUUM_MAX = 2.0
+
+
+def aufgefuellt(messwerte: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Messwerte im Langformat (Gruppe, Zeit [min], Temperatur Thermos/Becher [°C]) ->
+    (Gruppen, Zeit, {Probe: Temperatur}) als Arrays Gruppen × Messpunkte, nach Zeit sortiert.
+    """
+    spalten = [SPALTE_ZEIT, *PROBEN.values()]
+    if messwerte.empty or not all(s in messwerte.columns for s in ["Gruppe", *spalten]):
+        leer = np.empty((0, 0))
+        return np.array([], dtype=object), leer, {p: leer for p in PROBEN}
+    df = messwerte[["Gruppe", *spalten]].copy()
+    df[spalten] = df[spalten].apply(pd.to_numeric, errors="coerce")
+    df = df[df[SPALTE_ZEIT].notna()].sort_values(["Gruppe", SPALTE_ZEIT], kind="stable")
+    codes, gruppen = pd.factorize(df["Gruppe"].astype(str), sort=True)
+    position = df.groupby(codes, sort=False).cumcount().to_numpy()
+    form = (len(gruppen), int(position.max()) + 1 if len(position) else 0)
+
+    def feld(spalte: str) -> np.ndarray:
+        a = np.full(form, np.nan)
+        a[codes, position] = df[spalte].to_numpy(dtype=float, na_value=np.nan)
+        return a
+
+    return np.asarray(gruppen, dtype=object), feld(SPALTE_ZEIT), {p: feld(s) for p, s in PROBEN.items()}
+
+
+def _ausgleichsgeraden(x: np.ndarray, y: np.ndarray, maske: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    y ≈ a·x + b für jede Zeile zugleich (nur Punkte mit maske): die 2×2-Normalgleichungen
+    (AᵀA)·[a, b] = Aᵀy mit A = [x, 1] gestapelt und gemeinsam gelöst. NaN, wo nicht lösbar.
+    """
+    w = maske.astype(float)
+    x, y = np.where(maske, x, 0.0), np.where(maske, y, 0.0)
+    sx, sxx, n = (w * x).sum(axis=1), (w * x * x).sum(axis=1), w.sum(axis=1)
+    ata = np.stack([np.stack([sxx, sx], axis=-1), np.stack([sx, n], axis=-1)], axis=-2)
+    aty = np.stack([(w * x * y).sum(axis=1), (w * y).sum(axis=1)], axis=-1)
+    loesbar = (n >= 2) & (sxx * n - sx * sx > 1e-9 * np.maximum(sxx * n, 1.0))
+    koeffizienten = np.full((len(n), 2), np.nan)
+    if loesbar.any():
+        koeffizienten[loesbar] = np.linalg.solve(ata[loesbar], aty[loesbar][..., None])[..., 0]
+    return koeffizienten[:, 0], koeffizienten[:, 1]
+
+
+def newton_anpassung(zeit: np.ndarray, temperatur: np.ndarray,
+                     t_umgebung: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Batch-Fit für alle Zeilen (Gruppen) zugleich. Ohne t_umgebung werden k und T_U aus
+    dT/dt = −k·T + k·T_U geschätzt, mit t_umgebung nur k aus ln(T − T_U) = ln(T₀ − T_U) − k·t
+    (robust auch bei kaum abkühlenden Proben). Gibt je Gruppe k [1/min], T_U [°C],
+    Starttemperatur, Messdauer, Zahl der Messpunkte, R² und mittlere Abweichung [°C] (RMS) der
+    Modellkurve gegen die Messwerte zurück (NaN = nicht anpassbar, z. B. weniger als drei Messpunkte).
+    """
+    gueltig = ~np.isnan(zeit) & ~np.isnan(temperatur)
+    # gültige Punkte je Zeile nach links schieben, damit Lücken keine Intervalle zerreißen
+    ordnung = np.argsort(~gueltig, axis=1, kind="stable")
+    zeit = np.take_along_axis(zeit, ordnung, axis=1)
+    temperatur = np.take_along_axis(temperatur, ordnung, axis=1)
+    gueltig = np.take_along_axis(gueltig, ordnung, axis=1)
+    gruppen = zeit.shape[0]
+    punkte = gueltig.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if t_umgebung is None:
+            dt = np.diff(zeit, axis=1)
+            intervall = gueltig[:, 1:] & gueltig[:, :-1] & (dt > 0)
+            a, b = _ausgleichsgeraden((temperatur[:, 1:] + temperatur[:, :-1]) / 2,
+                                      np.diff(temperatur, axis=1) / dt, intervall)
+            k = -a
+            t_u = np.where(k != 0, b / k, np.nan)
+        else:
+            abstand = temperatur - t_umgebung
+            a, _ = _ausgleichsgeraden(zeit, np.log(abstand), gueltig & (abstand > 0))
+            k = np.where(punkte >= 3, -a, np.nan)
+            t_u = np.full(gruppen, float(t_umgebung))
+
+        letzte = np.maximum(punkte - 1, 0)[:, None]
+        start = zeit[:, 0] if zeit.shape[1] else np.full(gruppen, np.nan)
+        dauer = (np.take_along_axis(zeit, letzte, axis=1)[:, 0] - start) if zeit.shape[1] else start
+        t0 = temperatur[:, 0] if zeit.shape[1] else np.full(gruppen, np.nan)
+        modell = t_u[:, None] + (t0 - t_u)[:, None] * np.exp(-k[:, None] * (zeit - start[:, None]))
+        mittel = np.where(gueltig, temperatur, 0.0).sum(axis=1) / punkte
+        ss_res = np.where(gueltig, (temperatur - modell) ** 2, 0.0).sum(axis=1)
+        ss_tot = np.where(gueltig, (temperatur - mittel[:, None]) ** 2, 0.0).sum(axis=1)
+        r2 = np.where(~np.isnan(k) & (ss_tot > 0), 1 - ss_res / ss_tot, np.nan)
+        residuum = np.where(~np.isnan(k), np.sqrt(ss_res / punkte), np.nan)
+    return {"k": k, "t_umgebung": t_u, "t0": t0, "dauer": dauer, "punkte": punkte, "r2": r2,
+            "residuum": residuum}
+
+
+def robuster_z(werte: np.ndarray) -> np.ndarray:
+    """|x − Median| / (1,4826·MAD); 0, wenn die Werte (fast) alle gleich sind, NaN bleibt NaN."""
+    werte = np.asarray(werte, dtype=float)
+    if np.isnan(werte).all():
+        return np.full(werte.shape, np.nan)
+    median = np.nanmedian(werte)
+    mad = 1.4826 * np.nanmedian(np.abs(werte - median))
+    if not mad > 0:
+        return np.where(np.isnan(werte), np.nan, 0.0)
+    return np.abs(werte - median) / mad
+
+
+def klassen_abkuehlung(messwerte: pd.DataFrame) -> pd.DataFrame:
+    """
+    Eine Zeile je Gruppe: k, Halbwertszeit, T_U und R² für Thermos und Becher, das Verhältnis
+    k Becher / k Thermos sowie Ausreißer-Markierung mit Begründung.
+
+    T_U wird nur dort frei geschätzt, wo die Probe in der Messzeit deutlich abkühlt
+    (k·Dauer ≥ BESTIMMBAR_AB im Fit mit fester T_U, meist der Becher) und die freie Schätzung
+    plausibel ist; für die übrigen Proben wird k mit der Umgebungstemperatur der Klasse (Median
+    der bestimmbaren T_U) angepasst, T_U bleibt dort leer. Auffällig sind Gruppen, deren k stark
+    von der Klasse abweicht oder deren Messwerte im Mittel mehr als RESIDUUM_MAX von der
+    angepassten Kurve abweichen. Die Klassen-T_U steht in tabelle.attrs["T_U Klasse"].
+    """
+    gruppen, zeit, temperaturen = aufgefuellt(messwerte)
+    tabelle = pd.DataFrame({"Gruppe": gruppen})
+    hinweise = [[] for _ in range(len(gruppen))]
+
+    def hinweis(maske: np.ndarray, text: str) -> None:
+        for i in np.flatnonzero(maske):
+            hinweise[i].append(text)
+
+    def klassen_t_u(auswahl: Dict[str, np.ndarray]) -> float:
+        werte = np.concatenate([frei[p]["t_umgebung"][auswahl[p] & plausibel[p]] for p in frei])
+        return float(np.median(werte)) if len(werte) else T_RAUM
+
+    def kuehlt_ab(fit: Dict[str, np.ndarray]) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return (fit["k"] > 0) & (fit["k"] * fit["dauer"] >= BESTIMMBAR_AB)
+
+    frei = {probe: newton_anpassung(zeit, t) for probe, t in temperaturen.items()}
+    with np.errstate(invalid="ignore"):
+        plausibel = {probe: (fit["t_umgebung"] >= T_UMGEBUNG_BEREICH[0])
+                     & (fit["t_umgebung"] <= T_UMGEBUNG_BEREICH[1]) for probe, fit in frei.items()}
+    # ob eine Probe deutlich abkühlt, entscheidet der Fit mit fester (vorläufiger) Klassen-T_U;
+    # der freie Fit streut dafür zu stark
+    vorlaeufig = klassen_t_u({p: kuehlt_ab(fit) for p, fit in frei.items()})
+    bestimmbar = {p: kuehlt_ab(newton_anpassung(zeit, t, t_umgebung=vorlaeufig))
+                  for p, t in temperaturen.items()}
+    t_u_klasse = klassen_t_u(bestimmbar)
+
+    for probe, temperatur in temperaturen.items():
+        fest = newton_anpassung(zeit, temperatur, t_umgebung=t_u_klasse)
+        # unplausible freie T_U = nicht bestimmbar: dann gilt der Fit mit Klassen-T_U
+        eigen = bestimmbar[probe] & plausibel[probe]
+        k = np.where(eigen, frei[probe]["k"], fest["k"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            halbwertszeit = np.where(k > 0, np.log(2) / k, np.nan)
+        tabelle[f"k {probe} [1/min]"] = k
+        tabelle[f"Halbwertszeit {probe} [min]"] = halbwertszeit
+        tabelle[f"T_U {probe} [°C]"] = np.where(eigen, frei[probe]["t_umgebung"], np.nan)
+        tabelle[f"R² {probe}"] = np.where(eigen, frei[probe]["r2"], fest["r2"])
+
+        with np.errstate(invalid="ignore"):
+            hinweis(np.isnan(k), f"{probe}: zu wenige Messpunkte")
+            hinweis(k <= 0, f"{probe}: kühlt nicht ab")
+            hinweis(robuster_z(k) > MAD_SCHWELLE, f"{probe}: k weicht stark von der Klasse ab")
+            residuum = np.where(eigen, frei[probe]["residuum"], fest["residuum"])
+            hinweis(residuum > RESIDUUM_MAX, f"{probe}: Messwerte passen nicht zur Abkühlungskurve")
+
+    tabelle["Punkte"] = (~np.isnan(zeit)).sum(axis=1) if zeit.size else 0
+    tabelle["k Becher / k Thermos"] = tabelle["k Becher [1/min]"] / tabelle["k Thermos [1/min]"].where(
+        tabelle["k Thermos [1/min]"] > 0)
+    tabelle["Auffällig"] = [bool(h) for h in hinweise]
+    tabelle["Hinweis"] = ["; ".join(h) for h in hinweise]
+    tabelle.attrs["T_U Klasse"] = t_u_klasse
+    return tabelle
+
+
+def verteilung(anpassung: pd.DataFrame) -> pd.DataFrame:
+    """Klassenverteilung (n, Median, Quartile, Min/Max) der angepassten Größen, ohne auffällige Gruppen."""
+    spalten = [s for s in anpassung.columns
+               if s.startswith(("k ", "Halbwertszeit ", "T_U ", "R² "))]
+    werte = anpassung.loc[~anpassung["Auffällig"], spalten] if "Auffällig" in anpassung else anpassung[spalten]
+    return pd.DataFrame({
+        "n": werte.count(),
+        "Median": werte.median(),
+        "Q1": werte.quantile(0.25),
+        "Q3": werte.quantile(0.75),
+        "Min": werte.min(),
+        "Max": werte.max(),
+    }).rename_axis("Größe")
@@ -0,0 +1,355 @@
+# benchmarks/fake_github.py
+"""
+Lokaler Nachbau der GitHub-REST-API (Contents + Git Data), soweit storage_github sie nutzt.
+
+Läuft als HTTP-Server auf 127.0.0.1 mit einstellbarer Latenz und Rate-Limit, damit Benchmarks
+(und die App) offline und reproduzierbar gegen denselben Code-Pfad laufen wie in Produktion:
+gepoolte Session, ETags/304, 409/422-Konflikte, Tree/Commit/Ref-Updates.
+
+    server = FakeGitHub(latency=0.05, rate_limit=5000).start()
+    os.environ["GITHUB_API_URL"] = server.url
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+def _blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _obj_sha(kind: str, payload) -> str:
+    return hashlib.sha1(f"{kind}:{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()
+
+
+class FakeGitHub:
+    """Zustand (Blobs, Trees, Commits, Branch) + HTTP-Server. Thread-sicher."""
+
+    def __init__(self, latency: float = 0.0, rate_limit: int = 5000, rate_window: float = 3600.0,
+                 branch: str = "main"):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.branch = branch
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, Dict[str, str]] = {}      # tree_sha -> {pfad: blob_sha}
+        self.commits: Dict[str, Tuple[str, Optional[str]]] = {}  # commit_sha -> (tree_sha, parent)
+        self.requests = Counter()                       # Operation -> Anzahl
+        self.lock = threading.Lock()
+        self._rate_used = 0
+        self._rate_reset = time.time() + rate_window
+        leer = self._tree({})
+        self.head = self._commit(leer, None, "init")
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ------------------------------------------------------------ Objekte
+    def _tree(self, files: Dict[str, str]) -> str:
+        sha = _obj_sha("tree", files)
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _commit(self, tree: str, parent: Optional[str], message: str) -> str:
+        sha = _obj_sha("commit", [tree, parent, message, len(self.commits)])
+        self.commits[sha] = (tree, parent)
+        return sha
+
+    def files(self) -> Dict[str, str]:
+        return self.trees[self.commits[self.head][0]]
+
+    def seed(self, files: Dict[str, bytes], message: str = "seed") -> None:
+        """Dateien direkt (ohne HTTP) als einen Commit anlegen."""
+        with self.lock:
+            neu = dict(self.files())
+            for pfad, data in files.items():
+                sha = _blob_sha(data)
+                self.blobs[sha] = data
+                neu[pfad] = sha
+            self.head = self._commit(self._tree(neu), self.head, message)
+
+    # ------------------------------------------------------------ Server
+    def start(self) -> "FakeGitHub":
+        fake = self
+
+        class Handler(_Handler):
+            gh = fake
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def take_rate_token(self) -> Tuple[bool, int, int]:
+        with self.lock:
+            now = time.time()
+            if now >= self._rate_reset:
+                self._rate_used, self._rate_reset = 0, now + self.rate_window
+            if self._rate_used >= self.rate_limit:
+                return False, 0, int(self._rate_reset)
+            self._rate_used += 1
+            return True, self.rate_limit - self._rate_used, int(self._rate_reset)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-Alive, damit Connection-Pooling messbar ist
+    gh: FakeGitHub = None
+
+    def log_message(self, *args):
+        pass
+
+    # ------------------------------------------------------------ Helfer
+    def _send(self, status: int, body=None, headers: Optional[dict] = None, raw: Optional[bytes] = None):
+        data = raw if raw is not None else (b"" if body is None else json.dumps(body).encode())
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(data)))
+        if raw is None:
+            self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def _handle(self, method: str):
+        gh = self.gh
+        if gh.latency:
+            time.sleep(gh.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        m = re.match(r"^/repos/[^/]+/[^/]+/(.*)$", url.path)
+        if not m:
+            return self._send(404, {"message": "Not Found"})
+        rest = m.group(1)
+        op, handler = self._route(method, rest)
+        if handler is None:
+            return self._send(404, {"message": f"Not Found: {method} {rest}"})
+
+        with gh.lock:
+            gh.requests[op] += 1
+        erlaubt, remaining, reset = gh.take_rate_token()
+        rate = {"X-RateLimit-Limit": str(gh.rate_limit), "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": str(reset)}
+        if not erlaubt:
+            return self._send(403, {"message": "API rate limit exceeded"}, rate)
+        try:
+            status, body, headers, raw = handler(rest, query)
+        except Exception as e:  # pragma: no cover - Debug-Hilfe
+            status, body, headers, raw = 500, {"message": str(e)}, {}, None
+        if status == 304:
+            # bedingte Anfragen zählen bei GitHub nicht gegen das Limit
+            with gh.lock:
+                gh._rate_used -= 1
+        self._send(status, body, {**rate, **(headers or {})}, raw)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    # ------------------------------------------------------------ Routing
+    def _route(self, method: str, rest: str):
+        routes = [
+            ("GET", r"^contents/?(.*)$", "contents_get", self._contents_get),
+            ("PUT", r"^contents/(.+)$", "contents_put", self._contents_put),
+            ("GET", r"^git/ref/heads/(.+)$", "ref_get", self._ref_get),
+            ("PATCH", r"^git/refs/heads/(.+)$", "ref_update", self._ref_update),
+            ("GET", r"^git/commits/(.+)$", "commit_get", self._commit_get),
+            ("POST", r"^git/commits$", "commit_create", self._commit_create),
+            ("POST", r"^git/blobs$", "blob_create", self._blob_create),
+            ("GET", r"^git/blobs/(.+)$", "blob_get", self._blob_get),
+            ("POST", r"^git/trees$", "tree_create", self._tree_create),
+            ("GET", r"^git/trees/(.+)$", "tree_get", self._tree_get),
+            ("GET", r"^branches/(.+)$", "branch_get", self._branch_get),
+            ("GET", r"^compare/(.+)\.\.\.(.+)$", "compare", self._compare),
+        ]
+        for meth, pattern, op, fn in routes:
+            if meth == method and re.match(pattern, rest):
+                if op == "contents_get" and "raw" in (self.headers.get("Accept") or ""):
+                    op = "contents_download"
+                return op, fn
+        return None, None
+
+    def _contents_get(self, rest, query):
+        gh = self.gh
+        pfad = unquote(re.match(r"^contents/?(.*)$", rest).group(1)).strip("/")
+        with gh.lock:
+            files = gh.files()
+            if pfad in files:
+                sha = files[pfad]
+                if "raw" in (self.headers.get("Accept") or ""):
+                    etag = f'"{sha}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        return 304, None, {"ETag": etag}, None
+                    return 200, None, {"ETag": etag, "Content-Type": "application/octet-stream"}, gh.blobs[sha]
+                return 200, {"type": "file", "name": pfad.rsplit("/", 1)[-1], "path": pfad, "sha": sha,
+                             "size": len(gh.blobs[sha])}, {}, None
+            prefix = f"{pfad}/" if pfad else ""
+            eintraege = {}
+            for p, sha in files.items():
+                if p.startswith(prefix):
+                    name = p[len(prefix):].split("/", 1)[0]
+                    ist_datei = "/" not in p[len(prefix):]
+                    eintraege[name] = {"type": "file" if ist_datei else "dir", "name": name,
+                                       "path": prefix + name, "sha": sha if ist_datei else "",
+                                       "size": len(gh.blobs[sha]) if ist_datei else 0}
+            if not eintraege:
+                return 404, {"message": "Not Found"}, {}, None
+            return 200, sorted(eintraege.values(), key=lambda e: e["name"])[:1000], {}, None
+
+    def _contents_put(self, rest, query):
+        gh = self.gh
+        pfad = unquote(re.match(r"^contents/(.+)$", rest).group(1))
+        body = self._body()
+        data = base64.b64decode(body["content"])
+        with gh.lock:
+            files = dict(gh.files())
+            aktuell = files.get(pfad)
+            if aktuell is not None and body.get("sha") != aktuell:
+                status = 422 if not body.get("sha") else 409
+                return status, {"message": f"{pfad} does not match"}, {}, None
+            sha = _blob_sha(data)
+            gh.blobs[sha] = data
+            files[pfad] = sha
+            tree = gh._tree(files)
+            parent = gh.head
+            gh.head = gh._commit(tree, parent, body.get("message", ""))
+            return 200, {"content": {"sha": sha, "path": pfad},
+                         "commit": {"sha": gh.head, "tree": {"sha": tree},
+                                    "parents": [{"sha": parent}] if parent else []}}, {}, None
+
+    def _ref_get(self, rest, query):
+        gh = self.gh
+        etag = f'"{gh.head}"'
+        if self.headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}, None
+        return 200, {"object": {"sha": gh.head, "type": "commit"}}, {"ETag": etag}, None
+
+    def _ref_update(self, rest, query):
+        gh = self.gh
+        body = self._body()
+        with gh.lock:
+            neu = body["sha"]
+            if neu not in gh.commits:
+                return 422, {"message": "Object does not exist"}, {}, None
+            if not body.get("force") and gh.commits[neu][1] != gh.head:
+                return 422, {"message": "Update is not a fast forward"}, {}, None
+            gh.head = neu
+        return 200, {"object": {"sha": neu}}, {}, None
+
+    def _commit_get(self, rest, query):
+        sha = rest.split("/")[-1]
+        if sha not in self.gh.commits:
+            return 404, {"message": "Not Found"}, {}, None
+        tree, parent = self.gh.commits[sha]
+        return 200, {"sha": sha, "tree": {"sha": tree}, "parents": [{"sha": parent}] if parent else []}, {}, None
+
+    def _commit_create(self, rest, query):
+        gh = self.gh
+        body = self._body()
+        with gh.lock:
+            parent = (body.get("parents") or [None])[0]
+            sha = gh._commit(body["tree"], parent, body.get("message", ""))
+        return 201, {"sha": sha}, {}, None
+
+    def _blob_create(self, rest, query):
+        gh = self.gh
+        body = self._body()
+        data = base64.b64decode(body["content"]) if body.get("encoding") == "base64" else body["content"].encode()
+        sha = _blob_sha(data)
+        with gh.lock:
+            gh.blobs[sha] = data
+        return 201, {"sha": sha}, {}, None
+
+    def _blob_get(self, rest, query):
+        gh = self.gh
+        sha = re.match(r"^git/blobs/(.+)$", rest).group(1)
+        with gh.lock:
+            data = gh.blobs.get(sha)
+        if data is None:
+            return 404, {"message": "Not Found"}, {}, None
+        if "raw" in (self.headers.get("Accept") or ""):
+            return 200, None, {"Content-Type": "application/octet-stream"}, data
+        return 200, {"sha": sha, "size": len(data), "encoding": "base64",
+                     "content": base64.b64encode(data).decode("ascii")}, {}, None
+
+    def _tree_create(self, rest, query):
+        gh = self.gh
+        body = self._body()
+        with gh.lock:
+            files = dict(gh.trees.get(body.get("base_tree"), {}))
+            for e in body["tree"]:
+                if "content" in e:
+                    data = e["content"].encode("utf-8")
+                    sha = _blob_sha(data)
+                    gh.blobs[sha] = data
+                    files[e["path"]] = sha
+                elif e.get("sha") is None:
+                    files.pop(e["path"], None)
+                else:
+                    files[e["path"]] = e["sha"]
+            sha = gh._tree(files)
+        return 201, {"sha": sha}, {}, None
+
+    def _tree_get(self, rest, query):
+        # "<sha>" oder "<commit>:<pfad>" (Teilbaum eines Verzeichnisses); ohne recursive wie bei
+        # GitHub nur die oberste Ebene, Unterverzeichnisse als Einträge vom Typ "tree"
+        gh = self.gh
+        sha, _, verzeichnis = unquote(rest[len("git/trees/"):]).partition(":")
+        basis = f"{verzeichnis.strip('/')}/" if verzeichnis.strip("/") else ""
+        with gh.lock:
+            if sha in gh.commits:
+                sha = gh.commits[sha][0]
+            if sha not in gh.trees:
+                return 404, {"message": "Not Found"}, {}, None
+            files = {p[len(basis):]: b for p, b in gh.trees[sha].items() if p.startswith(basis)}
+            if basis and not files:
+                return 404, {"message": "Not Found"}, {}, None
+            eintraege = [{"path": p, "type": "blob", "mode": "100644", "sha": b, "size": len(gh.blobs[b])}
+                         for p, b in sorted(files.items()) if "recursive" in query or "/" not in p]
+            if "recursive" not in query:
+                eintraege += [{"path": d, "type": "tree", "mode": "040000", "sha": _obj_sha("tree", d)}
+                              for d in sorted({p.split("/")[0] for p in files if "/" in p})]
+        return 200, {"sha": sha, "truncated": False, "tree": eintraege}, {}, None
+
+    def _branch_get(self, rest, query):
+        return 200, {"name": self.gh.branch, "commit": {"sha": self.gh.head}}, {}, None
+
+    def _compare(self, rest, query):
+        gh = self.gh
+        base, head = re.match(r"^compare/(.+)\.\.\.(.+)$", rest).groups()
+        with gh.lock:
+            if base not in gh.commits or head not in gh.commits:
+                return 404, {"message": "Not Found"}, {}, None
+            alt, neu = gh.trees[gh.commits[base][0]], gh.trees[gh.commits[head][0]]
+            dateien = []
+            for p in sorted(set(alt) | set(neu)):
+                if alt.get(p) != neu.get(p):
+                    status = "added" if p not in alt else "removed" if p not in neu else "modified"
+                    dateien.append({"filename": p, "status": status, "sha": neu.get(p)})
+        return 200, {"status": "ahead", "files": dateien}, {}, None
@@ -0,0 +1,88 @@
+# benchmarks/import_time.py
+"""
+Kaltstart-Kosten: Importzeit der App-Module und Zeit bis zum ersten Rendern von Leitung.py,
+jeweils in einem frischen Python-Prozess (wie nach einem Neustart auf Streamlit Cloud).
+
+    python benchmarks/import_time.py                 # Median aus 5 Läufen
+    python benchmarks/import_time.py --runs 9 --json kaltstart.json
+
+"erstes Rendern" = AppTest-Lauf von Leitung.py im Schülermodus ohne Eingaben; gemessen wird
+ab Prozessstart inklusive aller Importe. Läuft mit dem Fake-Backend, also ohne Netz.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HIER = os.path.dirname(os.path.abspath(__file__))
+WURZEL = os.path.dirname(HIER)
+
+MODULE = ["storage_backend", "storage_github", "data_utils", "plot_utils", "pdf_utils",
+          "summary_utils", "export_utils", "bild_utils"]
+
+_ERSTES_RENDERN = """
+import time, warnings
+t0 = time.perf_counter()
+warnings.filterwarnings("ignore")
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+assert not at.exception, [e.value for e in at.exception]
+geladen = sorted(m for m in {module!r} if m in __import__("sys").modules)
+print(time.perf_counter() - t0, ",".join(geladen) or "-")
+"""
+
+
+def _umgebung() -> dict:
+    env = dict(os.environ, PYTHONPATH=WURZEL, KALORIK_STORAGE_BACKEND="fake", PYTHONDONTWRITEBYTECODE="")
+    env.pop("PYTHONWARNINGS", None)
+    return env
+
+
+def importzeit(modul: str, cwd: str) -> float:
+    """Kumulierte Importzeit eines Moduls in Sekunden (python -X importtime, frischer Prozess)."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modul}"],
+                       cwd=cwd, env=_umgebung(), capture_output=True, text=True, check=True)
+    for zeile in reversed(r.stderr.splitlines()):
+        teile = [t.strip() for t in zeile.split("|")]
+        if len(teile) == 3 and teile[2] == modul:
+            return int(teile[1]) / 1e6
+    raise RuntimeError(f"keine Importzeit für {modul}")
+
+
+def erstes_rendern(cwd: str):
+    code = _ERSTES_RENDERN.format(app=os.path.join(WURZEL, "Leitung.py"), module=MODULE)
+    r = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=_umgebung(),
+                       capture_output=True, text=True, check=True)
+    dauer, geladen = r.stdout.split()[-2:]
+    return float(dauer), geladen
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = ap.parse_args(argv)
+
+    cwd = tempfile.mkdtemp(prefix="kalorik-import-")  # ohne .streamlit/secrets.toml des Projekts
+    ergebnis = {"import_s": {}, "erstes_rendern_s": None, "geladen_nach_rendern": None}
+    for modul in MODULE:
+        werte = [importzeit(modul, cwd) for _ in range(args.runs)]
+        ergebnis["import_s"][modul] = round(statistics.median(werte), 4)
+        print(f"  import {modul:<16} {1000 * ergebnis['import_s'][modul]:8.1f} ms")
+    laeufe = [erstes_rendern(cwd) for _ in range(args.runs)]
+    ergebnis["erstes_rendern_s"] = round(statistics.median(d for d, _ in laeufe), 4)
+    ergebnis["geladen_nach_rendern"] = laeufe[-1][1]
+    print(f"  erstes Rendern (Schülermodus) {1000 * ergebnis['erstes_rendern_s']:8.1f} ms")
+    print(f"  danach geladene App-Module: {ergebnis['geladen_nach_rendern']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(ergebnis, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
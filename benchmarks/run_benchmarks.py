@@ -0,0 +1,227 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks der heißen Pfade (Speichern, Laden, Listen, PDF, Zusammenfassung, Diagramme, Station-E-Fit)
+gegen den lokalen GitHub-Nachbau aus fake_github.py – offline und reproduzierbar.
+
+    python benchmarks/run_benchmarks.py                         # 10/100/1000 Gruppen
+    python benchmarks/run_benchmarks.py --groups 10 --latency 0.05 --json ergebnis.json
+
+Je Operation: Latenz-Perzentile (p50/p95/p99), Requests je Endpunkt und Spitzen-Speicher
+(tracemalloc). "kalt" = alle Prozess-Caches geleert, "warm" = zweiter Durchlauf.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+HIER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HIER))
+sys.path.insert(0, HIER)
+
+from fake_github import FakeGitHub  # noqa: E402
+
+STATIONEN = ["A_-_W_rmeleitung", "C_-_W_rmestrahlung", "D_-_Thermosflasche", "E_-_Vergleich_Thermos_vs._Becher"]
+
+
+# ---------------------------------------------------------------- Testdaten
+def _csv_ac(rng: random.Random) -> bytes:
+    zeilen = ["Kategorie,Temperatur [°C]"]
+    zeilen += [f"{k},{rng.uniform(18, 80):.1f}" for k in ("Metall", "Holz", "Kunststoff", "Glas")]
+    return ("\ufeff" + "\n".join(zeilen) + "\n").encode("utf-8")
+
+
+def _csv_e(rng: random.Random) -> bytes:
+    zeilen = ["Zeit [min],Temperatur Thermos [°C],Temperatur Becher [°C]"]
+    t_thermos, t_becher = rng.uniform(75, 90), rng.uniform(75, 90)
+    for minute in range(0, 31, 2):
+        zeilen.append(f"{minute},{t_thermos:.1f},{t_becher:.1f}")
+        t_thermos -= rng.uniform(0.05, 0.3)
+        t_becher -= rng.uniform(0.8, 2.0)
+    return ("\ufeff" + "\n".join(zeilen) + "\n").encode("utf-8")
+
+
+def klassendaten(gruppen: int, seed: int) -> dict:
+    """Dateien wie sie die App schreibt: je Gruppe A/C/E mit Messwerten, D nur mit Auswertung."""
+    rng = random.Random(seed)
+    files = {}
+    for i in range(1, gruppen + 1):
+        for station in STATIONEN:
+            ziel = f"G{i:04d}_{station}.csv"
+            if station.startswith("E"):
+                csv = _csv_e(rng)
+            elif station.startswith("D"):
+                csv = b""
+            else:
+                csv = _csv_ac(rng)
+            files[ziel] = csv
+            text = f"Gruppe {i}: Beobachtung zu {station} – Wärme fließt vom Warmen zum Kalten. " * rng.randint(1, 6)
+            files[ziel.replace(".csv", "_auswertung.txt")] = text.encode("utf-8")
+    return files
+
+
+# ---------------------------------------------------------------- Messung
+def _perzentile(werte: list) -> dict:
+    werte = sorted(werte)
+    n = len(werte)
+    if not n:
+        return {}
+
+    def p(q):
+        return round(1000 * werte[min(n - 1, int(q * n))], 2)
+    return {"n": n, "p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "max_ms": round(1000 * werte[-1], 2)}
+
+
+def messe(name: str, fake: FakeGitHub, fn, laeufe, ergebnisse: list, **extra) -> None:
+    """Führt fn(arg) für jedes arg in laeufe aus und hängt eine Ergebniszeile an."""
+    vorher = Counter(fake.requests)
+    tracemalloc.reset_peak()
+    basis = tracemalloc.get_traced_memory()[0]
+    dauer = []
+    for arg in laeufe:
+        t0 = time.perf_counter()
+        fn(arg)
+        dauer.append(time.perf_counter() - t0)
+    peak = tracemalloc.get_traced_memory()[1] - basis
+    requests = {k: v - vorher.get(k, 0) for k, v in fake.requests.items() if v - vorher.get(k, 0)}
+    zeile = {"op": name, **extra, **_perzentile(dauer), "requests": requests,
+             "requests_gesamt": sum(requests.values()), "peak_mb": round(peak / 2 ** 20, 2)}
+    ergebnisse.append(zeile)
+    print(f"  {name:<28} p50 {zeile['p50_ms']:>9.2f} ms  p95 {zeile['p95_ms']:>9.2f} ms  "
+          f"req {zeile['requests_gesamt']:>6}  peak {zeile['peak_mb']:>7.2f} MB")
+
+
+def caches_leeren() -> None:
+    """Alle Prozess-Caches leeren (Zustand wie nach einem Neustart der App)."""
+    import data_utils
+    import pdf_utils
+    import plot_utils
+    import storage_github
+    import summary_utils
+
+    for cache in (data_utils._DF_CACHE, data_utils._VERSIONEN, storage_github._DOWNLOAD_CACHE,
+                  storage_github._KNOWN_SHA, summary_utils._ABSCHNITTE, summary_utils._SUMMARY_PDF,
+                  plot_utils._PNG_CACHE, pdf_utils._PNG_INFO, pdf_utils._PDF_CACHE):
+        cache.clear()
+    storage_github._SHARED.clear()
+    storage_github._HEAD_SEEN.update(sha=None, at=0.0)
+    storage_github._REF_CACHE.update(etag=None, sha=None)
+    storage_github._HEAD["state"] = None
+
+
+def scheduler_neu(write_interval: float) -> None:
+    """Frischer Scheduler je Szenario (Kontingent/Takt des vorigen Servers vergessen)."""
+    import storage_github
+    storage_github._SCHEDULER = storage_github._Scheduler(write_interval=write_interval)
+
+
+def szenario(gruppen: int, args, ergebnisse: list) -> None:
+    import pandas as pd
+
+    import storage_github
+    from abkuehlung_utils import klassen_abkuehlung
+    from data_utils import lade_daten, lade_klasse, speichere_daten
+    from pdf_utils import create_pdf
+    from plot_utils import plot_balken_png, plot_verlauf_png
+    from summary_utils import create_summary_pdf
+
+    fake = FakeGitHub(latency=args.latency, rate_limit=args.rate_limit).start()
+    os.environ["GITHUB_API_URL"] = fake.url  # jedes Szenario mit eigenem, frischem Server
+    storage_github._settings.cache_clear()
+    scheduler_neu(args.write_interval)
+    try:
+        basis = storage_github.BASE_PATH
+        daten = klassendaten(gruppen, args.seed)
+        fake.seed({f"{basis}/{p}": d for p, d in daten.items()})
+        caches_leeren()
+        rng = random.Random(args.seed)
+        csvs = sorted(p for p in daten if p.endswith(".csv"))
+        stichprobe = rng.sample(csvs, min(args.samples, len(csvs)))
+        mit_werten = [z for z in stichprobe if daten[z]]
+        tabellen = {z: pd.read_csv(io.BytesIO(daten[z])) for z in mit_werten}
+        verlauf = [z for z in mit_werten if z.split("_")[1] == "E"]
+        balken = [z for z in mit_werten if z.split("_")[1] in ("A", "C")]
+        extra = {"gruppen": gruppen, "latenz_s": args.latency}
+        print(f"\n{gruppen} Gruppen ({len(daten)} Dateien), Latenz {args.latency * 1000:.0f} ms")
+
+        messe("gh_list_csv kalt", fake, lambda _: storage_github.gh_list_csv(), [0], ergebnisse, **extra)
+        messe("gh_list_csv warm", fake, lambda _: storage_github.gh_list_csv(), range(5), ergebnisse, **extra)
+        caches_leeren()
+        messe("lade_daten kalt", fake, lade_daten, stichprobe, ergebnisse, **extra)
+        messe("lade_daten warm", fake, lade_daten, stichprobe, ergebnisse, **extra)
+
+        def speichern(z):
+            df = tabellen[z].copy()
+            df.iloc[0, -1] = float(df.iloc[0, -1]) + 0.1
+            speichere_daten(None, df, "neue Auswertung", zielname=z, write_behind=False)
+        messe("speichere_daten geändert", fake, speichern, mit_werten, ergebnisse, **extra)
+        messe("speichere_daten unverändert", fake,
+              lambda z: speichere_daten(None, *lade_daten(z), zielname=z, write_behind=False),
+              mit_werten, ergebnisse, **extra)
+
+        messe("plot_balken_png", fake, lambda z: plot_balken_png(tabellen[z], z.split("_")[1], z[:5]),
+              balken, ergebnisse, **extra)
+        messe("plot_verlauf_png", fake, lambda z: plot_verlauf_png(tabellen[z], "E", z[:5]),
+              verlauf, ergebnisse, **extra)
+        messe("create_pdf", fake,
+              lambda z: create_pdf(z[:5], z.split("_")[1], tabellen[z], "Auswertung " * 40), mit_werten,
+              ergebnisse, **extra)
+
+        caches_leeren()
+        messe("create_summary_pdf kalt", fake, lambda _: create_summary_pdf(), [0], ergebnisse, **extra)
+        messe("create_summary_pdf warm", fake, lambda _: create_summary_pdf(), range(3), ergebnisse, **extra)
+
+        dateien_e = [z for z in csvs if z.split("_")[1] == "E"]
+        messe("klassen_abkuehlung", fake, lambda _: klassen_abkuehlung(lade_klasse(dateien_e)[0]), range(3),
+              ergebnisse, **extra)
+    finally:
+        fake.stop()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--groups", type=int, nargs="+", default=[10, 100, 1000], help="Klassengrößen (Gruppen)")
+    ap.add_argument("--latency", type=float, default=0.02, help="künstliche Latenz je Request in s")
+    ap.add_argument("--rate-limit", type=int, default=1_000_000, help="Requests je Stunde (GitHub: 5000)")
+    ap.add_argument("--write-interval", type=float, default=0.75,
+                    help="Mindestabstand schreibender Requests in s (Scheduler, 0 = ungebremst)")
+    ap.add_argument("--samples", type=int, default=40, help="Stichprobe für Einzeloperationen")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = ap.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    # Nie gegen das echte GitHub: Konfiguration nur aus der Umgebung, ohne Write-behind-Journal
+    # im Arbeitsverzeichnis, und .streamlit/secrets.toml des Projekts bleibt außen vor.
+    os.chdir(tempfile.mkdtemp(prefix="kalorik-bench-"))
+    os.environ.update({
+        "GITHUB_API_URL": "http://127.0.0.1:9",  # Platzhalter, pro Szenario ersetzt
+        "GITHUB_TOKEN": "benchmark", "GITHUB_OWNER": "bench", "GITHUB_REPO": "kalorik",
+        "GITHUB_BRANCH": "main", "GITHUB_BASE_PATH": "KalorikDaten",
+        "KALORIK_STORAGE_BACKEND": "github", "KALORIK_STORAGE_WRITE_BEHIND": "0",
+    })
+    import matplotlib
+    matplotlib.use("Agg")
+    import storage_github
+    if not storage_github.API.startswith("http://127.0.0.1"):
+        print(f"Abbruch: API zeigt auf {storage_github.API} (st.secrets?) statt auf den lokalen Fake.")
+        return 2
+
+    tracemalloc.start()
+    ergebnisse = []
+    for gruppen in args.groups:
+        szenario(gruppen, args, ergebnisse)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "ergebnisse": ergebnisse}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
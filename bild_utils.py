@@ -0,0 +1,137 @@
+# bild_utils.py
+"""
+Aufbereitung der Station-B-Fotos vor dem Speichern (Pillow, kommt mit matplotlib):
+Ausrichtung aus den EXIF-Daten übernehmen, auf storage.bild_max_kante (1600) verkleinern, neu komprimieren
+und eine kleine Vorschau für die Galerie im Lehrkraftmodus erzeugen.
+
+Handyfotos (3–8 MB) werden so typischerweise zu 200–500 kB, die Vorschau zu wenigen kB.
+Dasselbe Rohbild wird pro Prozess nur einmal verarbeitet (Cache über den Inhalts-Hash).
+"""
+import hashlib
+import io
+from typing import NamedTuple, Optional
+
+from cache_utils import LRUCache
+from storage_backend import storage_cfg
+
+
+def _einstellung(key: str, default: int) -> int:
+    # erst beim ersten Bild gelesen, nicht beim Import
+    return int(storage_cfg(key, str(default)) or default)
+
+
+# sha1 des Rohbilds -> AufbereitetesBild (Streamlit rerunnt bei jeder Eingabe mit demselben Upload)
+_AUFBEREITET = LRUCache(max_entries=32)
+
+
+class AufbereitetesBild(NamedTuple):
+    daten: bytes      # verkleinertes, neu komprimiertes Bild
+    endung: str       # ".jpg" (Fotos) oder ".png" (Bilder mit Transparenz)
+    vorschau: bytes   # JPEG, längste Kante storage.vorschau_kante (320)
+    original_groesse: int
+
+
+def vorschau_dateiname(bild_dateiname: str) -> str:
+    """'G1_B_-_Konvektion_bild.jpg' -> 'G1_B_-_Konvektion_bild_vorschau.jpg'"""
+    stamm = bild_dateiname.rsplit(".", 1)[0]
+    return f"{stamm}_vorschau.jpg"
+
+
+def _auf_weiss(im):
+    from PIL import Image
+    im = im.convert("RGBA")
+    weiss = Image.new("RGB", im.size, (255, 255, 255))
+    weiss.paste(im, mask=im.split()[-1])
+    return weiss
+
+
+def _hat_transparenz(im) -> bool:
+    if im.mode in ("RGBA", "LA") or "transparency" in im.info:
+        alpha = im.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+
+def _jpeg(im, qualitaet: int) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", quality=qualitaet, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+# APP1 (EXIF inkl. GPS, XMP), APP13 (IPTC) und Kommentare; JFIF, ICC-Profil und Adobe bleiben
+_METADATEN_MARKER = {0xE1, 0xED, 0xFE}
+
+
+def _ohne_metadaten(jpeg: bytes) -> Optional[bytes]:
+    """
+    JPEG ohne Metadaten-Segmente, verlustfrei (Bilddaten ab SOS unverändert).
+    None, wenn der Aufbau unerwartet ist.
+    """
+    if jpeg[:2] != b"\xff\xd8":
+        return None
+    teile, pos = [jpeg[:2]], 2
+    while pos + 4 <= len(jpeg):
+        if jpeg[pos] != 0xFF:
+            return None
+        marker = jpeg[pos + 1]
+        if marker == 0xFF:  # Füllbyte
+            pos += 1
+            continue
+        if marker == 0xDA:  # Start of Scan: Rest sind Bilddaten
+            teile.append(jpeg[pos:])
+            return b"".join(teile)
+        laenge = int.from_bytes(jpeg[pos + 2:pos + 4], "big")
+        if laenge < 2 or pos + 2 + laenge > len(jpeg):
+            return None
+        if marker not in _METADATEN_MARKER:
+            teile.append(jpeg[pos:pos + 2 + laenge])
+        pos += 2 + laenge
+    return None
+
+
+def vorschau(data: bytes, kante: Optional[int] = None) -> bytes:
+    """Kleine JPEG-Vorschau eines beliebigen Bildes (auch für ältere Uploads ohne Vorschau)."""
+    from PIL import Image, ImageOps
+    kante = kante or _einstellung("vorschau_kante", 320)
+    im = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    im = _auf_weiss(im) if im.mode != "RGB" else im
+    im.thumbnail((kante, kante), Image.LANCZOS)
+    return _jpeg(im, 70)
+
+
+def bild_aufbereiten(data: bytes, max_kante: Optional[int] = None,
+                     qualitaet: Optional[int] = None) -> AufbereitetesBild:
+    """
+    Rohes Upload-Bild -> AufbereitetesBild. Ausrichtung wird in die Pixel übernommen (EXIF-Tag
+    und übrige Metadaten wie GPS entfallen), die längste Kante auf max_kante begrenzt.
+    Wäre das Ergebnis größer als das Original (schon kleines, gut komprimiertes JPEG), bleibt
+    es bei dessen Bilddaten, nur die Metadaten-Segmente werden entfernt.
+    """
+    max_kante = max_kante or _einstellung("bild_max_kante", 1600)
+    qualitaet = qualitaet or _einstellung("bild_qualitaet", 82)
+    schluessel = (hashlib.sha1(data).hexdigest(), max_kante, qualitaet)
+    fertig = _AUFBEREITET.get(schluessel)
+    if fertig is not None:
+        return fertig
+
+    from PIL import Image, ImageOps
+    roh = Image.open(io.BytesIO(data))
+    format_roh = roh.format
+    gedreht = roh.getexif().get(0x0112, 1) not in (0, 1)  # Orientation-Tag
+    im = ImageOps.exif_transpose(roh)
+    im.thumbnail((max_kante, max_kante), Image.LANCZOS)
+
+    if _hat_transparenz(im):
+        buf = io.BytesIO()
+        im.convert("RGBA").save(buf, format="PNG", optimize=True)
+        daten, endung = buf.getvalue(), ".png"
+    else:
+        daten, endung = _jpeg(im.convert("RGB"), qualitaet), ".jpg"
+    if (format_roh == "JPEG" and endung == ".jpg" and not gedreht
+            and im.size == roh.size and len(daten) >= len(data)):
+        # Original behalten, aber ohne EXIF/GPS (verlustfrei); sonst bleibt es beim neu komprimierten Bild
+        daten = _ohne_metadaten(data) or daten
+
+    fertig = AufbereitetesBild(daten, endung, vorschau(daten), len(data))
+    _AUFBEREITET.put(schluessel, fertig)
+    return fertig
@@ -0,0 +1,148 @@
+# cache_utils.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class LRUCache:
+    """
+    Kleiner threadsicherer LRU-Cache mit fester Maximalanzahl an Einträgen.
+    Streamlit bedient alle Sessions aus einem Prozess (Threads), daher das Lock.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SharedCache:
+    """
+    Prozessweite Ablage, die sich alle Streamlit-Sessions teilen: begrenzt nach Bytes statt
+    nach Einträgen (sizeof schätzt die Größe eines Werts), threadsicher und mit Single-Flight –
+    fragen viele Sessions gleichzeitig nach einem fehlenden Schlüssel, lädt nur eine, die
+    übrigen warten auf dasselbe Ergebnis.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max(1, int(max_bytes))
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._loading: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._data:
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key][0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return  # größer als die ganze Ablage: nicht aufnehmen statt alles zu verdrängen
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return self._data[key][0]
+                laeuft = self._loading.get(key)
+                if laeuft is None:
+                    laeuft = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Eine andere Session lädt schon; danach erneut nachsehen (schlug das Laden fehl,
+            # lädt diese Session selbst)
+            laeuft.wait()
+        try:
+            value = loader()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, size = self._data.pop(key)
+            self._bytes -= size
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def hash_dataframe(df) -> str:
+    """Stabiler Inhalts-Hash eines DataFrames (Spalten, dtypes, Werte) als Cache-Schlüssel."""
+    import pandas as pd
+    h = hashlib.sha1()
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
@@ -0,0 +1,155 @@
+# dashboard_utils.py
+"""
+Live-Übersicht der Klasse für den Lehrkraftmodus: ein Raster Gruppe × Station mit Abgabestand,
+letzter Änderung und Mini-Diagramm der Messwerte.
+
+Gepollt wird nur die Version des Speichers (backend.head(), bei GitHub eine bedingte Anfrage auf
+den Branch-Head). Solange sie sich nicht bewegt, kommt das Raster aus dem Speicher; bewegt sie sich,
+liefert das Listing die neuen Blob-shas (bei GitHub per Compare nur die geänderten Pfade), und
+geladen werden ausschließlich CSVs, deren sha noch nicht bekannt ist.
+
+Der Stand ist prozessweit, je Sitzung (Namensraum) getrennt und wird von allen
+Lehrkraft-Sessions geteilt; gelistet wird nur das Verzeichnis der Sitzung. Listing und Nachladen
+laufen ohne Lock und je (Sitzung, Head) nur einmal, auch wenn mehrere Sessions gleichzeitig pollen;
+das Lock schützt nur den Austausch des fertigen Stands.
+"""
+import io
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from cache_utils import LRUCache, SharedCache
+from constants import STATIONEN
+from namensraum_utils import ALTBESTAND, Namensraum, eintraege as namensraum_eintraege
+from storage_backend import DateiEintrag, get_backend
+
+BUCHSTABEN = [s[0] for s in STATIONEN]
+MIT_DIAGRAMM = {"A": "Temperatur [°C]", "C": "Temperatur [°C]", "E": "Temperatur Becher [°C]"}
+
+# (pfad, sha) -> Messwerte für das Mini-Diagramm; inhaltsadressiert, also nie veraltet
+_WERTE = LRUCache(max_entries=4096)
+
+# Präfix der Sitzung -> {"head", "shas", "geaendert", "tabelle", "seit"}; wird nie verändert,
+# sondern als Ganzes ersetzt, Leser brauchen also kein Lock
+_STAENDE = LRUCache(max_entries=32)
+_STAND_LOCK = threading.Lock()
+_LEER = {"head": None, "shas": {}, "geaendert": {}, "tabelle": None, "seit": None}
+
+# (Präfix, Head) -> Einträge der Sitzung mit nachgeladenen Mini-Diagramm-Werten;
+# Größe in Einträgen, get_or_load bündelt gleichzeitige Abrufe desselben Heads
+_LISTINGS = SharedCache(max_bytes=100_000, sizeof=len)
+
+
+def _stand(ns: Namensraum) -> dict:
+    return _STAENDE.get(ns.praefix) or _LEER
+
+
+def _aktuell(stand: dict, head: Optional[str]) -> bool:
+    return head is not None and head == stand["head"] and stand["tabelle"] is not None
+
+
+def _listing(ns: Namensraum, head: Optional[str]) -> List[DateiEintrag]:
+    def laden() -> List[DateiEintrag]:
+        eintraege = namensraum_eintraege(ns)
+        _lade_werte(eintraege)
+        return eintraege
+    if head is None:  # Backend ohne Version: nichts, woran sich ein Abruf wiedererkennen ließe
+        return laden()
+    return _LISTINGS.get_or_load((ns.praefix, head), laden)
+
+
+def _werte(csv_bytes: bytes, spalte: str) -> List[float]:
+    try:
+        df = pd.read_csv(io.BytesIO(csv_bytes))
+    except Exception:  # leer (Station D) oder kaputt: kein Diagramm
+        return []
+    if spalte not in df.columns:
+        return []
+    return pd.to_numeric(df[spalte], errors="coerce").dropna().round(1).tolist()
+
+
+def _lade_werte(eintraege: List[DateiEintrag]) -> None:
+    """Mini-Diagramm-Werte für alle CSVs nachladen, deren Version noch unbekannt ist."""
+    fehlend = {e.pfad: e for e in eintraege
+               if e.art == "csv" and e.station[:1] in MIT_DIAGRAMM and (e.pfad, e.sha) not in _WERTE}
+    if not fehlend:
+        return
+    for pfad, result, _ in get_backend().get_many(fehlend):
+        e = fehlend[pfad]
+        # Fehler: leer merken, beim nächsten Head-Wechsel dieser Datei wird neu geladen
+        werte = _werte(result[0], MIT_DIAGRAMM[e.station[:1]]) if result is not None else []
+        _WERTE.put((pfad, e.sha), werte)
+
+
+def _zelle(arten: set, buchstabe: str) -> str:
+    fertig = "bild" in arten if buchstabe == "B" else {"csv", "auswertung"} <= arten
+    if fertig:
+        return "✅"
+    return "◐" if arten else ""
+
+
+def _raster(eintraege: List[DateiEintrag], geaendert: Dict[str, datetime]) -> pd.DataFrame:
+    gruppen: Dict[str, dict] = {}
+    for e in eintraege:
+        buchstabe = e.station[:1]
+        if e.art == "sonstig" or buchstabe not in BUCHSTABEN or not e.gruppe:
+            continue
+        zeile = gruppen.setdefault(e.gruppe, {"arten": {}, "werte": {}, "zuletzt": None})
+        zeile["arten"].setdefault(buchstabe, set()).add(e.art)
+        if e.art == "csv" and buchstabe in MIT_DIAGRAMM:
+            zeile["werte"][buchstabe] = _WERTE.get((e.pfad, e.sha), [])
+        zeit = geaendert.get(e.pfad)
+        if zeit is not None and (zeile["zuletzt"] is None or zeit > zeile["zuletzt"]):
+            zeile["zuletzt"] = zeit
+
+    zeilen = []
+    for gruppe, z in sorted(gruppen.items()):
+        zeile = {"Gruppe": gruppe}
+        for b in BUCHSTABEN:
+            zeile[b] = _zelle(z["arten"].get(b, set()), b)
+            if b in MIT_DIAGRAMM:
+                zeile[f"{b} Werte"] = z["werte"].get(b, [])
+        zeile["Abgaben"] = sum(zeile[b] == "✅" for b in BUCHSTABEN)
+        zeile["Letzte Änderung"] = z["zuletzt"]
+        zeilen.append(zeile)
+    spalten = ["Gruppe"] + [s for b in BUCHSTABEN for s in ([b, f"{b} Werte"] if b in MIT_DIAGRAMM else [b])]
+    return pd.DataFrame(zeilen, columns=spalten + ["Abgaben", "Letzte Änderung"])
+
+
+def klassen_uebersicht(ns: Namensraum = ALTBESTAND) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Raster Gruppe × Station einer Sitzung und die seit dem letzten Aufruf geänderten Pfade.
+    "Letzte Änderung" kennt nur Änderungen, die dieser Prozess seit seinem Start beobachtet hat.
+    """
+    head = get_backend().head()
+    stand = _stand(ns)
+    if _aktuell(stand, head):
+        return stand["tabelle"].copy(), []
+    eintraege = _listing(ns, head)
+    neu = {e.pfad: e.sha for e in eintraege}
+    while True:
+        jetzt = datetime.now()
+        erster_lauf = stand["seit"] is None
+        alt = stand["shas"]
+        geaendert = sorted(p for p in neu.keys() | alt.keys() if neu.get(p) != alt.get(p))
+        zeiten = dict(stand["geaendert"])
+        if not erster_lauf:
+            zeiten.update(dict.fromkeys(geaendert, jetzt))
+        tabelle = _raster(eintraege, zeiten)
+        with _STAND_LOCK:
+            vorher = _stand(ns)
+            if vorher is stand:
+                _STAENDE.put(ns.praefix, {"head": head, "shas": neu, "geaendert": zeiten,
+                                          "tabelle": tabelle, "seit": stand["seit"] or jetzt})
+                return tabelle.copy(), ([] if erster_lauf else geaendert)
+        # eine andere Session war schneller: deren Stand übernehmen oder gegen ihn neu vergleichen
+        stand = vorher
+        if _aktuell(stand, head):
+            return stand["tabelle"].copy(), []
+
+
+def beobachtet_seit(ns: Namensraum = ALTBESTAND) -> Optional[datetime]:
+    stand = _STAENDE.get(ns.praefix)
+    return stand["seit"] if stand else None
@@ -1,32 +1,232 @@
 # data_utils.py
 import io
+from typing import Iterable, Iterator, Optional, Tuple
 import pandas as pd
-from storage_github import gh_upload_bytes, gh_download_bytes
+from cache_utils import LRUCache
+from save_queue import get_queue, write_behind_enabled
+from storage_backend import get_backend, git_blob_sha
 
-def speichere_daten(pfad_ignoriert: str, df: pd.DataFrame, auswertung: str, zielname: str = None):
+# Geparste DataFrames je Zielname: zielname -> (Version, DataFrame).
+# Solange das Backend für die CSV dieselbe Version (Blob-sha) liefert, entfällt das erneute pd.read_csv.
+_DF_CACHE = LRUCache(max_entries=512)
+
+# Zuletzt bestätigte Version (Blob-sha) je Datei samt Head des Speichers, zu dem sie galt:
+# rel_path -> (head, sha), aus Laden und direktem Schreiben (nicht aus der Write-behind-Queue, die
+# hat noch nichts bestätigt). Stimmt der neue Inhalt damit überein und ist der Speicher seitdem
+# nicht weitergelaufen, wird nichts geschrieben – Streamlit-Reruns erzeugen so keine leeren Commits.
+# Hat sich der Head bewegt (anderer Tab, andere Instanz), entscheidet das Backend.
+_VERSIONEN = LRUCache(max_entries=4096)
+
+def _merke(rel_path: str, version: str, head: Optional[str]) -> None:
+    if head is None:
+        _VERSIONEN.pop(rel_path)
+    else:
+        _VERSIONEN.put(rel_path, (head, version))
+
+def _unveraendert(rel_path: str, data: bytes, head: Optional[str]) -> bool:
+    return head is not None and _VERSIONEN.get(rel_path) == (head, git_blob_sha(data))
+
+def auswertung_dateiname(zielname: str) -> str:
+    return zielname.replace(".csv", "_auswertung.txt")
+
+def _pending(rel_path: str) -> Optional[Tuple[bytes, str]]:
+    """Noch nicht synchronisierter Stand aus der Write-behind-Queue (Read-your-writes)."""
+    if not write_behind_enabled():
+        return None
+    data = get_queue().pending_file(rel_path)
+    return None if data is None else (data, git_blob_sha(data))
+
+def _get(rel_path: str) -> Tuple[bytes, str]:
+    pending = _pending(rel_path)
+    if pending is not None:
+        return pending
+    # Head vor dem Lesen: kommt ein neuerer Stand zurück, passt der gemerkte Head nie und es
+    # wird im Zweifel geschrieben statt übersprungen
+    head = get_backend().head()
+    result = get_backend().get(rel_path)
+    _merke(rel_path, result[1], head)
+    return result
+
+def _lade_csv(zielname: str) -> pd.DataFrame:
+    csv_bytes, version = _get(zielname)
+    return _parse_csv(zielname, csv_bytes, version)
+
+def _parse_csv(zielname: str, csv_bytes: bytes, version: str) -> pd.DataFrame:
+    cached = _DF_CACHE.get(zielname)
+    if cached and cached[0] == version:
+        return cached[1].copy()
+    try:
+        df = pd.read_csv(io.BytesIO(csv_bytes))
+    except pd.errors.EmptyDataError:  # z. B. Station D: nur Auswertung, keine Messwerte
+        df = pd.DataFrame()
+    _DF_CACHE.put(zielname, (version, df))
+    return df.copy()
+
+def speichere_daten(pfad_ignoriert: str, df: pd.DataFrame, auswertung: str, zielname: str = None,
+                    write_behind: Optional[bool] = None) -> str:
+    """
+    Speichert CSV + Auswertung. Gibt "synced" zurück, wenn direkt geschrieben wurde,
+    "pending", wenn der Stand im Write-behind-Journal liegt und im Hintergrund synchronisiert wird,
+    oder "unchanged", wenn beide Inhalte der zuletzt bekannten Version entsprechen.
+    """
     if zielname is None:
         import os
         zielname = os.path.basename(pfad_ignoriert) if pfad_ignoriert else "unbenannt.csv"
 
     csv_bytes = df.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
-    gh_upload_bytes(zielname, csv_bytes, message=f"Save CSV: {zielname}")
+    txt_name = auswertung_dateiname(zielname)
+
+    files = {zielname: csv_bytes, txt_name: (auswertung or "").encode("utf-8")}
+    message = f"Save: {zielname}"
+    head = get_backend().head()
+    if all(_unveraendert(p, d, head) for p, d in files.items()):
+        return "unchanged"
 
-    txt_name = zielname.replace(".csv", "_auswertung.txt")
-    gh_upload_bytes(txt_name, (auswertung or "").encode("utf-8"), message=f"Save TXT: {txt_name}")
+    if write_behind is None:
+        write_behind = write_behind_enabled()
+    if write_behind:
+        # immer beide Dateien einreihen: die Queue fasst pro Zielname auf den letzten Stand zusammen
+        get_queue().enqueue(zielname, files, message)
+        # bestätigt ist erst der synchronisierte Stand; ob er dann unverändert ist, prüft das Backend
+        for p in files:
+            _VERSIONEN.pop(p)
+        return "pending"
+    # CSV und Auswertung in einem Commit – entweder beide oder keine
+    get_backend().put_many({p: d for p, d in files.items() if not _unveraendert(p, d, head)}, message=message)
+    head = get_backend().head()
+    for p, d in files.items():
+        _merke(p, git_blob_sha(d), head)
+    return "synced"
+
+def speichere_bild(bild_dateiname: str, data: bytes, message: str, vorschau: Optional[bytes] = None) -> str:
+    """
+    Speichert ein Bild (Station B) samt Vorschau in einem Commit; Binärdaten gehen dabei über
+    den Blob-Endpunkt statt als Contents-PUT. Ältere Fassungen mit anderer Endung (.png/.jpg)
+    werden im selben Commit entfernt. "unchanged", wenn genau dieses Bild schon gespeichert ist.
+    """
+    from bild_utils import vorschau_dateiname
+    files = {bild_dateiname: data}
+    if vorschau is not None:
+        files[vorschau_dateiname(bild_dateiname)] = vorschau
+    head = get_backend().head()
+    files = {p: d for p, d in files.items() if not _unveraendert(p, d, head)}
+    if not files:
+        return "unchanged"
+    stamm = bild_dateiname.rsplit(".", 1)[0]
+    for e in get_backend().list_entries(stamm):
+        if e.art == "bild" and e.pfad != bild_dateiname and e.pfad.rsplit(".", 1)[0] == stamm:
+            files[e.pfad] = None
+    versionen = get_backend().put_many(files, message=message)
+    head = get_backend().head()
+    for p in files:
+        if p in versionen:
+            _merke(p, versionen[p], head)
+        else:
+            _VERSIONEN.pop(p)
+    return "synced"
 
 def lade_daten(zielname: str):
     df = pd.DataFrame()
     auswertung = ""
     try:
-        csv_bytes = gh_download_bytes(zielname)
-        df = pd.read_csv(io.BytesIO(csv_bytes))
+        df = _lade_csv(zielname)
     except Exception:
         df = pd.DataFrame()
 
     try:
-        txt_bytes = gh_download_bytes(zielname.replace(".csv", "_auswertung.txt"))
+        txt_bytes, _ = _get(auswertung_dateiname(zielname))
         auswertung = txt_bytes.decode("utf-8", errors="ignore")
     except Exception:
         auswertung = ""
 
     return df, auswertung
+
+def lade_viele(zielnamen: Iterable[str]) -> Iterator[Tuple[str, pd.DataFrame, str, Optional[Exception]]]:
+    """
+    Lädt CSV + Auswertung für viele Zielnamen parallel über backend.get_many und liefert
+    (zielname, df, auswertung, fehler) sobald beide Dateien einer Gruppe/Station da sind.
+    Fehlt nur die Auswertung, ist das kein Fehler; ein CSV-Fehler betrifft nur diesen Eintrag.
+    """
+    zielnamen = list(dict.fromkeys(zielnamen))
+    pfade = {}
+    for z in zielnamen:
+        pfade[z] = z
+        pfade[auswertung_dateiname(z)] = z
+    offen = {z: {} for z in zielnamen}
+
+    head = get_backend().head()
+    for pfad, result, err in get_backend().get_many(pfade):
+        z = pfade[pfad]
+        pending = _pending(pfad)
+        if pending is not None:
+            result, err = pending, None
+        elif result is not None:
+            _merke(pfad, result[1], head)
+        offen[z][pfad] = (result, err)
+        if len(offen[z]) < 2:
+            continue
+        teile = offen.pop(z)
+        (csv_res, csv_err), (txt_res, _) = teile[z], teile[auswertung_dateiname(z)]
+        df, fehler = pd.DataFrame(), csv_err
+        if csv_res is not None:
+            try:
+                df = _parse_csv(z, *csv_res)
+            except Exception as e:
+                fehler = e
+        auswertung = txt_res[0].decode("utf-8", errors="ignore") if txt_res else ""
+        yield z, df, auswertung, fehler
+
+def lade_klasse(zielnamen: Iterable[str], fortschritt=None) -> Tuple[pd.DataFrame, list]:
+    """
+    Messwerte der ganzen Klasse als ein DataFrame (mit Spalten Gruppe/Station) plus Fehlerliste.
+    Mit Klassendatensatz (storage.format = "datensatz") eine Abfrage je Station; Dateien, die noch
+    nicht in den Datensatz übernommen sind, kommen wie ohne Datensatz CSV für CSV über lade_viele.
+    fortschritt(n, gesamt) meldet geladene Dateien (beim Datensatz je Verzeichnis gesammelt).
+    """
+    backend = get_backend()
+    zielnamen = list(dict.fromkeys(zielnamen))
+    if getattr(backend, "format", None) != "datensatz":
+        return _lade_einzeln(zielnamen, fortschritt)
+    from storage_datensatz import als_app_tabelle, verzeichnis, zerlege
+    teile, vorhanden = [], set()
+    # je Verzeichnis (Sitzung) ein eigener Datensatz, in der Regel also genau eine Abfrage-Runde
+    for ordner in sorted({verzeichnis(z) for z in zielnamen}) or [""]:
+        namen = [z for z in zielnamen if verzeichnis(z) == ordner]
+        stationen = sorted({t[1] for t in map(zerlege, namen) if t is not None})
+        tabelle = backend.tabelle(stationen, ordner=ordner)
+        pfade = ordner + tabelle["gruppe"] + "_" + tabelle["station"] + ".csv"
+        vorhanden.update(pfade[pfade.isin(namen)])
+        teile.append(tabelle[pfade.isin(namen)])
+        if fortschritt is not None:
+            fortschritt(len(vorhanden), len(zielnamen))
+    klasse = als_app_tabelle(pd.concat(teile, ignore_index=True))
+    # Einzeldateien ohne Zeile im Datensatz (noch nicht migriert) nicht stillschweigend auslassen
+    fehlend = [z for z in zielnamen if z not in vorhanden]
+    if not fehlend:
+        return klasse, []
+    def weiter(n, _):
+        fortschritt(len(vorhanden) + n, len(zielnamen))
+    einzeln, fehlerliste = _lade_einzeln(fehlend, weiter if fortschritt is not None else None)
+    teile = [t for t in (klasse, einzeln) if not t.empty]
+    return (pd.concat(teile, ignore_index=True) if teile else pd.DataFrame()), fehlerliste
+
+def _lade_einzeln(zielnamen: list, fortschritt=None) -> Tuple[pd.DataFrame, list]:
+    tabellen, zuordnung, fehlerliste = [], [], []
+    for i, (datei, df, _, fehler) in enumerate(lade_viele(zielnamen), start=1):
+        if fortschritt is not None:
+            fortschritt(i, len(zielnamen))
+        if fehler is not None:
+            fehlerliste.append({"Datei": datei, "Fehler": str(fehler)})
+            continue
+        gruppe, _, station = datei.rsplit("/", 1)[-1].rsplit(".", 1)[0].partition("_")
+        if not df.empty:
+            tabellen.append(df)
+            zuordnung.append((gruppe, station, len(df)))
+    if not tabellen:
+        return pd.DataFrame(), fehlerliste
+    # Gruppe/Station einmal für alle Zeilen setzen statt je DataFrame (bei hunderten Dateien spürbar)
+    klasse = pd.concat(tabellen, ignore_index=True)
+    gruppen, stationen, laengen = zip(*zuordnung)
+    klasse["Gruppe"] = pd.Index(gruppen).repeat(laengen)
+    klasse["Station"] = pd.Index(stationen).repeat(laengen)
+    return klasse, fehlerliste
@@ -0,0 +1,122 @@
+# export_utils.py
+"""
+Sammel-Export am Ende der Einheit: ein ZIP mit dem create_pdf-Bericht jeder Gruppe/Station
+plus einer gemeinsamen Messwert-Tabelle (CSV, zusätzlich Excel falls openpyxl installiert ist).
+
+Die PDFs werden in einem Prozess-Pool gerendert (alle Kerne), das ZIP wird fortlaufend in ein
+beliebiges Dateiobjekt geschrieben. Es sind höchstens 2 × Worker Berichte gleichzeitig unterwegs,
+der Speicherbedarf bleibt also unabhängig von der Klassengröße begrenzt.
+"""
+import importlib.util
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import BinaryIO, Callable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from data_utils import lade_viele
+from storage_backend import eintrag_aus_pfad, get_backend
+
+SPALTEN_E = ["Zeit [min]", "Temperatur Thermos [°C]", "Temperatur Becher [°C]"]
+SPALTEN_AC = ["Kategorie", "Temperatur [°C]"]
+
+
+def _bericht(zielname: str, df: pd.DataFrame, auswertung: str) -> Tuple[str, bytes]:
+    """Rendert einen Bericht (läuft im Worker-Prozess)."""
+    from pdf_utils import create_pdf
+    from plot_utils import plot_balken_png, plot_verlauf_png
+
+    e = eintrag_aus_pfad(zielname, "", 0)
+    fig_png = None
+    try:
+        if all(c in df.columns for c in SPALTEN_E):
+            fig_png = plot_verlauf_png(df, e.station, e.gruppe)
+        elif all(c in df.columns for c in SPALTEN_AC):
+            fig_png = plot_balken_png(df, e.station, e.gruppe)
+    except Exception:
+        fig_png = None  # Bericht ohne Diagramm ist besser als kein Bericht
+    pdf = create_pdf(e.gruppe, e.station, df, auswertung, fig_png)
+    return os.path.splitext(zielname)[0] + ".pdf", pdf
+
+
+def _mit_zuordnung(zielname: str, df: pd.DataFrame) -> pd.DataFrame:
+    e = eintrag_aus_pfad(zielname, "", 0)
+    return df.assign(Gruppe=e.gruppe, Station=e.station)
+
+
+def exportiere_klasse(ziel: BinaryIO, zielnamen: Optional[Iterable[str]] = None,
+                      max_workers: Optional[int] = None,
+                      fortschritt: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Schreibt das Export-ZIP nach `ziel`. zielnamen: CSV-Dateien (Standard: alle im Speicher).
+    max_workers=0 rendert im aktuellen Prozess (z. B. wo keine Prozesse gestartet werden dürfen).
+    Rückgabe: {"berichte": n, "fehler": [(zielname, meldung), ...]}
+    """
+    if zielnamen is None:
+        zielnamen = [e.pfad for e in get_backend().list_entries() if e.art == "csv"]
+    zielnamen = list(zielnamen)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+        if max_workers < 2:
+            max_workers = 0  # ein Kern: Prozessstart kostet mehr, als er bringt
+    gesamt, fertig = len(zielnamen), 0
+    fehler, tabellen = [], []
+
+    with zipfile.ZipFile(ziel, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        def ablegen(name: str, pdf: bytes):
+            nonlocal fertig
+            # PDFs sind bereits komprimiert – nur speichern
+            zf.writestr(f"berichte/{name}", pdf, compress_type=zipfile.ZIP_STORED)
+            fertig += 1
+            if fortschritt:
+                fortschritt(fertig, gesamt)
+
+        daten = lade_viele(zielnamen)
+        if max_workers == 0:
+            for zielname, df, auswertung, err in daten:
+                if err is not None:
+                    fehler.append((zielname, str(err)))
+                    continue
+                tabellen.append(_mit_zuordnung(zielname, df))
+                ablegen(*_bericht(zielname, df, auswertung))
+        else:
+            ctx = multiprocessing.get_context("spawn")  # kein fork aus dem Streamlit-Prozess mit Threads
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+                laufend = {}
+                for zielname, df, auswertung, err in daten:
+                    if err is not None:
+                        fehler.append((zielname, str(err)))
+                        continue
+                    tabellen.append(_mit_zuordnung(zielname, df))
+                    laufend[pool.submit(_bericht, zielname, df, auswertung)] = zielname
+                    while len(laufend) >= 2 * max_workers:
+                        erledigt, _ = wait(laufend, return_when=FIRST_COMPLETED)
+                        for fut in erledigt:
+                            _abholen(fut, laufend.pop(fut), ablegen, fehler)
+                for fut in list(laufend):
+                    _abholen(fut, laufend.pop(fut), ablegen, fehler)
+
+        messwerte = pd.concat([t for t in tabellen if not t.empty], ignore_index=True) if tabellen else pd.DataFrame()
+        if not messwerte.empty:
+            vorne = ["Gruppe", "Station"]
+            messwerte = messwerte[vorne + [c for c in messwerte.columns if c not in vorne]]
+            messwerte = messwerte.sort_values(vorne, kind="stable")
+        zf.writestr("messwerte_gesamt.csv", messwerte.to_csv(index=False).encode("utf-8-sig"))
+        if importlib.util.find_spec("openpyxl") is not None:  # optional
+            buf = io.BytesIO()
+            messwerte.to_excel(buf, index=False)
+            zf.writestr("messwerte_gesamt.xlsx", buf.getvalue())
+        if fehler:
+            zf.writestr("fehler.txt", "\n".join(f"{z}: {m}" for z, m in fehler).encode("utf-8"))
+
+    return {"berichte": fertig, "fehler": fehler}
+
+
+def _abholen(fut, zielname: str, ablegen, fehler: list) -> None:
+    try:
+        ablegen(*fut.result())
+    except Exception as e:
+        fehler.append((zielname, str(e)))
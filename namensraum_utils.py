@@ -0,0 +1,162 @@
+# namensraum_utils.py
+"""
+Namensräume: Abgaben liegen je Schuljahr, Klasse und Sitzung in einem eigenen Verzeichnis
+('2025-26/8b/2025-10-18/G1_A_-_Wärmeleitung.csv') statt flach im Datenordner. Listings,
+Klassenübersicht, Export und Zusammenfassung laufen über das Präfix einer Sitzung und wachsen so
+mit der Klasse, nicht mit allem, was je gespeichert wurde (bei GitHub: nur der Teilbaum der Sitzung).
+Zwei Klassen mit derselben Gruppen-ID überschreiben sich nicht mehr.
+
+Welche Sitzungen es gibt, steht unter _verwaltung/sitzungen/ – eine kleine JSON-Datei je Sitzung,
+damit zwei Lehrkräfte, die gleichzeitig anlegen, nicht dieselbe Datei schreiben. Archivieren ändert
+nur diese Datei (optimistisch über ihre Version, bei Konflikt neu gelesen).
+Archivierte Sitzungen bleiben für die Lehrkraft lesbar, tauchen im Schülermodus aber nicht mehr auf.
+
+Dateien aus der Zeit vor den Sitzungen liegen weiter direkt im Datenordner und sind als ALTBESTAND
+(Präfix "") erreichbar. Solange keine Sitzung angelegt ist, speichert die App wie bisher dort.
+"""
+import json
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass, field, replace
+from datetime import date, datetime
+from typing import List, Optional
+
+from cache_utils import LRUCache
+from storage_backend import DateiEintrag, VersionConflict, get_backend
+
+REGISTER = "_verwaltung/sitzungen/"
+
+log = logging.getLogger("kalorik.namensraum")
+
+# Head des Speichers -> alle Sitzungen (auch archivierte). Schülerseiten fragen bei jedem Rerun;
+# solange sich der Head nicht bewegt, genügt die Liste aus dem Speicher. lege_an/archiviere leeren
+# ihn, damit die eigene Änderung sofort sichtbar ist, auch wenn der Head noch zwischengespeichert ist.
+_SITZUNGEN = LRUCache(max_entries=8)
+
+
+def _komponente(s: str) -> str:
+    # wie safe_component in Leitung.py, zusätzlich ohne führende Punkte (kein '..' als Verzeichnis)
+    s = (s or "").strip().replace("–", "-").replace("—", "-").replace(" ", "_")
+    return re.sub(r'[^A-Za-z0-9_\-\.]', "_", s).lstrip(".")
+
+
+@dataclass(frozen=True)
+class Namensraum:
+    """Schuljahr/Klasse/Sitzung; gleich sind zwei Namensräume, wenn ihr Präfix gleich ist."""
+    schuljahr: str = ""
+    klasse: str = ""
+    sitzung: str = ""
+    angelegt: str = field(default="", compare=False)    # ISO-Zeitpunkt
+    archiviert: str = field(default="", compare=False)  # ISO-Zeitpunkt, "" = aktiv
+
+    @property
+    def praefix(self) -> str:
+        """'<Schuljahr>/<Klasse>/<Sitzung>/', "" für den Altbestand direkt im Datenordner."""
+        return f"{self.schuljahr}/{self.klasse}/{self.sitzung}/" if self.schuljahr else ""
+
+    @property
+    def titel(self) -> str:
+        if not self.praefix:
+            return "Altbestand (ohne Klasse)"
+        return f"{self.klasse} · {self.sitzung} ({self.schuljahr})"
+
+
+ALTBESTAND = Namensraum()
+
+
+def namensraum(schuljahr: str, klasse: str, sitzung: str) -> Namensraum:
+    """Namensraum aus Eingaben der Lehrkraft (bereinigt wie Dateinamen); ValueError, wenn etwas fehlt."""
+    teile = [_komponente(t) for t in (schuljahr, klasse, sitzung)]
+    if not all(teile):
+        raise ValueError("Schuljahr, Klasse und Sitzung angeben")
+    return Namensraum(*teile)
+
+
+def aktuelles_schuljahr(heute: Optional[date] = None) -> str:
+    """'2025-26' ab August 2025 bis Juli 2026."""
+    heute = heute or date.today()
+    beginn = heute.year if heute.month >= 8 else heute.year - 1
+    return f"{beginn}-{(beginn + 1) % 100:02d}"
+
+
+# ---------------------------------------------------------------- Register
+def _registerpfad(ns: Namensraum) -> str:
+    return f"{REGISTER}{ns.schuljahr}/{ns.klasse}/{ns.sitzung}.json"
+
+
+def _kodiere(ns: Namensraum) -> bytes:
+    return json.dumps(asdict(ns), ensure_ascii=False).encode("utf-8")
+
+
+def _dekodiere(pfad: str, daten: bytes) -> Optional[Namensraum]:
+    # von Hand bearbeitete oder abgeschnittene Registerdatei: überspringen statt die Seite abzubrechen
+    try:
+        return Namensraum(**json.loads(daten.decode("utf-8")))
+    except (ValueError, TypeError) as e:
+        log.warning("Registereintrag %s übersprungen: %s", pfad, e)
+        return None
+
+
+def sitzungen(mit_archiv: bool = False) -> List[Namensraum]:
+    """Angelegte Sitzungen, die neueste zuerst; archivierte nur mit mit_archiv."""
+    backend = get_backend()
+    head = backend.head()
+    gefunden = _SITZUNGEN.get(head) if head is not None else None
+    if gefunden is None:
+        pfade = [e.pfad for e in backend.list_entries(REGISTER) if e.pfad.endswith(".json")]
+        gefunden = []
+        for pfad, result, err in backend.get_many(pfade):
+            ns = None if err is not None else _dekodiere(pfad, result[0])
+            if ns is not None:
+                gefunden.append(ns)
+        if head is not None:
+            _SITZUNGEN.put(head, gefunden)
+    return sorted((n for n in gefunden if mit_archiv or not n.archiviert),
+                  key=lambda n: (n.angelegt, n.praefix), reverse=True)
+
+
+def lege_an(ns: Namensraum) -> None:
+    """Sitzung anlegen; gibt es sie schon (auch archiviert), bleibt sie unverändert."""
+    backend = get_backend()
+    try:
+        backend.get(_registerpfad(ns))
+        return
+    except FileNotFoundError:
+        pass
+    neu = Namensraum(ns.schuljahr, ns.klasse, ns.sitzung, angelegt=datetime.now().isoformat(timespec="seconds"))
+    backend.put(_registerpfad(neu), _kodiere(neu), f"Sitzung angelegt: {ns.praefix}")
+    _SITZUNGEN.clear()
+
+
+def archiviere(ns: Namensraum, archivieren: bool = True, versuche: int = 5) -> None:
+    """Sitzung archivieren (bzw. mit archivieren=False wieder öffnen); die Dateien bleiben, wo sie sind."""
+    backend = get_backend()
+    pfad = _registerpfad(ns)
+    for versuch in range(versuche):
+        try:
+            daten, version = backend.get(pfad)
+        except FileNotFoundError:
+            return
+        alt = _dekodiere(pfad, daten)
+        if alt is None:
+            return
+        neu = replace(alt, archiviert=datetime.now().isoformat(timespec="seconds") if archivieren else "")
+        try:
+            backend.put(pfad, _kodiere(neu), f"Sitzung {'archiviert' if archivieren else 'wieder geöffnet'}: "
+                        f"{ns.praefix}", version=version)
+            _SITZUNGEN.clear()
+            return
+        except VersionConflict:
+            # gleichzeitig geändert (z. B. zweiter Tab): neu lesen und wiederholen
+            time.sleep(0.2 * 2 ** versuch)
+    raise VersionConflict(f"{pfad}: nach {versuche} Versuchen immer noch veraltet")
+
+
+# ---------------------------------------------------------------- Dateien eines Namensraums
+def eintraege(ns: Namensraum) -> List[DateiEintrag]:
+    """Alle Dateien einer Sitzung; für den Altbestand nur die direkt im Datenordner."""
+    if ns.praefix:
+        return get_backend().list_entries(ns.praefix)
+    # nur die oberste Ebene, nicht den ganzen Baum samt aller Sitzungen
+    return get_backend().list_verzeichnis("")
@@ -1,27 +1,97 @@
 from fpdf import FPDF
+import functools
+import hashlib
+import io
 import os
+import zlib
 from datetime import datetime
-import tempfile
+from cache_utils import LRUCache, hash_dataframe
+
+# Dekodierte Diagramme (sha1 des PNG -> fpdf-Bildinfo) und fertige PDFs (Inhalts-Hash -> Bytes)
+_PNG_INFO = LRUCache(max_entries=32)
+_PDF_CACHE = LRUCache(max_entries=64)
+
+# Ersetzungen für die Latin-1-Schriften von fpdf, als eine Übersetzungstabelle (ein Durchlauf
+# statt einer str.replace-Kette); alles Übrige außerhalb von Latin-1 fällt weg
+_ZEICHEN = str.maketrans({
+    "📊": "Messwerte:", "🧠": "Auswertung:", "📄": "PDF:",
+    "–": "-", "°": " Grad", "ü": "ue", "ö": "oe", "ä": "ae", "ß": "ss",
+})
+
+# Text als Operand von Tj: Klammern und Backslash maskieren (wie FPDF._escape)
+_PDF_ESCAPE = str.maketrans({"\\": "\\\\", "(": "\\(", ")": "\\)", "\r": ""})
+
+LOGO_DATEI = "HPG-Header-Logo_v2.png"
+
+# Zeichenbreiten je Kernschrift (Name -> Liste über Latin-1), einmal je Prozess aufgebaut
+_ZEICHENBREITEN = {}
 
 def clean_text(text):
     if not isinstance(text, str):
         text = str(text) if text is not None else ""
-    replacements = {
-        "📊": "Messwerte:", "🧠": "Auswertung:", "📄": "PDF:",
-        "–": "-", "°": " Grad", "ü": "ue", "ö": "oe", "ä": "ae", "ß": "ss"
-    }
-    for emoji, replacement in replacements.items():
-        text = text.replace(emoji, replacement)
-    return text.encode("latin1", "ignore").decode("latin1")
+    return text.translate(_ZEICHEN).encode("latin1", "ignore").decode("latin1")
+
+def _png_info(png: bytes):
+    """
+    PNG einmal pro Prozess dekodieren (Pillow, kommt mit matplotlib) und als fpdf-Bildinfo
+    ablegen: RGB auf weißem Grund, zlib-komprimiert. Spart fpdfs Datei-Parser und dessen
+    langsame Alpha-Kanal-Trennung in reinem Python.
+    """
+    key = hashlib.sha1(png).hexdigest()
+    info = _PNG_INFO.get(key)
+    if info is None:
+        from PIL import Image
+        im = Image.open(io.BytesIO(png))
+        if im.mode in ("RGBA", "LA", "P") or "transparency" in im.info:
+            im = im.convert("RGBA")
+            weiss = Image.new("RGB", im.size, (255, 255, 255))
+            weiss.paste(im, mask=im.split()[-1])
+            im = weiss
+        else:
+            im = im.convert("RGB")
+        info = {"w": im.width, "h": im.height, "cs": "DeviceRGB", "bpc": 8,
+                "f": "FlateDecode", "data": zlib.compress(im.tobytes())}
+        _PNG_INFO.put(key, info)
+    return f"mem-{key}.png", info
+
 
+@functools.lru_cache(maxsize=1)
+def _logo():
+    """Logo einmal pro Prozess suchen (Projektordner, dann assets/) und dekodieren; None = keins."""
+    hier = os.path.dirname(os.path.abspath(__file__))
+    for pfad in (os.path.join(hier, LOGO_DATEI), os.path.join(hier, "assets", LOGO_DATEI)):
+        if os.path.exists(pfad):
+            with open(pfad, "rb") as f:
+                return _png_info(f.read())
+    return None
+
+
+class BerichtPDF(FPDF):
+    """
+    Gemeinsame Grundlage aller PDFs (Einzelbericht, Zusammenfassung): Kopfzeile mit Logo und
+    Titel, Seitenzahl, Bilder aus PNG-Bytes sowie tabelle() und textblock(), die ganze Seiten
+    auf einmal als PDF-Operatoren schreiben statt Zelle für Zelle über cell()/multi_cell().
+    """
+
+    titel = "Digitale Auswertung – Wärmeübertragung"
+
+    def _bild(self, name: str, info: dict, x=None, y=None, w=0, h=0):
+        if name not in self.images:
+            # fpdf merkt sich geparste Bilder pro Dokument unter ihrem Namen; die fertige Info
+            # dort eintragen (als Kopie, _putimages löscht 'data' nach dem Schreiben)
+            self.images[name] = dict(info, i=len(self.images) + 1)
+        self.image(name, x=x, y=y, w=w, h=h)
+
+    def image_png_bytes(self, png: bytes, x=None, y=None, w=0, h=0):
+        """Bild aus PNG-Bytes einfügen – ohne Temp-Datei."""
+        self._bild(*_png_info(png), x=x, y=y, w=w, h=h)
 
-class PDF(FPDF):
     def header(self):
-        logo_path = os.path.join("assets", "HPG-Header-Logo_v2.png")
-        if os.path.exists(logo_path):
-            self.image(logo_path, x=160, y=10, w=40)
+        logo = _logo()
+        if logo is not None:
+            self._bild(*logo, x=160, y=10, w=40)
         self.set_font("Arial", "B", 14)
-        self.cell(0, 10, clean_text("Digitale Auswertung – Wärmeübertragung"), ln=True, align="L")
+        self.cell(0, 10, clean_text(self.titel), ln=True, align="L")
         self.ln(10)
 
     def footer(self):
@@ -29,12 +99,173 @@ class PDF(FPDF):
         self.set_font("Arial", "I", 8)
         self.cell(0, 10, f"Seite {self.page_no()}", align="C")
 
-def create_pdf(gruppe, station, df, auswertung_text, fig=None):
+    # ------------------------------------------------------------ Massen-Ausgabe
+    def _zeichenbreiten(self) -> list:
+        """Zeichenbreiten der aktuellen Schrift als Liste über die 256 Latin-1-Codes."""
+        cw = _ZEICHENBREITEN.get(self.current_font["name"])
+        if cw is None:
+            cw = [self.current_font["cw"].get(chr(i), 0) for i in range(256)]
+            _ZEICHENBREITEN[self.current_font["name"]] = cw
+        return cw
+
+    def _breite(self, wort: str) -> float:
+        """Breite in Schrifteinheiten (1/1000 der Schriftgröße) der aktuellen Schrift; wort ist Latin-1."""
+        return sum(map(self._zeichenbreiten().__getitem__, wort.encode("latin1")))
+
+    def _zeilen_pro_seite(self, h: float) -> int:
+        return max(1, int((self.page_break_trigger - self.y) / h + 1e-9))
+
+    def _texte_ops(self, x: float, h: float, texte):
+        """
+        Tj-Operatoren für n untereinanderstehende Zellen ab self.y (wie cell(): Grundlinie bei
+        y + h/2 + 0,3·Schriftgröße, um c_margin eingerückt). texte: bereits maskierte Strings
+        (object-Array); leere Zellen ergeben keinen Operator. Formatiert wird je Zeilenposition,
+        zusammengesetzt über Array-Operationen – kein Python-Code je Zelle.
+        """
+        import numpy as np
+        k = self.k
+        ys = self.y + h * np.arange(len(texte))
+        ty = np.char.mod("%.2f", (self.h - (ys + 0.5 * h + 0.3 * self.font_size)) * k).astype(object)
+        ops = ("BT %.2f " % ((x + self.c_margin) * k)) + ty + " Td (" + texte + ") Tj ET"
+        return ops[texte != ""]
+
+    def tabelle(self, df, h: float = 8, schrift: int = 10, min_breite: float = 12):
+        """
+        DataFrame als Tabelle mit Rahmen; Spaltenbreiten nach Inhalt (längste Werte und
+        Überschrift), notfalls auf Seitenbreite gestaucht. Zellen werden spaltenweise formatiert
+        und je Seite als ein Block ausgegeben; die Kopfzeile wiederholt sich auf jeder Seite.
+        """
+        import numpy as np
+        import pandas as pd
+
+        koepfe = [clean_text(str(c)) for c in df.columns]
+        spalten = []
+        for _, werte in df.items():
+            if werte.dtype.kind in "iuf":
+                # Darstellung wie bisher str(wert), fehlende Werte bleiben leer
+                zahlen = werte.to_numpy(dtype=object if werte.dtype.kind == "i" else None)
+                texte = zahlen.astype(str).astype(object)
+                texte[pd.isna(zahlen)] = ""
+                spalten.append(texte)
+            else:
+                roh = werte.to_numpy(dtype=object)
+                texte = np.array([clean_text(v) for v in roh], dtype=object)
+                texte[pd.isna(roh)] = ""
+                spalten.append(texte)
+
+        # Breite: Überschrift fett, Inhalt normal; gemessen werden nur die längsten Werte
+        self.set_font("Arial", "B", schrift)
+        breiten = [self._breite(k) * self.font_size / 1000 for k in koepfe]
+        self.set_font("Arial", size=schrift)
+        for i, texte in enumerate(spalten):
+            if len(texte):
+                laengen = np.fromiter((len(t) for t in texte), dtype=int, count=len(texte))
+                laengste = texte[np.argsort(laengen)[-20:]]
+                breiten[i] = max(breiten[i], max(self._breite(t) for t in laengste) * self.font_size / 1000)
+        breiten = np.maximum(np.array(breiten) + 2 * self.c_margin + 1, min_breite)
+        verfuegbar = self.w - self.l_margin - self.r_margin
+        if breiten.sum() > verfuegbar:
+            breiten *= verfuegbar / breiten.sum()
+        xs = self.l_margin + np.concatenate([[0.0], np.cumsum(breiten)[:-1]])
+        spalten = [np.array([t.translate(_PDF_ESCAPE) for t in texte], dtype=object)
+                   for texte in spalten]
+
+        def kopfzeile():
+            self.set_font("Arial", "B", schrift)
+            for k, b in zip(koepfe, breiten):
+                self.cell(b, h, k, border=1)
+            self.ln()
+            self.set_font("Arial", size=schrift)
+
+        k = self.k
+        if self.y + h > self.page_break_trigger:
+            self.add_page(self.cur_orientation)
+        kopfzeile()
+        zeile, n = 0, len(df)
+        while zeile < n:
+            if self.y + h > self.page_break_trigger:
+                self.add_page(self.cur_orientation)
+                kopfzeile()
+            anzahl = min(self._zeilen_pro_seite(h), n - zeile)
+            # Rahmen: ein Rechteck je Zeile über die ganze Breite, dazu die Spaltentrenner
+            oben, unten = (self.h - self.y) * k, (self.h - self.y - h * anzahl) * k
+            ops = ["%.2f %.2f %.2f %.2f re S" % (self.l_margin * k, (self.h - self.y - h * i) * k,
+                                                breiten.sum() * k, -h * k) for i in range(anzahl)]
+            ops += ["%.2f %.2f m %.2f %.2f l S" % (x * k, oben, x * k, unten) for x in xs[1:]]
+            for x, texte in zip(xs, spalten):
+                ops += self._texte_ops(x, h, texte[zeile:zeile + anzahl]).tolist()
+            self._out(" ".join(ops))
+            self.y += h * anzahl
+            zeile += anzahl
+        self.x = self.l_margin
+
+    def _umbrechen(self, text: str, breite: float):
+        """Zeilen wie multi_cell (Blocksatz): [(Zeile, Wortabstand in Benutzereinheiten), ...]."""
+        wmax = (breite - 2 * self.c_margin) * 1000.0 / self.font_size
+        cw = self._zeichenbreiten().__getitem__
+        leer = cw(32)
+        zeilen = []
+        for absatz in text.replace("\r", "").rstrip("\n").split("\n"):
+            woerter, weite = [], 0.0
+            alle = absatz.split(" ")
+            breiten = [sum(map(cw, b)) for b in absatz.encode("latin1").split(b" ")]
+            for wort, w in zip(alle, breiten):
+                neu = weite + (leer if woerter else 0) + w
+                if woerter and neu > wmax:
+                    luecken = len(woerter) - 1
+                    ws = (wmax - weite) / 1000.0 * self.font_size / luecken if luecken else 0.0
+                    zeilen.append((" ".join(woerter), ws))
+                    woerter, weite, neu = [], 0.0, w
+                while w > wmax and not woerter:
+                    # Wort länger als die Zeile: zeichenweise trennen (wie multi_cell)
+                    teil, tw = "", 0.0
+                    for c in wort:
+                        zw = cw(ord(c))
+                        if teil and tw + zw > wmax:
+                            break
+                        teil, tw = teil + c, tw + zw
+                    zeilen.append((teil, 0.0))
+                    wort = wort[len(teil):]
+                    w = neu = self._breite(wort)
+                woerter.append(wort)
+                weite = neu
+            zeilen.append((" ".join(woerter), 0.0))
+        return zeilen
+
+    def textblock(self, text: str, h: float):
+        """multi_cell(0, h, text) im Blocksatz, aber seitenweise als ein Block ausgegeben."""
+        zeilen = self._umbrechen(clean_text(text), self.w - self.r_margin - self.x)
+        k, x, i = self.k, self.x, 0
+        while i < len(zeilen):
+            if self.y + h > self.page_break_trigger:
+                self.add_page(self.cur_orientation)
+                self.x = x
+            anzahl = min(self._zeilen_pro_seite(h), len(zeilen) - i)
+            # wenige Zeilen je Block: direkt formatieren, wie cell() mit Wortabstand (Tw)
+            basis = self.h - (self.y + 0.5 * h + 0.3 * self.font_size)
+            ops = ["%.3f Tw BT %.2f %.2f Td (%s) Tj ET" % (
+                       ws * k, (x + self.c_margin) * k, (basis - h * j) * k, z.translate(_PDF_ESCAPE))
+                   for j, (z, ws) in enumerate(zeilen[i:i + anzahl]) if z]
+            if ops:
+                self._out(" ".join(ops) + " 0 Tw")
+            self.y += h * anzahl
+            i += anzahl
+        self.lasth = h
+        self.x = self.l_margin
+
+
+PDF = BerichtPDF
+
+def create_pdf(gruppe, station, df, auswertung_text, fig=None, zeitpunkt=None):
+    """
+    fig: Diagramm als PNG-Bytes (plot_utils.*_png, aus dem Render-Cache) oder matplotlib-Figur.
+    zeitpunkt: Text für "Zeitpunkt:" im Kopf, ohne Angabe jetzt (auf die Minute).
+    """
     pdf = PDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    timestamp = zeitpunkt or datetime.now().strftime("%Y-%m-%d %H:%M")
     pdf.cell(0, 10, clean_text(f"Gruppe: {gruppe}"), ln=True)
     pdf.cell(0, 10, clean_text(f"Station: {station}"), ln=True)
     pdf.cell(0, 10, clean_text(f"Zeitpunkt: {timestamp}"), ln=True)
@@ -44,33 +275,44 @@ def create_pdf(gruppe, station, df, auswertung_text, fig=None):
     pdf.set_font("Arial", "B", 12)
     pdf.cell(0, 10, clean_text("Auswertung:"), ln=True)
     pdf.set_font("Arial", size=11)
-    pdf.multi_cell(0, 8, clean_text(auswertung_text))
+    pdf.textblock(auswertung_text, 8)
     pdf.ln(5)
 
     # Diagramm einfügen
-    if fig:
+    if fig is not None:
+        if isinstance(fig, (bytes, bytearray)):
+            png = bytes(fig)
+        else:
+            from plot_utils import figure_png
+            png = figure_png(fig)
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 10, clean_text("Diagramm zur Station:"), ln=True)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            fig.savefig(tmpfile.name, dpi=150)
-            pdf.image(tmpfile.name, x=10, w=180)
-        os.unlink(tmpfile.name)
+        pdf.image_png_bytes(png, x=10, w=180)
         pdf.ln(5)
 
     # Messwerte als Tabelle
     if not df.empty:
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 10, clean_text("Messwerte:"), ln=True)
-        pdf.set_font("Arial", size=10)
-
-        col_widths = [40] * len(df.columns)
-        for i, col in enumerate(df.columns):
-            pdf.cell(col_widths[i], 8, clean_text(col), border=1)
-        pdf.ln()
-
-        for _, row in df.iterrows():
-            for i, item in enumerate(row):
-                pdf.cell(col_widths[i], 8, clean_text(str(item)), border=1)
-            pdf.ln()
+        pdf.tabelle(df)
 
     return pdf.output(dest='S').encode('latin1')
+
+def create_pdf_cached(gruppe, station, df, auswertung_text, fig_png=None):
+    """
+    create_pdf mit Cache: gleicher Inhalt (Gruppe, Station, Messwerte, Auswertung, Diagramm)
+    wird nur einmal je Minute gerendert. Der Zeitpunkt im Kopf gehört zum Schlüssel, sonst trüge
+    ein später erzeugtes PDF noch die Uhrzeit des ersten.
+    """
+    zeitpunkt = datetime.now().strftime("%Y-%m-%d %H:%M")
+    h = hashlib.sha1()
+    for teil in (gruppe, station, auswertung_text or "", zeitpunkt):
+        h.update(str(teil).encode("utf-8") + b"\0")
+    h.update(hash_dataframe(df).encode("ascii"))
+    h.update(fig_png or b"")
+    key = h.hexdigest()
+    pdf = _PDF_CACHE.get(key)
+    if pdf is None:
+        pdf = create_pdf(gruppe, station, df, auswertung_text, fig_png, zeitpunkt=zeitpunkt)
+        _PDF_CACHE.put(key, pdf)
+    return pdf
@@ -1,6 +1,15 @@
-import matplotlib.pyplot as plt
+import io
+
+from cache_utils import LRUCache, hash_dataframe
+
+# Gerenderte Diagramme als PNG-Bytes: (Plot, Daten-Hash, Station, Gruppe, dpi) -> PNG.
+# Reruns mit unveränderten Daten kosten so kein Rendering; Figuren werden nach dem Rendern
+# immer geschlossen (sonst sammelt pyplot sie im langlebigen Streamlit-Prozess an).
+# pyplot wird erst beim ersten echten Rendern importiert (teuer, bei Cache-Treffern unnötig).
+_PNG_CACHE = LRUCache(max_entries=128)
 
 def plot_balken(df, station, gruppen_id):
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots()
     categories = df["Kategorie"].astype(str)
     temperatures = df["Temperatur [°C]"].astype(float)
@@ -13,6 +22,7 @@ def plot_balken(df, station, gruppen_id):
         ax.text(i, temp + 0.5, f"{temp:.1f}°C", ha='center')
     return fig
 def plot_verlauf(df, station, gruppen_id):
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots()
     ax.plot(df["Zeit [min]"], df["Temperatur Thermos [°C]"], label="Thermos", marker="o")
     ax.plot(df["Zeit [min]"], df["Temperatur Becher [°C]"], label="Becher", marker="s")
@@ -22,3 +32,112 @@ def plot_verlauf(df, station, gruppen_id):
     ax.set_ylim(bottom=0)
     ax.legend()
     return fig
+
+def figure_png(fig, dpi: int = 150) -> bytes:
+    """Rendert eine Figur als PNG und gibt sie danach immer frei."""
+    import matplotlib.pyplot as plt
+    try:
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi)
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+def _render(plot_fn, *args, dpi: int) -> bytes:
+    """
+    plot_fn(*args) als PNG. Scheitert plot_fn nach plt.subplots() (z. B. Text in einer Zahlenspalte),
+    werden die dabei angelegten Figuren ebenfalls geschlossen – Fehler werden nicht gecacht, jeder
+    Rerun würde sonst eine weitere Figur offen lassen.
+    """
+    import matplotlib.pyplot as plt
+    vorher = set(plt.get_fignums())
+    try:
+        fig = plot_fn(*args)
+    except Exception:
+        for nummer in set(plt.get_fignums()) - vorher:
+            plt.close(nummer)
+        raise
+    return figure_png(fig, dpi=dpi)
+
+def _render_cached(plot_fn, df, station, gruppen_id, dpi: int) -> bytes:
+    key = (plot_fn.__name__, hash_dataframe(df), str(station), str(gruppen_id), dpi)
+    png = _PNG_CACHE.get(key)
+    if png is None:
+        png = _render(plot_fn, df, station, gruppen_id, dpi=dpi)
+        _PNG_CACHE.put(key, png)
+    return png
+
+def plot_balken_png(df, station, gruppen_id, dpi: int = 150) -> bytes:
+    return _render_cached(plot_balken, df, station, gruppen_id, dpi)
+
+def plot_verlauf_png(df, station, gruppen_id, dpi: int = 150) -> bytes:
+    return _render_cached(plot_verlauf, df, station, gruppen_id, dpi)
+
+def plot_abkuehlung_klasse(messwerte, anpassung):
+    """
+    Links alle Abkühlkurven der Klasse übereinander (Thermos blau, Becher orange, auffällige Gruppen
+    rot gestrichelt) mit der Modellkurve aus Median-k und Klassen-T_U, rechts die Verteilung von k.
+    """
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    from matplotlib.ticker import FuncFormatter, LogLocator, NullFormatter
+
+    from abkuehlung_utils import PROBEN, aufgefuellt
+
+    gruppen, zeit, temperaturen = aufgefuellt(messwerte)
+    auffaellig = set(anpassung.loc[anpassung["Auffällig"], "Gruppe"].astype(str))
+    rot = np.array([g in auffaellig for g in gruppen], dtype=bool)
+    farben = {"Thermos": "tab:blue", "Becher": "tab:orange"}
+    modellfarben = {"Thermos": "navy", "Becher": "saddlebrown"}
+
+    fig, (ax, ax_k) = plt.subplots(1, 2, figsize=(11, 4.5), gridspec_kw={"width_ratios": [3, 2]})
+    for probe, temperatur in temperaturen.items():
+        # eine LineCollection je Probe statt hunderter ax.plot-Aufrufe
+        kurven = [np.column_stack([z[~np.isnan(z + t)], t[~np.isnan(z + t)]]) for z, t in zip(zeit, temperatur)]
+        normal = [k for k, r in zip(kurven, rot) if not r and len(k)]
+        ausreisser = [k for k, r in zip(kurven, rot) if r and len(k)]
+        ax.add_collection(LineCollection(normal, colors=farben[probe], linewidths=0.8, alpha=0.35))
+        if ausreisser:
+            ax.add_collection(LineCollection(ausreisser, colors="tab:red", linewidths=1.0, linestyles="--"))
+        k = anpassung[f"k {probe} [1/min]"][~anpassung["Auffällig"]].median()
+        t_u = anpassung.attrs.get("T_U Klasse", np.nan)
+        t0 = np.nanmedian(temperatur[:, 0]) if temperatur.size else np.nan
+        if np.isfinite([k, t_u, t0]).all() and zeit.size:
+            t = np.linspace(np.nanmin(zeit), np.nanmax(zeit), 100)
+            ax.plot(t, t_u + (t0 - t_u) * np.exp(-k * (t - t[0])), color=modellfarben[probe], linewidth=2.5,
+                    zorder=3, label=f"{probe}: Median k = {k:.3f}/min")
+    ax.autoscale()
+    ax.set_xlabel("Zeit [min]")
+    ax.set_ylabel("Temperatur [°C]")
+    ax.set_title(f"Abkühlung – {len(gruppen)} Gruppen")
+    ax.legend(loc="upper right", fontsize="small")
+
+    # k von Thermos und Becher liegen eine Größenordnung auseinander: logarithmische Achse,
+    # auffällige Gruppen nur links (sonst staucht ein Ausreißer die ganze Verteilung)
+    unauffaellig = anpassung[~anpassung["Auffällig"]]
+    werte = [unauffaellig[f"k {p} [1/min]"].to_numpy() for p in PROBEN]
+    werte = [w[np.isfinite(w) & (w > 0)] for w in werte]
+    alle = np.concatenate(werte)
+    if len(alle):
+        grenzen = np.geomspace(alle.min(), alle.max(), 30) if alle.max() > alle.min() else 10
+        for probe, w in zip(PROBEN, werte):
+            ax_k.hist(w, bins=grenzen, label=probe, color=farben[probe], alpha=0.8)
+        ax_k.set_xscale("log")
+        ax_k.xaxis.set_major_locator(LogLocator(subs=(1.0, 2.0, 5.0)))
+        ax_k.xaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{v:g}"))
+        ax_k.xaxis.set_minor_formatter(NullFormatter())
+        ax_k.legend(fontsize="small")
+    ax_k.set_xlabel("k [1/min]")
+    ax_k.set_ylabel("Gruppen")
+    ax_k.set_title("Verteilung der Abkühlkonstante")
+    fig.tight_layout()
+    return fig
+
+def plot_abkuehlung_klasse_png(messwerte, anpassung, dpi: int = 120) -> bytes:
+    key = ("plot_abkuehlung_klasse", hash_dataframe(messwerte), hash_dataframe(anpassung), dpi)
+    png = _PNG_CACHE.get(key)
+    if png is None:
+        png = _render(plot_abkuehlung_klasse, messwerte, anpassung, dpi=dpi)
+        _PNG_CACHE.put(key, png)
+    return png
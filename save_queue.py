@@ -0,0 +1,256 @@
+# save_queue.py
+"""
+Write-behind für speichere_daten: Speichern landet sofort in einem lokalen Append-only-Journal,
+ein einzelner Hintergrund-Worker schreibt später ins Backend.
+
+- Mehrfaches Speichern desselben Zielnamens wird auf die letzte Version zusammengefasst.
+- Mehrere Zielnamen gehen gemeinsam in wenige Commits (put_many).
+- Vorübergehende Fehler (Netz, 5xx, Rate-Limit) werden mit Backoff wiederholt, bis der Stand
+  dauerhaft gespeichert ist.
+- Dauerhafte Fehler (ungültiger Pfad, GitHub 422, ...) blockieren die übrigen nicht: der Stapel wird
+  in Einzeleinträge zerlegt, und was allein immer noch scheitert, gilt als fehlgeschlagen (im Journal
+  vermerkt, in der Diagnose sichtbar). Speichert die Gruppe erneut, wird es wieder eingeplant.
+- Nach einem Neustart werden nicht bestätigte Einträge aus dem Journal erneut eingeplant.
+"""
+import base64
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from storage_backend import DauerhafterFehler, background_io, storage_cfg, get_backend
+
+
+def _dauerhaft(e: Exception) -> bool:
+    # ValueError: z. B. ungültiger Pfad im lokalen Backend
+    return isinstance(e, (DauerhafterFehler, ValueError))
+
+
+class SaveQueue:
+    def __init__(self, journal_path: Optional[str] = None, batch_size: Optional[int] = None):
+        # Konfiguration erst hier lesen, nicht beim Import (Kaltstart)
+        self.journal_path = journal_path or storage_cfg("journal_path", ".kalorik_journal.jsonl")
+        self.batch_size = max(1, batch_size or int(storage_cfg("write_behind_batch", "20") or 20))
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._seq = 0
+        # zielname -> {"seq", "seqs", "files", "message"} – immer nur die neueste Version
+        self._pending: Dict[str, dict] = {}
+        # zielname -> Eintrag wie oben plus "error": scheitert dauerhaft, wird nicht mehr versucht
+        self._failed: Dict[str, dict] = {}
+        # Zielnamen aus einem dauerhaft gescheiterten Stapel: werden einzeln geschrieben
+        self._einzeln: Set[str] = set()
+        self._last_error: Optional[str] = None
+        self._synced = 0
+        self._worker: Optional[threading.Thread] = None
+        self._replay()
+
+    # ---------------------------------------------------------------- Journal
+    def _append(self, record: dict) -> None:
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        offen: Dict[int, dict] = {}
+        fehlgeschlagen: Dict[int, str] = {}
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # abgeschnittene letzte Zeile nach Absturz
+                self._seq = max(self._seq, rec.get("seq", 0))
+                if rec.get("op") == "save":
+                    offen[rec["seq"]] = rec
+                elif rec.get("op") == "done":
+                    for s in rec.get("seqs", []):
+                        offen.pop(s, None)
+                        fehlgeschlagen.pop(s, None)
+                elif rec.get("op") == "failed":
+                    fehlgeschlagen.update({s: rec.get("error", "") for s in rec.get("seqs", [])})
+        for rec in sorted(offen.values(), key=lambda r: r["seq"]):
+            zielname = rec["zielname"]
+            frueher = self._pending.get(zielname, self._failed.get(zielname, {})).get("seqs", [])
+            entry = {
+                "seq": rec["seq"],
+                "seqs": frueher + [rec["seq"]],
+                "files": {p: base64.b64decode(d) for p, d in rec["files"].items()},
+                "message": rec["message"],
+            }
+            # die jeweils neueste Version entscheidet, ob der Zielname offen oder fehlgeschlagen ist
+            self._pending.pop(zielname, None)
+            self._failed.pop(zielname, None)
+            if rec["seq"] in fehlgeschlagen:
+                self._failed[zielname] = {**entry, "error": fehlgeschlagen[rec["seq"]]}
+            else:
+                self._pending[zielname] = entry
+
+    def _compact(self) -> None:
+        # Nur aufrufen, wenn nichts mehr offen ist: übrig bleiben höchstens die fehlgeschlagenen Einträge
+        if not self._failed:
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for zielname, entry in self._failed.items():
+                for rec in (
+                    {"op": "save", "seq": entry["seq"], "ts": time.time(), "zielname": zielname,
+                     "message": entry["message"],
+                     "files": {p: base64.b64encode(d).decode("ascii") for p, d in entry["files"].items()}},
+                    {"op": "failed", "seqs": [entry["seq"]], "error": entry["error"]},
+                ):
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    # ---------------------------------------------------------------- API
+    def enqueue(self, zielname: str, files: Dict[str, bytes], message: str) -> int:
+        """Speichert dauerhaft ins Journal und kehrt sofort zurück (Rückgabe: Sequenznummer)."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._append({
+                "op": "save",
+                "seq": seq,
+                "ts": time.time(),
+                "zielname": zielname,
+                "message": message,
+                "files": {p: base64.b64encode(d).decode("ascii") for p, d in files.items()},
+            })
+            # ältere, noch offene (oder fehlgeschlagene) Versionen werden mit bestätigt, sobald diese
+            # synchronisiert ist
+            frueher = self._pending.get(zielname, self._failed.pop(zielname, {})).get("seqs", [])
+            self._pending[zielname] = {"seq": seq, "seqs": frueher + [seq], "files": dict(files), "message": message}
+            self._wakeup.notify()
+        self._ensure_worker()
+        return seq
+
+    def pending_file(self, rel_path: str) -> Optional[bytes]:
+        """Noch nicht synchronisierter Inhalt einer Datei (für Read-your-writes in lade_daten)."""
+        with self._lock:
+            for entry in [*self._pending.values(), *self._failed.values()]:
+                if rel_path in entry["files"]:
+                    return entry["files"][rel_path]
+        return None
+
+    def status(self, zielname: Optional[str] = None) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "synced": self._synced,
+                "last_error": self._last_error,
+                "failed": {z: e["error"] for z, e in self._failed.items()},
+                "state": None if zielname is None else (
+                    "pending" if zielname in self._pending else "failed" if zielname in self._failed else "synced"),
+            }
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wartet, bis nichts mehr offen ist (z. B. vor dem Beenden). True, wenn nichts mehr offen ist."""
+        self._ensure_worker()
+        ende = time.time() + timeout
+        while time.time() < ende:
+            with self._lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    # ---------------------------------------------------------------- Worker
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="kalorik-save-queue", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        attempt = 0
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                einzeln = [z for z in self._pending if z in self._einzeln]
+                if einzeln:
+                    batch = {einzeln[0]: self._pending[einzeln[0]]}
+                else:
+                    batch = dict(list(self._pending.items())[: self.batch_size])
+            files: Dict[str, bytes] = {}
+            for entry in batch.values():
+                files.update(entry["files"])
+            if len(batch) == 1:
+                message = next(iter(batch.values()))["message"]
+            else:
+                message = f"Save (write-behind): {len(batch)} Gruppen/Stationen"
+            try:
+                with background_io():  # Schülerinnen und Lehrkraft haben beim Kontingent Vorrang
+                    get_backend().put_many(files, message=message)
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                    if _dauerhaft(e) and len(batch) > 1:
+                        # ein Eintrag verdirbt den Stapel: einzeln schreiben, um ihn zu finden
+                        self._einzeln.update(batch)
+                        continue
+                    if _dauerhaft(e):
+                        self._fehlgeschlagen(batch, str(e))
+                        continue
+                # vorübergehend: wiederholen – mit Jitter, höchstens 60 s Pause
+                time.sleep(random.uniform(0, min(60.0, 0.5 * 2 ** attempt)))
+                attempt += 1
+                continue
+            attempt = 0
+            with self._lock:
+                done = []
+                for zielname, entry in batch.items():
+                    done.extend(entry["seqs"])
+                    self._einzeln.discard(zielname)
+                    # Nur entfernen, wenn inzwischen keine neuere Version eingereiht wurde
+                    if self._pending.get(zielname, {}).get("seq") == entry["seq"]:
+                        del self._pending[zielname]
+                self._synced += len(batch)
+                self._last_error = None
+                if self._pending:
+                    self._append({"op": "done", "seqs": done})
+                else:
+                    self._compact()
+
+    def _fehlgeschlagen(self, batch: Dict[str, dict], fehler: str) -> None:
+        # unter self._lock: aus der Warteschlange nehmen und im Journal vermerken
+        for zielname, entry in batch.items():
+            self._einzeln.discard(zielname)
+            if self._pending.get(zielname, {}).get("seq") == entry["seq"]:
+                del self._pending[zielname]
+                self._failed[zielname] = {**entry, "error": fehler}
+                self._append({"op": "failed", "seqs": [entry["seq"]], "error": fehler})
+        self._last_error = None
+        if not self._pending:
+            self._compact()
+
+
+_QUEUE: Optional[SaveQueue] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def write_behind_enabled() -> bool:
+    return str(storage_cfg("write_behind", "")).strip().lower() in ("1", "true", "yes", "ja")
+
+
+def get_queue() -> SaveQueue:
+    """Die Save-Queue des Prozesses (ein Worker für alle Streamlit-Sessions)."""
+    global _QUEUE
+    if _QUEUE is None:
+        with _QUEUE_LOCK:
+            if _QUEUE is None:
+                _QUEUE = SaveQueue()
+                if _QUEUE.status()["pending"]:
+                    _QUEUE._ensure_worker()  # Reste aus dem Journal nach Neustart
+    return _QUEUE
@@ -0,0 +1,400 @@
+# storage_backend.py
+"""
+Austauschbarer Speicher für Messdaten, Auswertungen und Bilder.
+
+Alle Pfade sind relativ zum Datenordner (bei GitHub: BASE_PATH), Versionen sind
+Git-Blob-shas – bei allen Backends gleich berechnet, damit Caches und Vergleiche
+backend-unabhängig funktionieren. Welches Backend genutzt wird, steht in
+st.secrets['storage']['backend'] bzw. KALORIK_STORAGE_BACKEND ("github", "local", "fake", "sqlite").
+"sqlite" ist offline-first: lokale Datenbank als primärer Speicher, Sync zu storage.sqlite_remote.
+Mit storage.format = "datensatz" liegen Messwerte und Auswertungen als ein Klassendatensatz je
+Station im Backend (storage_datensatz), nach außen weiter als Einzeldateien.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cache_utils import LRUCache
+from constants import DATENORDNER
+
+
+def git_blob_sha(data: bytes) -> str:
+    """sha, die GitHub für eine Datei mit diesem Inhalt vergeben würde."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def storage_cfg(key: str, default: str = "") -> str:
+    """
+    Konfiguration zuerst aus st.secrets['storage'][key], sonst aus Umgebungsvariablen
+    KALORIK_STORAGE_KEY, sonst default.
+    """
+    try:
+        import streamlit as st
+        return st.secrets["storage"][key]
+    except Exception:
+        return os.environ.get(f"KALORIK_STORAGE_{key.upper()}", default)
+
+
+_IO_KONTEXT = threading.local()
+
+
+@contextmanager
+def background_io():
+    """
+    Markiert alle Backend-Aufrufe dieses Threads als Hintergrundarbeit (z. B. Write-behind).
+    Backends mit Kontingent (GitHub) stellen sie hinter interaktive Zugriffe zurück.
+    """
+    vorher = getattr(_IO_KONTEXT, "background", False)
+    _IO_KONTEXT.background = True
+    try:
+        yield
+    finally:
+        _IO_KONTEXT.background = vorher
+
+
+def is_background_io() -> bool:
+    return getattr(_IO_KONTEXT, "background", False)
+
+
+@dataclass(frozen=True)
+class DateiEintrag:
+    """Eine gespeicherte Datei samt Zuordnung zu Gruppe/Station (aus dem Dateinamen)."""
+    pfad: str      # relativ zum Datenordner
+    gruppe: str
+    station: str
+    art: str       # "csv", "auswertung", "bild", "vorschau" oder "sonstig"
+    sha: str       # Git-Blob-sha = Version
+    size: int
+
+
+def eintrag_aus_pfad(pfad: str, sha: str, size: int) -> DateiEintrag:
+    """Zerlegt '{gruppe}_{station}.csv', '..._auswertung.txt' bzw. '..._bild.png' in einen Eintrag."""
+    name = pfad.rsplit("/", 1)[-1]
+    stamm, _, endung = name.rpartition(".")
+    endung = endung.lower()
+    if endung == "csv":
+        art = "csv"
+    elif endung == "txt" and stamm.endswith("_auswertung"):
+        art, stamm = "auswertung", stamm[: -len("_auswertung")]
+    elif endung in ("png", "jpg", "jpeg") and stamm.endswith("_bild"):
+        art, stamm = "bild", stamm[: -len("_bild")]
+    elif endung == "jpg" and stamm.endswith("_bild_vorschau"):
+        art, stamm = "vorschau", stamm[: -len("_bild_vorschau")]
+    else:
+        art = "sonstig"
+    gruppe, _, station = stamm.partition("_")
+    return DateiEintrag(pfad=pfad, gruppe=gruppe, station=station, art=art, sha=sha, size=size)
+
+
+class VersionConflict(RuntimeError):
+    """Die erwartete Version passt nicht mehr zur gespeicherten Datei (wie GitHub 409)."""
+
+
+class DauerhafterFehler(RuntimeError):
+    """Der Schreibvorgang kann so nie gelingen (z. B. ungültiger Pfad, GitHub 422); Wiederholen hilft nicht."""
+
+
+class StorageBackend:
+    """
+    Schnittstelle aller Backends.
+
+    - list_entries(prefix): alle Dateien als DateiEintrag (mit sha und Größe)
+    - list_verzeichnis(verzeichnis): nur die Dateien direkt in verzeichnis ("" = Datenordner,
+      sonst mit abschließendem '/'), ohne Unterverzeichnisse
+    - list(prefix, suffix): sortierte relative Dateinamen
+    - head(): Version des ganzen Speichers (ändert sich mit jedem Schreiben), None = unbekannt
+    - aenderungen(seit, bis): zwischen zwei head()-Ständen geänderte Dateien als (path, Version |
+      None = gelöscht); None, wenn das Backend das nicht inkrementell weiß (dann list_entries)
+    - get(path): (Bytes, Version); FileNotFoundError, wenn es die Datei nicht gibt
+    - get_many(paths): (path, (Bytes, Version) | None, Fehler | None) in Eintreffreihenfolge
+    - put(path, data, message, version): schreibt eine Datei; mit version nur, wenn diese
+      noch aktuell ist, mit version "" nur, wenn es die Datei noch nicht gibt (sonst
+      VersionConflict). Gibt die neue Version zurück.
+    - put_many(files, message): mehrere Dateien atomar (None = löschen)
+    - delete(path, message, version)
+    """
+
+    name = "abstract"
+
+    def list_entries(self, prefix: str = "") -> List[DateiEintrag]:
+        raise NotImplementedError
+
+    def list_verzeichnis(self, verzeichnis: str = "") -> List[DateiEintrag]:
+        return [e for e in self.list_entries(verzeichnis) if "/" not in e.pfad[len(verzeichnis):]]
+
+    def list(self, prefix: str = "", suffix: str = ".csv") -> List[str]:
+        return sorted(e.pfad for e in self.list_entries(prefix) if e.pfad.lower().endswith(suffix))
+
+    def head(self) -> Optional[str]:
+        return None
+
+    def aenderungen(self, seit: str, bis: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+        return None
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        raise NotImplementedError
+
+    def get_many(self, rel_paths: Iterable[str], max_workers: int = 8
+                 ) -> Iterator[Tuple[str, Optional[Tuple[bytes, str]], Optional[Exception]]]:
+        rel_paths = list(dict.fromkeys(rel_paths))
+        if not rel_paths:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rel_paths)))) as pool:
+            futures = {pool.submit(self.get, p): p for p in rel_paths}
+            for fut in as_completed(futures):
+                try:
+                    yield futures[fut], fut.result(), None
+                except Exception as e:
+                    yield futures[fut], None, e
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def put(self, rel_path: str, data: bytes, message: str, version: Optional[str] = None) -> str:
+        if version is not None:
+            self._check_version(rel_path, version)
+        return self.put_many({rel_path: data}, message)[rel_path]
+
+    def delete(self, rel_path: str, message: str, version: Optional[str] = None) -> None:
+        if version is not None:
+            self._check_version(rel_path, version)
+        self.put_many({rel_path: None}, message)
+
+    def _check_version(self, rel_path: str, version: str) -> None:
+        try:
+            current = self.get(rel_path)[1]
+        except FileNotFoundError:
+            current = ""
+        if current != version:
+            raise VersionConflict(f"{rel_path}: Version {version[:7]} ist veraltet" if version
+                                  else f"{rel_path}: existiert bereits")
+
+
+class GitHubBackend(StorageBackend):
+    """Speichert im GitHub-Repo (storage_github); Batches werden ein einziger Commit."""
+
+    name = "github"
+
+    def list_entries(self, prefix: str = "") -> List[DateiEintrag]:
+        from storage_github import gh_list_files
+        return gh_list_files(prefix)
+
+    def list_verzeichnis(self, verzeichnis: str = "") -> List[DateiEintrag]:
+        # eine Ebene des Trees statt des ganzen rekursiven Baums
+        from storage_github import gh_list_verzeichnis
+        return gh_list_verzeichnis(verzeichnis)
+
+    def head(self) -> Optional[str]:
+        # Branch-Head, prozessweit höchstens head_ttl Sekunden alt (bedingte Anfrage, 304 ist kostenlos)
+        from storage_github import gh_current_head
+        return gh_current_head()
+
+    def aenderungen(self, seit: str, bis: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+        # ein Compare-Request statt des ganzen Trees
+        from storage_github import gh_compare
+        return gh_compare(seit, bis)
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        from storage_github import gh_download_bytes
+        data = gh_download_bytes(rel_path)
+        return data, git_blob_sha(data)
+
+    def get_many(self, rel_paths: Iterable[str], max_workers: int = 0
+                 ) -> Iterator[Tuple[str, Optional[Tuple[bytes, str]], Optional[Exception]]]:
+        from storage_github import gh_download_many
+        for p, data, err in gh_download_many(rel_paths, max_workers=max_workers):
+            yield p, (None if err else (data, git_blob_sha(data))), err
+
+    def put(self, rel_path: str, data: bytes, message: str, version: Optional[str] = None) -> str:
+        # Einzeldatei über die Contents API: mit bekannter sha ein einziger PUT
+        from storage_github import gh_upload_bytes
+        gh_upload_bytes(rel_path, data, message, expected_sha=version)
+        return git_blob_sha(data)
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        from storage_github import gh_commit_files
+        gh_commit_files(files, message)
+        return {p: git_blob_sha(d) for p, d in files.items() if d is not None}
+
+
+class LocalBackend(StorageBackend):
+    """Speichert in einem lokalen Ordner – offline und mit Plattengeschwindigkeit."""
+
+    name = "local"
+
+    def __init__(self, root: str = DATENORDNER):
+        self.root = root
+        self._lock = threading.Lock()
+        # (pfad, mtime_ns, size) -> sha, damit Listings nicht jede Datei neu hashen
+        self._sha_cache = LRUCache(max_entries=4096)
+
+    def _path(self, rel_path: str) -> str:
+        rel_path = rel_path.strip("/")
+        if ".." in rel_path.split("/"):
+            raise ValueError(f"Ungültiger Pfad: {rel_path}")
+        return os.path.join(self.root, *rel_path.split("/"))
+
+    def list_entries(self, prefix: str = "", rekursiv: bool = True) -> List[DateiEintrag]:
+        eintraege = []
+        # nur das Verzeichnis des Präfixes durchlaufen (z. B. eine Sitzung), nicht den ganzen Datenordner
+        verzeichnis = prefix.rpartition("/")[0]
+        for dirpath, _, filenames in os.walk(self._path(verzeichnis) if verzeichnis else self.root):
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            for fn in filenames:
+                rel = fn if rel_dir == "." else f"{rel_dir}/{fn}"
+                if not rel.startswith(prefix) or ".tmp-" in fn:
+                    continue
+                st_ = os.stat(os.path.join(dirpath, fn))
+                key = (rel, st_.st_mtime_ns, st_.st_size)
+                sha = self._sha_cache.get(key)
+                if sha is None:
+                    sha = self.get(rel)[1]
+                    self._sha_cache.put(key, sha)
+                eintraege.append(eintrag_aus_pfad(rel, sha, st_.st_size))
+            if not rekursiv:
+                break
+        return sorted(eintraege, key=lambda e: e.pfad)
+
+    def list_verzeichnis(self, verzeichnis: str = "") -> List[DateiEintrag]:
+        return self.list_entries(verzeichnis, rekursiv=False)
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        with open(self._path(rel_path), "rb") as f:
+            data = f.read()
+        return data, git_blob_sha(data)
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        with self._lock:
+            # Erst alles in Temp-Dateien schreiben, dann umbenennen: ein Fehler beim
+            # Schreiben lässt alle Zieldateien unverändert.
+            staged = []
+            try:
+                for rel_path, data in files.items():
+                    if data is None:
+                        continue
+                    target = self._path(rel_path)
+                    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+                    tmp = f"{target}.tmp-{os.getpid()}"
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    staged.append((tmp, target))
+            except Exception:
+                for tmp, _ in staged:
+                    os.unlink(tmp)
+                raise
+            for tmp, target in staged:
+                os.replace(tmp, target)
+            for rel_path, data in files.items():
+                if data is None and os.path.exists(self._path(rel_path)):
+                    os.remove(self._path(rel_path))
+        return {p: git_blob_sha(d) for p, d in files.items() if d is not None}
+
+
+class FakeGitHubBackend(StorageBackend):
+    """
+    In-Process-Nachbau der GitHub-Contents-API: Blob-shas als Versionen, 409-Konflikte
+    bei veralteter sha, ein Commit pro Schreibvorgang. Für Offline-Betrieb und Benchmarks.
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self._files: Dict[str, bytes] = {}
+        self.commits: List[dict] = []
+        self._lock = threading.Lock()
+
+    def head(self) -> str:
+        return git_blob_sha(str(len(self.commits)).encode())
+
+    def list_entries(self, prefix: str = "") -> List[DateiEintrag]:
+        with self._lock:
+            return [
+                eintrag_aus_pfad(p, git_blob_sha(d), len(d))
+                for p, d in sorted(self._files.items()) if p.startswith(prefix)
+            ]
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        with self._lock:
+            if rel_path not in self._files:
+                raise FileNotFoundError(rel_path)
+            data = self._files[rel_path]
+        return data, git_blob_sha(data)
+
+    def put(self, rel_path: str, data: bytes, message: str, version: Optional[str] = None) -> str:
+        with self._lock:
+            current = self._files.get(rel_path)
+            if version is not None and ("" if current is None else git_blob_sha(current)) != version:
+                raise VersionConflict(f"{rel_path}: Version {version[:7]} ist veraltet" if version
+                                      else f"{rel_path}: existiert bereits")
+            return self._commit({rel_path: data}, message)[rel_path]
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        with self._lock:
+            return self._commit(files, message)
+
+    def _commit(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        for rel_path, data in files.items():
+            if data is None:
+                self._files.pop(rel_path, None)
+            else:
+                self._files[rel_path] = bytes(data)
+        self.commits.append({"message": message, "paths": sorted(files)})
+        return {p: git_blob_sha(d) for p, d in files.items() if d is not None}
+
+
+_BACKENDS = {"github": GitHubBackend, "local": LocalBackend, "fake": FakeGitHubBackend,
+             "sqlite": None}  # storage_sqlite, erst bei Bedarf importiert
+_BACKEND: Optional[StorageBackend] = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def make_backend(name: str) -> StorageBackend:
+    name = (name or "github").strip().lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unbekanntes Storage-Backend: {name!r} (erlaubt: {', '.join(_BACKENDS)})")
+    if name == "local":
+        return LocalBackend(storage_cfg("local_dir", DATENORDNER))
+    if name == "sqlite":
+        from storage_sqlite import SQLiteBackend
+        remote = storage_cfg("sqlite_remote", "github").strip().lower()
+        if remote == "sqlite":
+            raise ValueError("sqlite_remote darf nicht selbst 'sqlite' sein")
+        return SQLiteBackend(
+            storage_cfg("sqlite_path", ".kalorik.sqlite3"),
+            remote=None if remote in ("", "none") else make_backend(remote),
+            sync_interval=float(storage_cfg("sync_interval", "5") or 5),
+            batch_size=int(storage_cfg("sync_batch", "50") or 50),
+        )
+    return _BACKENDS[name]()
+
+
+def mit_format(backend: StorageBackend) -> StorageBackend:
+    """storage.format: "dateien" (eine CSV + Auswertung je Gruppe/Station) oder "datensatz"."""
+    fmt = storage_cfg("format", "dateien").strip().lower() or "dateien"
+    if fmt == "dateien":
+        return backend
+    if fmt != "datensatz":
+        raise ValueError(f"Unbekanntes Speicherformat: {fmt!r} (erlaubt: dateien, datensatz)")
+    from storage_datensatz import DatensatzBackend
+    return DatensatzBackend(backend, storage_cfg("datensatz_format", "auto").strip().lower())
+
+
+def get_backend() -> StorageBackend:
+    """Das konfigurierte Backend – einmal pro Prozess erzeugt und von allen Sessions geteilt."""
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                _BACKEND = mit_format(make_backend(storage_cfg("backend", "github")))
+    return _BACKEND
+
+
+def set_backend(backend: StorageBackend) -> None:
+    """Backend explizit setzen (z. B. FakeGitHubBackend für Benchmarks)."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        _BACKEND = backend
@@ -0,0 +1,437 @@
+# storage_datensatz.py
+"""
+Klassendatensatz: alle Messwerte und Auswertungen einer Klasse spaltenweise in einer Datei je
+Station (datensatz/station=<Station>.parquet, ohne pyarrow .jsonl.gz) statt einer CSV plus
+_auswertung.txt je Gruppe und Station. Jede Sitzung ('<Schuljahr>/<Klasse>/<Sitzung>/') hat
+ihren eigenen Datensatz in ihrem Verzeichnis.
+
+DatensatzBackend legt sich um ein beliebiges Backend (storage.format = "datensatz") und zeigt
+nach außen weiter die gewohnten Einzeldateien '{gruppe}_{station}.csv' / '..._auswertung.txt'.
+Die App merkt also keinen Unterschied; Schreiben ist ein Upsert in die Partition der Station
+(optimistisch über deren Version, auch beim Anlegen; bei Konflikt neu gelesen und wiederholt),
+Lesen holt die Partition einmal und liefert die Einzeldateien daraus. Alles andere (Bilder,
+Vorschauen) geht unverändert an das innere Backend.
+
+Einzeldateien, die es im inneren Backend schon gibt, bleiben lesbar, bis sie gespeichert oder
+mit migriere() übernommen werden; als_einzeldateien() exportiert zurück ins Einzeldatei-Layout.
+Das Partitionsformat nicht nachträglich umstellen: vorher exportieren, danach neu migrieren.
+"""
+import gzip
+import io
+import json
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from cache_utils import LRUCache
+from constants import STATIONEN
+from storage_backend import DateiEintrag, StorageBackend, VersionConflict, git_blob_sha
+
+ORDNER = "datensatz/"
+
+# Spalten der Partitionen und ihre Typen; "zeile" ist NA für Gruppen ohne Messwerte (Station D
+# oder nur eine Auswertung), "spalten" die ursprüngliche Spaltenfolge der CSV (JSON, NA = keine
+# CSV), "ganzzahlig" die Zahlenspalten, die in der CSV ganzzahlig waren (JSON, damit '2' nicht
+# als '2.0' zurückkommt; fehlt in älteren Partitionen), "extra" unbekannte Spalten je Zeile (JSON)
+SCHEMA = {
+    "gruppe": "string", "station": "string", "zeile": "Int64",
+    "zeit_min": "Float64", "kategorie": "string", "temperatur": "Float64",
+    "temperatur_thermos": "Float64", "temperatur_becher": "Float64", "bemerkung": "string",
+    "extra": "string", "spalten": "string", "ganzzahlig": "string", "auswertung": "string",
+}
+
+# CSV-Spalte der App -> Spalte im Datensatz
+CSV_SPALTEN = {
+    "Zeit [min]": "zeit_min",
+    "Kategorie": "kategorie",
+    "Temperatur [°C]": "temperatur",
+    "Temperatur Thermos [°C]": "temperatur_thermos",
+    "Temperatur Becher [°C]": "temperatur_becher",
+    "Bemerkung": "bemerkung",
+}
+
+
+def _station_schluessel(name: str) -> str:
+    # wie safe_component in Leitung.py, damit die Schlüssel zu den Zielnamen passen
+    name = name.strip().replace("–", "-").replace("—", "-").replace(" ", "_")
+    return re.sub(r'[^A-Za-z0-9_\-\.]', "_", name)
+
+
+STATION_SCHLUESSEL = [_station_schluessel(s) for s in STATIONEN]
+
+
+def zerlege(pfad: str) -> Optional[Tuple[str, str, str]]:
+    """
+    '[<verzeichnis>/]{gruppe}_{station}.csv' bzw. '..._auswertung.txt' -> (gruppe, station, art),
+    sonst None. Die Station wird am Ende erkannt, Gruppen-IDs dürfen also selbst '_' enthalten.
+    """
+    name = pfad.rpartition("/")[2]
+    if name.endswith(".csv"):
+        stamm, art = name[: -len(".csv")], "csv"
+    elif name.endswith("_auswertung.txt"):
+        stamm, art = name[: -len("_auswertung.txt")], "auswertung"
+    else:
+        return None
+    for station in STATION_SCHLUESSEL:
+        if stamm.endswith("_" + station) and len(stamm) > len(station) + 1:
+            return stamm[: -len(station) - 1], station, art
+    return None
+
+
+def verzeichnis(pfad: str) -> str:
+    """Verzeichnis eines Pfads samt abschließendem '/', "" für Dateien direkt im Datenordner."""
+    return pfad[: pfad.rfind("/") + 1]
+
+
+def _partition_verzeichnis(pfad: str) -> Optional[str]:
+    """Verzeichnis, zu dessen Datensatz die Partition pfad gehört; None, wenn pfad keine ist."""
+    ordner = verzeichnis(pfad)
+    if not pfad[len(ordner):].startswith("station=") or not (ordner == ORDNER or ordner.endswith("/" + ORDNER)):
+        return None
+    return ordner[: -len(ORDNER)]
+
+
+def _leer() -> pd.DataFrame:
+    return pd.DataFrame({s: pd.Series(dtype=t) for s, t in SCHEMA.items()})
+
+
+# ---------------------------------------------------------------- Einzeldatei <-> Zeilen
+def _messzeilen(gruppe: str, station: str, csv_bytes: bytes) -> pd.DataFrame:
+    """CSV einer Gruppe -> Zeilen im Schema (ohne Auswertung)."""
+    try:
+        df = pd.read_csv(io.BytesIO(csv_bytes))
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame()
+    n = len(df)
+    zeilen = {"zeile": pd.array(list(range(n)) if n else [pd.NA], dtype="Int64")}
+    sonstige, ganzzahlig = [], []
+    for spalte in df.columns:
+        ziel = CSV_SPALTEN.get(spalte)
+        if ziel is None:
+            sonstige.append(spalte)
+        elif SCHEMA[ziel] == "Float64":
+            zahlen = pd.to_numeric(df[spalte], errors="coerce")
+            if (zahlen.isna() & df[spalte].notna()).any():  # Text in einer Zahlenspalte: verlustfrei als extra
+                sonstige.append(spalte)
+            else:
+                zeilen[ziel] = zahlen.astype("Float64").array
+                if pd.api.types.is_integer_dtype(df[spalte]):
+                    ganzzahlig.append(str(spalte))
+        else:
+            zeilen[ziel] = df[spalte].astype("string").array
+    if sonstige and n:
+        werte = df[sonstige].astype(object).where(df[sonstige].notna(), None).to_dict("records")
+        zeilen["extra"] = [json.dumps(w, ensure_ascii=False) for w in werte]
+    tabelle = pd.DataFrame(zeilen, index=range(max(n, 1)))
+    tabelle["gruppe"], tabelle["station"] = gruppe, station
+    tabelle["spalten"] = json.dumps([str(s) for s in df.columns], ensure_ascii=False)
+    tabelle["ganzzahlig"] = json.dumps(ganzzahlig, ensure_ascii=False) if ganzzahlig else None
+    return tabelle.reindex(columns=list(SCHEMA)).astype(SCHEMA)
+
+
+def _csv_bytes(zeilen: pd.DataFrame) -> bytes:
+    """Zeilen einer Gruppe -> CSV wie von speichere_daten geschrieben."""
+    spalten = json.loads(zeilen["spalten"].iloc[0])
+    ganzzahlig = set(json.loads(zeilen["ganzzahlig"].iloc[0])) if pd.notna(zeilen["ganzzahlig"].iloc[0]) else set()
+    zeilen = zeilen[zeilen["zeile"].notna()].sort_values("zeile")
+    extra = [json.loads(x) for x in zeilen["extra"].dropna()]
+    if extra:
+        extra_df = pd.DataFrame(extra)
+    daten = {}
+    for s in spalten:
+        if extra and s in extra_df.columns:
+            daten[s] = extra_df[s].to_numpy()
+        elif s in ganzzahlig:
+            daten[s] = zeilen[CSV_SPALTEN[s]].astype("Int64").to_numpy()
+        elif s in CSV_SPALTEN:
+            daten[s] = zeilen[CSV_SPALTEN[s]].to_numpy()
+        else:
+            daten[s] = [None] * len(zeilen)
+    return pd.DataFrame(daten, columns=spalten).to_csv(index=False).encode("utf-8-sig")
+
+
+def _gruppe_bauen(gruppe: str, station: str, messzeilen: Optional[pd.DataFrame],
+                  auswertung: Optional[str]) -> Optional[pd.DataFrame]:
+    if messzeilen is None and auswertung is None:
+        return None
+    if messzeilen is None:  # nur Auswertung: Platzhalterzeile ohne CSV
+        messzeilen = pd.DataFrame({"gruppe": [gruppe], "station": [station]}).reindex(
+            columns=list(SCHEMA)).astype(SCHEMA)
+    messzeilen = messzeilen.copy()
+    messzeilen["auswertung"] = pd.array([auswertung] * len(messzeilen), dtype="string")
+    return messzeilen
+
+
+def upsert(tabelle: pd.DataFrame, station: str, dateien: Dict[str, Optional[bytes]]) -> pd.DataFrame:
+    """
+    Einzeldateien (None = löschen) in die Partition einer Station übernehmen. CSV und Auswertung
+    einer Gruppe sind unabhängig: eine neue CSV behält die Auswertung und umgekehrt.
+    """
+    je_gruppe: Dict[str, Dict[str, Optional[bytes]]] = {}
+    for pfad, daten in dateien.items():
+        gruppe, _, art = zerlege(pfad)
+        je_gruppe.setdefault(gruppe, {})[art] = daten
+    betroffen = tabelle["gruppe"].isin(list(je_gruppe))
+    neu = [tabelle[~betroffen]]
+    for gruppe, arten in je_gruppe.items():
+        alt = tabelle[betroffen & (tabelle["gruppe"] == gruppe)]
+        messzeilen = alt.drop(columns="auswertung") if len(alt) and alt["spalten"].notna().any() else None
+        auswertung = alt["auswertung"].iloc[0] if len(alt) and pd.notna(alt["auswertung"].iloc[0]) else None
+        if "csv" in arten:
+            messzeilen = None if arten["csv"] is None else _messzeilen(gruppe, station, arten["csv"])
+        if "auswertung" in arten:
+            daten = arten["auswertung"]
+            auswertung = None if daten is None else daten.decode("utf-8", errors="replace")
+        zeilen = _gruppe_bauen(gruppe, station, messzeilen, auswertung)
+        if zeilen is not None:
+            neu.append(zeilen)
+    tabelle = pd.concat([t for t in neu if len(t)], ignore_index=True) if any(len(t) for t in neu) else _leer()
+    return tabelle.astype(SCHEMA).sort_values(["gruppe", "zeile"], na_position="first", ignore_index=True)
+
+
+def einzeldateien(tabelle: pd.DataFrame, ordner: str = "") -> Dict[str, bytes]:
+    """Partition -> {'<ordner>{gruppe}_{station}.csv': Bytes, '..._auswertung.txt': Bytes}."""
+    dateien = {}
+    for (gruppe, station), zeilen in tabelle.groupby(["gruppe", "station"], sort=True):
+        stamm = f"{ordner}{gruppe}_{station}"
+        if zeilen["spalten"].notna().any():
+            dateien[f"{stamm}.csv"] = _csv_bytes(zeilen)
+        if pd.notna(zeilen["auswertung"].iloc[0]):
+            dateien[f"{stamm}_auswertung.txt"] = zeilen["auswertung"].iloc[0].encode("utf-8")
+    return dateien
+
+
+# ---------------------------------------------------------------- Partitionsformat
+def standard_format() -> str:
+    """"parquet", wenn pyarrow installiert ist, sonst "jsonl" (gzip)."""
+    import importlib.util
+    return "parquet" if importlib.util.find_spec("pyarrow") is not None else "jsonl"
+
+
+def schreibe_partition(tabelle: pd.DataFrame, fmt: str) -> bytes:
+    tabelle = tabelle.reindex(columns=list(SCHEMA)).astype(SCHEMA)
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        tabelle.to_parquet(buf, index=False)
+        return buf.getvalue()
+    zeilen = tabelle.astype(object).where(tabelle.notna(), None).to_dict("records")
+    text = "".join(json.dumps(z, ensure_ascii=False) + "\n" for z in zeilen)
+    # mtime=0: gleicher Inhalt ergibt dieselben Bytes, also dieselbe Version (kein leerer Commit)
+    return gzip.compress(text.encode("utf-8"), mtime=0)
+
+
+def lies_partition(pfad: str, daten: bytes) -> pd.DataFrame:
+    if pfad.endswith(".parquet"):
+        tabelle = pd.read_parquet(io.BytesIO(daten))
+    else:
+        zeilen = [json.loads(z) for z in gzip.decompress(daten).decode("utf-8").splitlines() if z]
+        tabelle = pd.DataFrame(zeilen, columns=list(SCHEMA))
+    return tabelle.reindex(columns=list(SCHEMA)).astype(SCHEMA)
+
+
+# ---------------------------------------------------------------- Backend
+class DatensatzBackend(StorageBackend):
+    """
+    Einzeldatei-Ansicht auf den Klassendatensatz im inneren Backend. name, status() usw.
+    kommen vom inneren Backend, damit Anzeige und Diagnose unverändert bleiben.
+    """
+
+    format = "datensatz"
+
+    def __init__(self, inner: StorageBackend, fmt: str = "auto", versuche: int = 5):
+        self.inner = inner
+        self.fmt = standard_format() if fmt in ("", "auto") else fmt
+        if self.fmt not in ("parquet", "jsonl"):
+            raise ValueError(f"Unbekanntes Datensatz-Format: {fmt!r} (erlaubt: auto, parquet, jsonl)")
+        self.versuche = versuche
+        self._lock = threading.Lock()
+        # (Partition, Version) -> (Tabelle, Einzeldateien); inhaltsadressiert, also nie veraltet
+        self._partitionen = LRUCache(max_entries=16)
+
+    def __getattr__(self, name):
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    def partition(self, station: str, ordner: str = "") -> str:
+        endung = "parquet" if self.fmt == "parquet" else "jsonl.gz"
+        return f"{ordner}{ORDNER}station={station}.{endung}"
+
+    def _partition_fuer(self, rel_path: str) -> Optional[str]:
+        """Partition, in der die Einzeldatei rel_path liegt; None für alles außerhalb des Datensatzes."""
+        teile = zerlege(rel_path)
+        return None if teile is None else self.partition(teile[1], verzeichnis(rel_path))
+
+    def _ansicht(self, pfad: str, daten: bytes, version: str) -> Tuple[pd.DataFrame, Dict[str, bytes]]:
+        ansicht = self._partitionen.get((pfad, version))
+        if ansicht is None:
+            tabelle = lies_partition(pfad, daten)
+            ansicht = (tabelle, einzeldateien(tabelle, _partition_verzeichnis(pfad)))
+            self._partitionen.put((pfad, version), ansicht)
+        return ansicht
+
+    def _lade_partition(self, pfad: str) -> Tuple[Optional[bytes], Optional[str], pd.DataFrame, Dict[str, bytes]]:
+        try:
+            daten, version = self.inner.get(pfad)
+        except FileNotFoundError:
+            return None, None, _leer(), {}
+        return (daten, version, *self._ansicht(pfad, daten, version))
+
+    def head(self) -> Optional[str]:
+        return self.inner.head()
+
+    def list_entries(self, prefix: str = "") -> List[DateiEintrag]:
+        # inneres Listing auf das Verzeichnis des Präfixes begrenzt: dort liegen auch die Partitionen
+        return [e for e in self._mit_datensatz(self.inner.list_entries(verzeichnis(prefix)))
+                if e.pfad.startswith(prefix)]
+
+    def list_verzeichnis(self, ordner: str = "") -> List[DateiEintrag]:
+        # die Ebene selbst plus deren Datensatz-Unterordner, nicht alle Unterverzeichnisse
+        innen = self.inner.list_verzeichnis(ordner) + self.inner.list_verzeichnis(ordner + ORDNER)
+        return [e for e in self._mit_datensatz(innen) if "/" not in e.pfad[len(ordner):]]
+
+    def _mit_datensatz(self, innen: List[DateiEintrag]) -> List[DateiEintrag]:
+        """Listing des inneren Backends mit den Partitionen aufgelöst in virtuelle Einzeldateien."""
+        virtuell = {}
+        for e in innen:
+            if _partition_verzeichnis(e.pfad) is not None:
+                for pfad, daten in self._lade_partition(e.pfad)[3].items():
+                    gruppe, station, art = zerlege(pfad)
+                    virtuell[pfad] = DateiEintrag(pfad, gruppe, station, art, git_blob_sha(daten), len(daten))
+        eintraege = list(virtuell.values()) + [
+            e for e in innen if _partition_verzeichnis(e.pfad) is None and e.pfad not in virtuell]
+        return sorted(eintraege, key=lambda e: e.pfad)
+
+    def tabelle(self, stationen: Optional[Iterable[str]] = None, ordner: str = "") -> pd.DataFrame:
+        """
+        Der Datensatz eines Verzeichnisses (bzw. die genannten Stationen) als ein DataFrame,
+        eine Abfrage je Partition. ordner: z. B. die Sitzung '2025-26/8b/2025-10-18/'.
+        """
+        stationen = list(stationen) if stationen is not None else STATION_SCHLUESSEL
+        pfade = [self.partition(s, ordner) for s in stationen]
+        teile = []
+        for pfad, result, err in self.inner.get_many(pfade):
+            if err is not None and not isinstance(err, FileNotFoundError):
+                raise err
+            if result is not None:
+                teile.append(self._ansicht(pfad, *result)[0])
+        teile = [t for t in teile if len(t)]
+        if not teile:
+            return _leer()
+        return pd.concat(teile, ignore_index=True).sort_values(["station", "gruppe", "zeile"], ignore_index=True)
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        partition = self._partition_fuer(rel_path)
+        if partition is not None:
+            dateien = self._lade_partition(partition)[3]
+            if rel_path in dateien:
+                return dateien[rel_path], git_blob_sha(dateien[rel_path])
+        # nicht im Datensatz: noch nicht übernommene Einzeldatei bzw. Bild
+        return self.inner.get(rel_path)
+
+    def get_many(self, rel_paths: Iterable[str], max_workers: int = 0
+                 ) -> Iterator[Tuple[str, Optional[Tuple[bytes, str]], Optional[Exception]]]:
+        rel_paths = list(dict.fromkeys(rel_paths))
+        je_partition: Dict[str, List[str]] = {}
+        direkt = []
+        for p in rel_paths:
+            partition = self._partition_fuer(p)
+            if partition is None:
+                direkt.append(p)
+            else:
+                je_partition.setdefault(partition, []).append(p)
+        for pfad, result, err in self.inner.get_many(je_partition, max_workers=max_workers):
+            if err is not None and not isinstance(err, FileNotFoundError):
+                for p in je_partition[pfad]:
+                    yield p, None, err
+                continue
+            dateien = self._ansicht(pfad, *result)[1] if result is not None else {}
+            for p in je_partition[pfad]:
+                if p in dateien:
+                    yield p, (dateien[p], git_blob_sha(dateien[p])), None
+                else:
+                    direkt.append(p)
+        yield from self.inner.get_many(direkt, max_workers=max_workers)
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        je_partition: Dict[str, Dict[str, Optional[bytes]]] = {}
+        rest = {}
+        for p, d in files.items():
+            partition = self._partition_fuer(p)
+            if partition is None:
+                rest[p] = d
+            else:
+                je_partition.setdefault(partition, {})[p] = d
+                if d is None:  # auch eine noch nicht übernommene Einzeldatei gleichen Namens löschen
+                    try:
+                        self.inner.get(p)
+                        rest[p] = None
+                    except FileNotFoundError:
+                        pass
+        versionen = {}
+        for partition, dateien in je_partition.items():
+            neu = self._upsert(partition, dateien, message)
+            versionen.update({p: git_blob_sha(neu[p]) for p in dateien if p in neu})
+        if rest:
+            versionen.update(self.inner.put_many(rest, message))
+        return versionen
+
+    def _upsert(self, pfad: str, dateien: Dict[str, Optional[bytes]], message: str) -> Dict[str, bytes]:
+        station = zerlege(next(iter(dateien)))[1]
+        with self._lock:
+            for versuch in range(self.versuche):
+                daten, version, tabelle, _ = self._lade_partition(pfad)
+                neu = upsert(tabelle, station, dateien)
+                neu_daten = schreibe_partition(neu, self.fmt)
+                if neu_daten == daten:
+                    return self._ansicht(pfad, daten, version)[1]
+                try:
+                    # neue Partition nur anlegen, wenn sie nicht gerade jemand anderes angelegt hat
+                    neu_version = self.inner.put(pfad, neu_daten, message,
+                                                 version="" if version is None else version)
+                except VersionConflict:
+                    # jemand anderes hat die Partition geändert: neu lesen und wiederholen
+                    time.sleep(0.2 * 2 ** versuch)
+                    continue
+                return self._ansicht(pfad, neu_daten, neu_version)[1]
+        raise VersionConflict(f"{pfad}: nach {self.versuche} Versuchen immer noch veraltet")
+
+
+# ---------------------------------------------------------------- Migration / Export
+def migriere(backend: DatensatzBackend, loeschen: bool = False, prefix: str = "") -> int:
+    """
+    Übernimmt alle Einzeldateien (CSV/Auswertung) des inneren Backends unter prefix in den
+    Datensatz ihres Verzeichnisses, ein Schreibvorgang je Verzeichnis und Station. Mit
+    loeschen=True werden die Einzeldateien danach entfernt. Gibt die Zahl der übernommenen Dateien zurück.
+    """
+    pfade = [e.pfad for e in backend.inner.list_entries(prefix) if zerlege(e.pfad) is not None]
+    je_partition: Dict[str, Dict[str, bytes]] = {}
+    for pfad, result, err in backend.inner.get_many(pfade):
+        if err is not None:
+            raise err
+        je_partition.setdefault(backend._partition_fuer(pfad), {})[pfad] = result[0]
+    for partition, dateien in sorted(je_partition.items()):
+        backend._upsert(partition, dateien, f"Datensatz: {partition} übernommen")
+    if loeschen and pfade:
+        backend.inner.put_many({p: None for p in pfade}, "Datensatz: Einzeldateien entfernt")
+    return len(pfade)
+
+
+def als_einzeldateien(backend: DatensatzBackend, ordner: str = "") -> Dict[str, bytes]:
+    """Der Datensatz eines Verzeichnisses im Einzeldatei-Layout ({ordner}{zielname}.csv + _auswertung.txt)."""
+    return einzeldateien(backend.tabelle(ordner=ordner), ordner)
+
+
+def als_app_tabelle(tabelle: pd.DataFrame) -> pd.DataFrame:
+    """Datensatz -> Messwerte mit den CSV-Spaltennamen der App plus Gruppe/Station (ohne Platzhalter)."""
+    tabelle = tabelle[tabelle["zeile"].notna()]
+    spalten = [s for s in CSV_SPALTEN.values() if tabelle[s].notna().any()]
+    ergebnis = tabelle[spalten].rename(columns={v: k for k, v in CSV_SPALTEN.items()})
+    return ergebnis.assign(Gruppe=tabelle["gruppe"], Station=tabelle["station"]).reset_index(drop=True)
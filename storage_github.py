@@ -1,14 +1,21 @@
 # storage_github.py
-import base64, os, requests, time
+import base64, bisect, functools, itertools, os, random, requests, threading, time
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote  # <— NEU
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cache_utils import LRUCache, SharedCache
+from storage_backend import (DateiEintrag, DauerhafterFehler, VersionConflict, eintrag_aus_pfad, git_blob_sha,
+                             is_background_io)
+from storage_metrics import METRICS
 
-API = "https://api.github.com"
 USER_AGENT = "Kalorik-App/1.0 (+https://github.com/polyesterschaf-png/Kalorik)"
 
 def _headers(accept_raw: bool = False):
     h = {
-        "Authorization": f"Bearer {TOKEN}",  # "token" geht auch, "Bearer" ist aktueller
+        "Authorization": f"Bearer {_settings().token}",  # "token" geht auch, "Bearer" ist aktueller
         "Accept": "application/vnd.github+json",
         "User-Agent": USER_AGENT,
         "X-GitHub-Api-Version": "2022-11-28",
@@ -35,23 +42,390 @@ def _cfg(key: str, default: Optional[str] = None) -> str:
     except Exception:
         return os.environ.get(f"GITHUB_{key.upper()}", default or "")
 
-TOKEN      = _cfg("token")
-OWNER      = _cfg("owner")
-REPO       = _cfg("repo")
-BRANCH     = _cfg("branch", "main")
-BASE_PATH  = _cfg("base_path", "KalorikDaten").strip("/")
-COMMITTER_NAME  = _cfg("committer_name", "App Bot")
-COMMITTER_EMAIL = _cfg("committer_email", "bot@example.org")
+@dataclass(frozen=True)
+class _Settings:
+    api: str
+    token: str
+    owner: str
+    repo: str
+    branch: str
+    base_path: str
+    committer_name: str
+    committer_email: str
+    cache_size: int
+    max_retries: int
+    pool_size: int
+    max_workers: int
+    # Scheduler: Burst-Größe des Token-Buckets, für interaktive Zugriffe reservierte Anfragen,
+    # Takt schreibender Anfragen (sekundäres Limit: max. 80/min, kurze Bursts erlaubt) und wie
+    # lange bei erschöpftem Kontingent gewartet wird, bevor ein Aufruf doch fehlschlägt
+    # (Hintergrundarbeit bis max_defer, interaktive Aufrufe nur bis interactive_max_wait).
+    rate_burst: int
+    rate_reserve: int
+    write_interval: float
+    write_burst: int
+    max_defer: float
+    interactive_max_wait: float
+    # Gemeinsame Ablage aller Sessions (MB) und wie alt der dort benutzte Branch-Head sein darf (s)
+    shared_cache_mb: int
+    head_ttl: float
+
+@functools.lru_cache(maxsize=None)
+def _settings() -> _Settings:
+    """
+    Konfiguration einmal pro Prozess und erst beim ersten GitHub-Zugriff lesen – der Import
+    dieses Moduls kostet so weder st.secrets noch Umgebungszugriffe.
+    """
+    s = _Settings(
+        api=_cfg("api_url", "https://api.github.com").rstrip("/"),  # z. B. lokaler Fake für Benchmarks
+        token=_cfg("token"),
+        owner=_cfg("owner"),
+        repo=_cfg("repo"),
+        branch=_cfg("branch", "main"),
+        base_path=_cfg("base_path", "KalorikDaten").strip("/"),
+        committer_name=_cfg("committer_name", "App Bot"),
+        committer_email=_cfg("committer_email", "bot@example.org"),
+        cache_size=int(_cfg("cache_size", "256") or 256),
+        max_retries=int(_cfg("max_retries", "4") or 4),
+        pool_size=int(_cfg("pool_size", "32") or 32),
+        max_workers=int(_cfg("max_workers", "8") or 8),
+        rate_burst=int(_cfg("rate_burst", "50") or 50),
+        rate_reserve=int(_cfg("rate_reserve", "100") or 100),
+        write_interval=float(_cfg("write_interval", "0.75") or 0.75),
+        write_burst=int(_cfg("write_burst", "10") or 10),
+        max_defer=float(_cfg("max_defer", "900") or 900),
+        interactive_max_wait=float(_cfg("interactive_max_wait", "15") or 15),
+        shared_cache_mb=int(_cfg("shared_cache_mb", "64") or 64),
+        head_ttl=float(_cfg("head_ttl", "2") or 2),
+    )
+    _SHARED.max_bytes = max(1, s.shared_cache_mb) * 2 ** 20
+    _DOWNLOAD_CACHE.max_entries = s.cache_size
+    _KNOWN_SHA.max_entries = s.cache_size * 16
+    return s
+
+def __getattr__(name: str):
+    # Bisherige Modulkonstanten (storage_github.BRANCH, MAX_WORKERS, …) bleiben lesbar
+    if name.lower() in _Settings.__dataclass_fields__:
+        return getattr(_settings(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _repo_url() -> str:
+    c = _settings()
+    return f"{c.api}/repos/{c.owner}/{c.repo}"
+
+# Eine Session für den ganzen Prozess (alle Streamlit-Sessions): Keep-Alive + Connection-Pool,
+# damit nicht jeder Aufruf einen neuen TCP/TLS-Handshake zu api.github.com bezahlt.
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+def _session() -> requests.Session:
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_settings().pool_size, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _SESSION = s
+    return _SESSION
+
+_RETRY_STATUS = {500, 502, 503, 504}
+
+
+class RateLimitErreicht(RuntimeError):
+    """Kontingent erschöpft und die Wartezeit wäre für einen interaktiven Aufruf zu lang."""
+
+
+def _wiederholbar(method: str, url: str, body: Optional[dict]) -> bool:
+    """
+    Darf nach 5xx/Netzfehler wiederholt werden? Nur was beim zweiten Mal nichts anderes bewirkt:
+    Lesen und das Vorziehen einer Ref ohne force. Blobs/Trees/Commits (POST) und Contents-PUTs
+    nicht – ging nur die Antwort verloren, entstünde sonst ein zweiter Commit.
+    """
+    if method in ("GET", "HEAD"):
+        return True
+    return method == "PATCH" and "/git/refs/" in url and not (body or {}).get("force", False)
+
+def _is_rate_limited(r) -> bool:
+    if r.status_code == 429:
+        return True
+    # Primäres Limit (Remaining 0) oder sekundäres Limit (Retry-After) kommen als 403
+    return r.status_code == 403 and (
+        r.headers.get("Retry-After") is not None or r.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+def _retry_delay(attempt: int, r=None) -> float:
+    """
+    Wartezeit vor dem nächsten Versuch: Retry-After bzw. X-RateLimit-Reset, wenn GitHub sie
+    vorgibt, sonst exponentieller Backoff mit vollem Jitter (0.25 s, 0.5 s, 1 s, … max. 8 s).
+    """
+    if r is not None:
+        retry_after = r.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        reset = r.headers.get("X-RateLimit-Reset")
+        if reset and r.headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                return min(max(float(reset) - time.time(), 0.0) + 1.0, 60.0)
+            except ValueError:
+                pass
+    return random.uniform(0, min(8.0, 0.25 * 2 ** attempt))
+
+def _pause(op: str, attempt: int, r=None) -> None:
+    """Backoff vor dem nächsten Versuch; die Wartezeit wird je Operation mitgezählt."""
+    delay = _retry_delay(attempt, r)
+    METRICS.record_wait(op, delay)
+    time.sleep(delay)
+
+# Prioritäten: kleiner = früher dran
+PRIO_READ, PRIO_WRITE, PRIO_BACKGROUND = 0, 1, 2
+
+class _Scheduler:
+    """
+    Vergibt jede GitHub-Anfrage des Prozesses (alle Streamlit-Sessions teilen sich ein Token).
+
+    - Token-Bucket: Nachfüllrate = verbleibendes Kontingent / Zeit bis Reset, beides live aus
+      X-RateLimit-Remaining/-Reset; Burst bis rate_burst. 304-Antworten werden erstattet.
+    - Prioritäten: interaktive Lesezugriffe vor Schreibzugriffen vor Hintergrundarbeit;
+      Hintergrundarbeit lässt außerdem rate_reserve Anfragen für interaktive Zugriffe übrig.
+    - Schreibende Anfragen haben einen eigenen Bucket: bis write_burst sofort, danach eine je
+      write_interval Sekunden (sekundäres Limit für Inhalte erzeugende Anfragen).
+    - Bei erschöpftem Kontingent bzw. Retry-After wird alles zurückgestellt statt abgelehnt.
+    """
+
+    def __init__(self, burst: Optional[int] = None, write_interval: Optional[float] = None,
+                 reserve: Optional[int] = None, write_burst: Optional[int] = None):
+        c = _settings()
+        self.burst = max(1, c.rate_burst if burst is None else burst)
+        self.write_interval = c.write_interval if write_interval is None else write_interval
+        self.write_burst = max(1, c.write_burst if write_burst is None else write_burst)
+        self.reserve = c.rate_reserve if reserve is None else reserve
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[Tuple[int, int, bool]] = []  # sortiert: (prio, seq, write)
+        self._tokens = float(self.burst)
+        self._rate = 5000 / 3600  # bis die ersten Header da sind: GitHub-Standard für Tokens
+        self._stamp = time.monotonic()
+        self._remaining: Optional[int] = None
+        self._reset_at = 0.0        # monotonic
+        self._write_tokens = float(self.write_burst)
+        self._blocked_until = 0.0   # monotonic, Retry-After / Kontingent erschöpft
+
+    def _refill(self, now: float) -> None:
+        if self._remaining is not None and now >= self._reset_at:
+            # neues Zeitfenster: volles Kontingent, Rate bis zur nächsten Antwort geschätzt
+            self._remaining, self._tokens, self._rate = None, float(self.burst), 5000 / 3600
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self._rate)
+        if self.write_interval > 0:
+            self._write_tokens = min(self.write_burst,
+                                     self._write_tokens + (now - self._stamp) / self.write_interval)
+        else:
+            self._write_tokens = float(self.write_burst)
+        self._stamp = now
+
+    def _write_ready(self) -> bool:
+        return self._write_tokens >= 1
+
+    def _delay(self, ticket: Tuple[int, int, bool], now: float) -> float:
+        """0, wenn ticket jetzt starten darf, sonst ungefähre Wartezeit in Sekunden."""
+        prio, _, write = ticket
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if (prio == PRIO_BACKGROUND and self._remaining is not None
+                and self._remaining <= self.reserve and now < self._reset_at):
+            return self._reset_at - now
+        for other in self._waiting:
+            if other == ticket:
+                break
+            if not other[2] or self._write_ready():
+                return 0.05  # wichtigere (bzw. ältere) Anfrage ist startbereit und geht vor
+        if write and not self._write_ready():
+            return (1 - self._write_tokens) * self.write_interval
+        if self._tokens < 1:
+            return (1 - self._tokens) / max(self._rate, 1e-3)
+        return 0.0
+
+    def acquire(self, prio: int, write: bool, max_wait: Optional[float] = None) -> float:
+        """
+        Blockiert, bis die Anfrage starten darf. Rückgabe: gewartete Sekunden. Mit max_wait
+        RateLimitErreicht, sobald absehbar ist, dass die Wartezeit länger würde.
+        """
+        start = time.monotonic()
+        ticket = (prio, next(self._seq), write)
+        with self._cond:
+            bisect.insort(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._delay(ticket, now)
+                    if delay <= 0:
+                        break
+                    if max_wait is not None and now + delay - start > max_wait:
+                        raise RateLimitErreicht(
+                            f"GitHub-Kontingent erschöpft, wieder frei in etwa {delay:.0f} s")
+                    self._cond.wait(timeout=min(delay, 1.0))
+                self._tokens -= 1
+                if write:
+                    self._write_tokens -= 1
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+        return time.monotonic() - start
+
+    def update(self, r, rate_limited: bool, attempt: int = 0) -> None:
+        """Kontingent aus den Antwort-Headern übernehmen; bei Rate-Limit alle zurückstellen."""
+        now = time.monotonic()
+        with self._cond:
+            if r.status_code == 304:
+                self._tokens = min(self.burst, self._tokens + 1)  # bedingte Anfragen sind kostenlos
+            try:
+                remaining = int(r.headers["X-RateLimit-Remaining"])
+                reset_in = max(float(r.headers["X-RateLimit-Reset"]) - time.time(), 1.0)
+            except (KeyError, TypeError, ValueError):
+                remaining = None
+            if remaining is not None:
+                self._refill(now)
+                self._remaining, self._reset_at = remaining, now + reset_in
+                self._rate = remaining / reset_in
+                self._tokens = min(self._tokens, remaining)
+                if remaining == 0:
+                    self._blocked_until = max(self._blocked_until, self._reset_at)
+            if rate_limited:
+                self._blocked_until = max(self._blocked_until, now + _retry_delay(attempt, r))
+            self._cond.notify_all()
+
+    def status(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "tokens": round(self._tokens, 1),
+                "rate_per_s": round(self._rate, 3),
+                "waiting": len(self._waiting),
+                "blocked_s": round(max(0.0, self._blocked_until - now), 1),
+            }
+
+_SCHEDULER: Optional[_Scheduler] = None  # beim ersten Request angelegt (liest die Konfiguration)
+
+def _scheduler() -> _Scheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _SESSION_LOCK:
+            if _SCHEDULER is None:
+                _SCHEDULER = _Scheduler()
+    return _SCHEDULER
+
+def gh_scheduler_status() -> dict:
+    """Token-Bucket, Warteschlange und Sperre des Schedulers (für das Diagnose-Panel)."""
+    return _scheduler().status()
+
+def _request(method: str, url: str, op: str = "other", **kwargs) -> requests.Response:
+    """
+    Einheitlicher Transport für alle GitHub-Aufrufe: über den Scheduler (Priorität, Kontingent,
+    Schreibtakt), gepoolte Session, Retry bei Netzfehlern und 5xx – nur für wiederholbare
+    Anfragen (_wiederholbar). Bei Rate-Limits wird zurückgestellt und erneut versucht statt
+    abgebrochen: Hintergrundarbeit bis zu max_defer Sekunden, interaktive Aufrufe (eine
+    Streamlit-Session wartet) nur bis interactive_max_wait, danach RateLimitErreicht.
+    Konflikte (409/422) gibt es unverändert zurück – die Aufrufer müssen dafür erst neuen Zustand
+    (sha/Head) holen und nutzen dann ebenfalls _pause.
+    Jeder Versuch wird mit Dauer, Status und Rate-Limit-Headern unter `op` in METRICS erfasst.
+    """
+    kwargs.setdefault("timeout", 30)
+    write = method not in ("GET", "HEAD")
+    c = _settings()
+    if is_background_io():
+        prio, max_wait = PRIO_BACKGROUND, None
+    else:
+        prio, max_wait = (PRIO_WRITE if write else PRIO_READ), c.interactive_max_wait
+    wiederholbar = _wiederholbar(method, url, kwargs.get("json"))
+    defer_until = time.monotonic() + (c.max_defer if max_wait is None else min(c.max_defer, max_wait))
+    attempt = limited_attempt = 0
+    while True:
+        waited = _scheduler().acquire(prio, write, max_wait)
+        if waited > 0.01:
+            METRICS.record_wait(op, waited)
+        t0 = time.perf_counter()
+        try:
+            r = _session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            METRICS.record(op, method, None, time.perf_counter() - t0, attempt=attempt)
+            if attempt == c.max_retries or not wiederholbar:
+                raise
+            _pause(op, attempt)
+            attempt += 1
+            continue
+        limited = _is_rate_limited(r)
+        METRICS.record(op, method, r.status_code, time.perf_counter() - t0, r.headers,
+                       attempt + limited_attempt, limited)
+        _scheduler().update(r, limited, limited_attempt)
+        if limited and time.monotonic() < defer_until:
+            limited_attempt += 1  # Scheduler hält bis Retry-After/Reset zurück, dann neuer Versuch
+            continue
+        if attempt == c.max_retries or r.status_code not in _RETRY_STATUS or not wiederholbar:
+            return r
+        _pause(op, attempt, r)
+        attempt += 1
+
+# Read-through-Cache für Downloads: voller Pfad -> (ETag, Bytes).
+# Jeder Zugriff wird per If-None-Match revalidiert; ein 304 kostet weder Body noch Rate-Limit.
+_DOWNLOAD_CACHE = LRUCache(max_entries=256)  # Größe aus cache_size, siehe _settings
+
+# Zuletzt bekannte Blob-sha je vollem Pfad, gefüllt aus Download-, Listing- und Upload-Antworten.
+# "" heißt: Datei existiert bekanntermaßen nicht. Uploads schreiben optimistisch mit dieser sha
+# und holen sie nur bei 409/422 neu – das spart den GET vor jedem PUT. Ob ein Inhalt unverändert
+# ist und übersprungen werden darf, entscheidet erst der Index des aktuellen Heads (_remote_gleich).
+_KNOWN_SHA = LRUCache(max_entries=256 * 16)
+
+
+class _Index(NamedTuple):
+    """Dateien eines Verzeichnisses unter BASE_PATH (rekursiv) zu einem Commit; Pfade relativ zu BASE_PATH."""
+    entries: List[DateiEintrag]
+    by_path: Dict[str, DateiEintrag]
+    complete: bool  # False: Tree war abgeschnitten, nur die oberste Ebene ist bekannt
+
+
+def _sizeof(value) -> int:
+    if isinstance(value, _Index):
+        return 256 * len(value.entries) + 256  # grobe Schätzung je DateiEintrag
+    return len(value)
+
+
+# Gemeinsame Ablage aller Sessions dieses Prozesses (Größe aus shared_cache_mb):
+#   ("tree", commit_sha, verzeichnis) -> _Index   Dateiliste eines Heads unterhalb von verzeichnis
+#                                                 ("" = ganzer Datenordner, sonst z. B. eine Sitzung)
+#   ("ebene", commit_sha, verzeichnis) -> _Index  nur die Dateien direkt in verzeichnis
+#   ("blob", blob_sha)                -> Bytes    inhaltsadressiert, also nie veraltet
+# (Head, Pfad) wird über den Index zur Blob-sha aufgelöst. Schreibt dieser Prozess, rückt der
+# Head weiter und Lesende landen sofort auf den neuen Schlüsseln; alte fallen per LRU heraus.
+_SHARED = SharedCache(max_bytes=64 * 2 ** 20, sizeof=_sizeof)
+
+# Zuletzt gesehener Branch-Head samt Zeitpunkt: innerhalb von head_ttl Sekunden teilen sich
+# alle Sessions diesen Wert statt je eine eigene Anfrage zu stellen.
+_HEAD_SEEN = {"sha": None, "at": 0.0}
+_HEAD_SEEN_LOCK = threading.Lock()
+# Head des zuletzt aufgebauten Index je (Art, Verzeichnis) – Art "tree" oder "ebene" wie in der
+# gemeinsamen Ablage: Basis für den nächsten, der nur per Compare nachgezogen wird
+_LAST_INDEXED: Dict[Tuple[str, str], str] = {}
+
+def _remember_sha(path: str, sha: Optional[str]) -> None:
+    _KNOWN_SHA.put(path, sha or "")
 
 def _full_path(rel_path: str) -> str:
     rel_path = rel_path.strip("/")
-    return f"{BASE_PATH}/{rel_path}" if BASE_PATH else rel_path
+    base = _settings().base_path
+    return f"{base}/{rel_path}" if base else rel_path
 
 def gh_get_sha(path: str) -> Optional[str]:
     enc = _encode_path(path)
-    url = f"{API}/repos/{OWNER}/{REPO}/contents/{enc}"
-    r = requests.get(url, headers=_headers(), params={"ref": BRANCH}, timeout=30)
+    url = f"{_repo_url()}/contents/{enc}"
+    r = _request("GET", url, op="get_sha", headers=_headers(), params={"ref": _settings().branch}, timeout=30)
     if r.status_code == 404:
+        _remember_sha(path, None)
         return None
     if not r.ok:
         try:
@@ -59,86 +433,527 @@ def gh_get_sha(path: str) -> Optional[str]:
         except Exception:
             msg = r.text[:300]
         raise RuntimeError(f"GitHub GET {r.status_code} for {path}: {msg}")
-    return r.json().get("sha")
+    sha = r.json().get("sha")
+    _remember_sha(path, sha)
+    return sha
 
 def _put_contents(path: str, data_b64: str, message: str, sha: Optional[str]):
     enc = _encode_path(path)
-    url = f"{API}/repos/{OWNER}/{REPO}/contents/{enc}"
+    url = f"{_repo_url()}/contents/{enc}"
+    c = _settings()
     payload = {
         "message": message,
         "content": data_b64,
-        "branch": BRANCH,
-        "committer": {"name": COMMITTER_NAME, "email": COMMITTER_EMAIL},
+        "branch": c.branch,
+        "committer": {"name": c.committer_name, "email": c.committer_email},
     }
     if sha:
         payload["sha"] = sha
-    return requests.put(url, headers=_headers(), json=payload, timeout=60)
+    return _request("PUT", url, op="put", headers=_headers(), json=payload, timeout=60)
+
+def _after_put(rel_path: str, data: bytes, r) -> dict:
+    path = _full_path(rel_path)
+    _raise_for(r, f"PUT {path}")
+    result = r.json()
+    _remember_sha(path, result.get("content", {}).get("sha"))
+    commit = result.get("commit", {})
+    if commit.get("sha") and commit.get("tree", {}).get("sha"):
+        _HEAD["state"] = (commit["sha"], commit["tree"]["sha"])  # nächster Batch ohne GET ref
+        parents = commit.get("parents") or [{}]
+        _advance_head(parents[0].get("sha"), commit["sha"], {rel_path: data})
+    _DOWNLOAD_CACHE.pop(path)  # neuer Inhalt -> beim nächsten Lesen frisch holen
+    return result
+
+def _remote_gleich(rel_path: str, sha: str) -> bool:
+    """
+    Liegt rel_path remote schon mit Blob-sha sha vor ("" = Datei fehlt)? _KNOWN_SHA kennt nur, was
+    dieser Prozess gesehen oder geschrieben hat – eine andere Instanz kann die Datei seitdem
+    geändert haben. Übersprungen wird daher nur, wenn auch der Index des aktuellen Heads (bedingte
+    Anfrage, per Compare nachgezogen) diese Version zeigt; sonst wird die bekannte sha korrigiert.
+    """
+    path = _full_path(rel_path)
+    if _KNOWN_SHA.get(path) != sha:
+        return False
+    rel_path = rel_path.strip("/")
+    index = _index_fuer(gh_current_head(max_age=0), rel_path)
+    eintrag = index.by_path.get(rel_path)
+    if eintrag is None and not index.complete:
+        _KNOWN_SHA.pop(path)  # unbekannt: beim Schreiben frisch holen
+        return False
+    remote = eintrag.sha if eintrag is not None else ""
+    _remember_sha(path, remote)
+    return remote == sha
 
-def gh_upload_bytes(rel_path: str, data: bytes, message: str) -> dict:
+def gh_upload_bytes(rel_path: str, data: bytes, message: str, expected_sha: Optional[str] = None) -> dict:
     """
-    Legt Datei neu an oder aktualisiert sie. Base64-kodiert; einmaliger Retry bei 409 (sha-Race).
+    Legt Datei neu an oder aktualisiert sie. Base64-kodiert; schreibt direkt mit der bekannten
+    sha (aus Download/Listing/letztem Upload) und holt sie nur bei 409/422 (sha-Race) mit
+    Backoff neu. Ist der Inhalt (Blob-sha) unverändert, passiert nichts ("unchanged": True).
+    Mit expected_sha wird optimistisch gegen genau diese Version geschrieben (expected_sha="":
+    nur neu anlegen); passt sie nicht mehr, gibt es einen VersionConflict statt eines stillen
+    Überschreibens.
     """
     path = _full_path(rel_path)
+    new_sha = git_blob_sha(data)
+    if _remote_gleich(rel_path, new_sha):
+        # Inhalt identisch zur Remote-Version: kein PUT, kein Commit
+        return {"content": {"sha": new_sha}, "unchanged": True}
     data_b64 = base64.b64encode(data).decode("ascii")
-    sha = gh_get_sha(path)
+    if expected_sha is not None:
+        r = _put_contents(path, data_b64, message, expected_sha)
+        if r.status_code in (409, 422):
+            raise VersionConflict(f"{path}: sha {expected_sha[:7]} ist veraltet" if expected_sha
+                                  else f"{path}: existiert bereits")
+        return _after_put(rel_path, data, r)
 
+    sha = _KNOWN_SHA.get(path)
+    if sha is None:
+        sha = gh_get_sha(path)
+        if sha == new_sha:
+            return {"content": {"sha": new_sha}, "unchanged": True}
     r = _put_contents(path, data_b64, message, sha)
-    if r.status_code == 409:
-        # Race: sha veraltet – kurz warten, neu holen, retry
-        time.sleep(0.3)
+    for attempt in range(_settings().max_retries):
+        if r.status_code not in (409, 422):
+            break
+        # Bekannte sha veraltet (oder fehlt) – warten, neu holen, retry
+        _pause("put", attempt)
         sha = gh_get_sha(path)
         r = _put_contents(path, data_b64, message, sha)
 
-    r.raise_for_status()
-    return r.json()
+    return _after_put(rel_path, data, r)
 
-def gh_download_bytes(rel_path: str) -> bytes:
+# Antworten auf Blob/Tree mit Inhalt, die sich durch Wiederholen nicht ändern (ungültiger Pfad, zu groß, ...)
+_DAUERHAFT_STATUS = {400, 413, 422}
+
+def _raise_for(r, what: str, inhalt: bool = False):
+    if r.ok:
+        return
+    try:
+        msg = r.json().get("message", "")
+    except Exception:
+        msg = r.text[:300]
+    fehler = DauerhafterFehler if inhalt and r.status_code in _DAUERHAFT_STATUS else RuntimeError
+    raise fehler(f"GitHub {what} {r.status_code}: {msg}")
+
+# Zuletzt bekannter Branch-Head (Commit + Tree). Nach eigenen Commits bekannt,
+# so dass der nächste Batch ohne GET ref/commit direkt auf den Head aufsetzen kann.
+_HEAD = {"state": None}  # (commit_sha, tree_sha)
+_COMMIT_LOCK = threading.Lock()
+
+def _fetch_head() -> Tuple[str, str]:
+    repo_url = _repo_url()
+    branch = _settings().branch
+    r = _request("GET", f"{repo_url}/git/ref/heads/{quote(branch, safe='')}", op="head", headers=_headers(), timeout=30)
+    _raise_for(r, f"ref {branch}")
+    commit_sha = r.json()["object"]["sha"]
+    r = _request("GET", f"{repo_url}/git/commits/{commit_sha}", op="head", headers=_headers(), timeout=30)
+    _raise_for(r, f"commit {commit_sha[:7]}")
+    return commit_sha, r.json()["tree"]["sha"]
+
+def _tree_entry(rel_path: str, data: Optional[bytes]) -> dict:
+    entry = {"path": _full_path(rel_path), "mode": "100644", "type": "blob"}
+    if data is None:
+        entry["sha"] = None  # Datei im neuen Tree löschen
+        return entry
+    try:
+        # Text (CSV/TXT) direkt in den Tree – spart den Blob-Request
+        entry["content"] = data.decode("utf-8")
+        return entry
+    except UnicodeDecodeError:
+        pass
+    r = _request(
+        "POST",
+        f"{_repo_url()}/git/blobs",
+        op="blob",
+        headers=_headers(),
+        json={"content": base64.b64encode(data).decode("ascii"), "encoding": "base64"},
+        timeout=60,
+    )
+    _raise_for(r, f"blob {rel_path}", inhalt=True)
+    entry["sha"] = r.json()["sha"]
+    return entry
+
+def gh_commit_files(files: Dict[str, Optional[bytes]], message: str) -> dict:
+    """
+    Schreibt mehrere Dateien (rel_path -> Bytes, None = löschen) in EINEM Commit über die Git Data API:
+    Blobs/Tree anlegen, Commit erzeugen, Branch-Ref vorziehen (ohne force).
+    Schlägt ein Schritt fehl, bleibt der Branch unverändert – es wird nie nur ein Teil geschrieben.
+    Ist der Head inzwischen weitergelaufen (422 beim Ref-Update), wird neu aufgesetzt.
+    Dateien, deren Blob-sha der Remote-Version im aktuellen Head entspricht, werden übersprungen;
+    bleibt nichts übrig, entsteht kein (leerer) Commit.
+    """
+    files = {p: d for p, d in files.items() if not _remote_gleich(p, "" if d is None else git_blob_sha(d))}
+    if not files:
+        return {"commit": (_HEAD["state"] or (None,))[0], "unchanged": True}
+    c = _settings()
+    repo_url = _repo_url()
+    entries = [_tree_entry(p, d) for p, d in files.items()]
+
+    # Commits dieses Prozesses nacheinander: parallel würden sie sich gegenseitig den Head
+    # wegschnappen (422) und nur Kontingent für Wiederholungen verbrauchen.
+    with _COMMIT_LOCK:
+        for attempt in range(c.max_retries + 1):
+            if _HEAD["state"] is None or attempt > 0:
+                _HEAD["state"] = _fetch_head()
+            parent, base_tree = _HEAD["state"]
+
+            r = _request("POST", f"{repo_url}/git/trees", op="tree", headers=_headers(),
+                         json={"base_tree": base_tree, "tree": entries}, timeout=60)
+            _raise_for(r, "tree", inhalt=True)
+            tree_sha = r.json()["sha"]
+
+            r = _request("POST", f"{repo_url}/git/commits", op="commit", headers=_headers(), json={
+                "message": message,
+                "tree": tree_sha,
+                "parents": [parent],
+                "author": {"name": c.committer_name, "email": c.committer_email},
+                "committer": {"name": c.committer_name, "email": c.committer_email},
+            }, timeout=60)
+            _raise_for(r, "commit")
+            commit_sha = r.json()["sha"]
+
+            r = _request("PATCH", f"{repo_url}/git/refs/heads/{quote(c.branch, safe='')}", op="ref_update", headers=_headers(),
+                         json={"sha": commit_sha, "force": False}, timeout=30)
+            if r.status_code in (409, 422) and attempt < c.max_retries:
+                # Head hat sich bewegt (paralleler Commit) – warten, neu aufsetzen
+                _pause("ref_update", attempt)
+                continue
+            _raise_for(r, f"ref update {c.branch}")
+            _HEAD["state"] = (commit_sha, tree_sha)
+            for p, d in files.items():
+                _DOWNLOAD_CACHE.pop(_full_path(p))
+                _remember_sha(_full_path(p), None if d is None else git_blob_sha(d))
+            _advance_head(parent, commit_sha, files)
+            return {"commit": commit_sha}
+
+        raise RuntimeError("GitHub ref update: Branch-Head bewegt sich zu schnell")
+
+def gh_download_versioned(rel_path: str) -> Tuple[bytes, str]:
     """
-    Lädt Dateiinhalt (Bytes). Nutzt raw media type.
+    Lädt Dateiinhalt (Bytes) samt ETag. Nutzt raw media type und den lokalen Cache:
+    ist die Datei bekannt, wird mit If-None-Match revalidiert und bei 304 der Cache geliefert.
     """
     path = _full_path(rel_path)
     enc = _encode_path(path)  # <-- WICHTIG
-    url = f"{API}/repos/{OWNER}/{REPO}/contents/{enc}"
-    r = requests.get(url, headers=_headers(accept_raw=True), params={"ref": BRANCH}, timeout=60)
+    url = f"{_repo_url()}/contents/{enc}"
+    headers = _headers(accept_raw=True)
+    cached = _DOWNLOAD_CACHE.get(path)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = _request("GET", url, op="download", headers=headers, params={"ref": _settings().branch}, timeout=60)
+    if r.status_code == 304 and cached:
+        _remember_sha(path, git_blob_sha(cached[1]))
+        return cached[1], cached[0]
     if r.status_code == 404:
+        _DOWNLOAD_CACHE.pop(path)
+        _remember_sha(path, None)
         raise FileNotFoundError(path)
     r.raise_for_status()
-    return r.content
+    _remember_sha(path, git_blob_sha(r.content))
+    etag = r.headers.get("ETag", "")
+    if etag:
+        _DOWNLOAD_CACHE.put(path, (etag, r.content))
+    return r.content, etag
 
+def _blob(sha: str) -> bytes:
+    """Inhalt eines Blobs aus der gemeinsamen Ablage, sonst einmal für alle Sessions laden."""
+    def laden() -> bytes:
+        r = _request("GET", f"{_repo_url()}/git/blobs/{sha}", op="download",
+                     headers=_headers(accept_raw=True), timeout=60)
+        _raise_for(r, f"blob {sha[:7]}")
+        if git_blob_sha(r.content) != sha:
+            raise RuntimeError(f"GitHub blob {sha[:7]}: Inhalt passt nicht zur sha")
+        return r.content
+    return _SHARED.get_or_load(("blob", sha), laden)
 
-def gh_list_csv(prefix: str = "") -> List[str]:
+def gh_download_bytes(rel_path: str) -> bytes:
     """
-    Listet .csv-Dateien im BASE_PATH. Mit kleinem Retry und verständlicher Fehlermeldung.
+    Lädt Dateiinhalt (Bytes). Der Pfad wird über den Index des aktuellen Heads zur Blob-sha
+    aufgelöst, der Inhalt kommt aus der gemeinsamen Ablage: alle Sessions teilen sich eine
+    Kopie, und nach einem neuen Head wird nur geladen, was sich tatsächlich geändert hat.
+    Fehlt der Pfad in einem unvollständigen Index, wie bisher über Contents-API und ETag-Cache.
     """
-    base_enc = _encode_path(BASE_PATH) if BASE_PATH else ""
-    url = f"{API}/repos/{OWNER}/{REPO}/contents/{base_enc}"
-    last_error = None
-    for attempt in range(3):  # Retry für 5xx/Netz-Haker
-        r = requests.get(url, headers=_headers(), params={"ref": BRANCH}, timeout=30)
-        if r.status_code == 404:
-            return []
-        if r.ok:
-            break
-        last_error = r
-        time.sleep(0.4 * (attempt + 1))
-    else:
-        # Nach Retries immer noch Fehler: aussagekräftig machen
-        try:
-            detail = last_error.json().get("message", "")
-        except Exception:
-            detail = last_error.text[:300]
-        raise RuntimeError(f"GitHub list error {last_error.status_code}: {detail}")
+    rel_path = rel_path.strip("/")
+    index = _index_fuer(gh_current_head(), rel_path)
+    eintrag = index.by_path.get(rel_path)
+    if eintrag is not None:
+        return _blob(eintrag.sha)
+    if index.complete:
+        raise FileNotFoundError(_full_path(rel_path))
+    return gh_download_versioned(rel_path)[0]
+
+def gh_download_many(rel_paths: Iterable[str], max_workers: int = 0
+                     ) -> Iterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+    """
+    Lädt viele Dateien parallel (begrenzter Thread-Pool über die gemeinsame Session) und liefert
+    (rel_path, bytes, None) bzw. (rel_path, None, Fehler) in der Reihenfolge des Eintreffens.
+    Ein Fehler betrifft nur seine Datei, nie den ganzen Batch. max_workers=0: aus der Konfiguration.
+    """
+    rel_paths = list(dict.fromkeys(rel_paths))
+    if not rel_paths:
+        return
+    c = _settings()
+    max_workers = max_workers or c.max_workers
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rel_paths), c.pool_size))) as pool:
+        futures = {pool.submit(gh_download_bytes, p): p for p in rel_paths}
+        for fut in as_completed(futures):
+            p = futures[fut]
+            try:
+                yield p, fut.result(), None
+            except Exception as e:
+                yield p, None, e
+
+
+# Branch-Head per ETag: unveränderter Head = 304 ohne Body und ohne Rate-Limit-Kosten
+_REF_CACHE = {"etag": None, "sha": None}
 
+def gh_head_sha() -> str:
+    """Aktueller Commit-sha des Branches (eine billige, bedingte Anfrage)."""
+    branch = _settings().branch
+    url = f"{_repo_url()}/git/ref/heads/{quote(branch, safe='')}"
+    headers = _headers()
+    etag, sha = _REF_CACHE["etag"], _REF_CACHE["sha"]
+    if etag and sha:
+        headers["If-None-Match"] = etag
+    r = _request("GET", url, op="head", headers=headers, timeout=15)
+    if r.status_code == 304 and sha:
+        return sha
+    _raise_for(r, f"ref {branch}")
+    sha = r.json()["object"]["sha"]
+    _REF_CACHE["etag"], _REF_CACHE["sha"] = r.headers.get("ETag"), sha
+    return sha
+
+def _list_contents_fallback(verzeichnis: str = "") -> List[DateiEintrag]:
+    # Nur falls der rekursive Tree abgeschnitten ist (> 100 000 Einträge): flache Contents-Liste
+    pfad = _full_path(verzeichnis) if verzeichnis else _settings().base_path
+    url = f"{_repo_url()}/contents/{_encode_path(pfad) if pfad else ''}"
+    r = _request("GET", url, op="list", headers=_headers(), params={"ref": _settings().branch}, timeout=30)
+    if r.status_code == 404:
+        return []
+    _raise_for(r, "list error")
     items = r.json()
     if isinstance(items, dict):  # BASE_PATH ist (unerwartet) eine Datei
         return []
-    names = [it["name"] for it in items if it.get("type") == "file" and it["name"].lower().endswith(".csv")]
-    if prefix:
-        names = [n for n in names if n.startswith(prefix)]
-    return sorted(names)
+    basis = f"{verzeichnis}/" if verzeichnis else ""
+    return [eintrag_aus_pfad(basis + it["name"], it["sha"], it.get("size", 0))
+            for it in items if it.get("type") == "file"]
+
+def gh_current_head(max_age: Optional[float] = None) -> str:
+    """
+    Branch-Head, höchstens max_age Sekunden alt (Standard: head_ttl). Alle Sessions teilen sich
+    eine Abfrage; wer währenddessen fragt, wartet auf deren Ergebnis. max_age=0 fragt immer neu.
+    """
+    max_age = _settings().head_ttl if max_age is None else max_age
+    with _HEAD_SEEN_LOCK:
+        if _HEAD_SEEN["sha"] and time.monotonic() - _HEAD_SEEN["at"] < max_age:
+            return _HEAD_SEEN["sha"]
+        sha = gh_head_sha()
+        _HEAD_SEEN.update(sha=sha, at=time.monotonic())
+        return sha
+
+def gh_compare(base: str, head: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """
+    Geänderte Dateien unter BASE_PATH zwischen zwei Commits als (rel_path, Blob-sha | None = gelöscht),
+    ein Request über die Compare-API. None, wenn sich das nicht inkrementell beantworten lässt
+    (Branch umgeschrieben, Commit unbekannt, Liste auf 300 Dateien gekürzt) – dann neu listen.
+    """
+    r = _request("GET", f"{_repo_url()}/compare/{base}...{head}", op="compare", headers=_headers(), timeout=30)
+    if r.status_code == 404:
+        return None
+    _raise_for(r, f"compare {base[:7]}...{head[:7]}")
+    result = r.json()
+    files = result.get("files", [])
+    if result.get("status") not in ("ahead", "identical") or len(files) >= 300:
+        return None
+    base_path = _settings().base_path
+    basis = f"{base_path}/" if base_path else ""
+    changes = []
+    for f in files:
+        if f.get("status") == "renamed" and f.get("previous_filename", "").startswith(basis):
+            changes.append((f["previous_filename"][len(basis):], None))
+        if f["filename"].startswith(basis):
+            sha = None if f.get("status") == "removed" else f.get("sha")
+            changes.append((f["filename"][len(basis):], sha))
+    return changes
+
+def _patched(alt: _Index, changes: Iterable[Tuple[str, Optional[str], int]]) -> _Index:
+    by_path = dict(alt.by_path)
+    for p, sha, size in changes:
+        if sha is None:
+            by_path.pop(p, None)
+        else:
+            by_path[p] = eintrag_aus_pfad(p, sha, size)
+    eintraege = sorted(by_path.values(), key=lambda e: e.pfad)
+    return _Index(eintraege, by_path, alt.complete)
+
+def _im_verzeichnis(pfad: str, verzeichnis: str, art: str = "tree") -> bool:
+    """Gehört pfad in den Index der Art art von verzeichnis ("ebene": nur direkt darin)?"""
+    if verzeichnis:
+        if not pfad.startswith(verzeichnis + "/"):
+            return False
+        pfad = pfad[len(verzeichnis) + 1:]
+    return art == "tree" or "/" not in pfad
+
+def _per_compare(art: str, head: str, verzeichnis: str) -> Optional[_Index]:
+    # Ist der zuletzt gelistete Head noch da, reicht meist ein Compare statt des ganzen Trees:
+    # beim Polling werden so nur die geänderten Pfade übertragen.
+    basis = _LAST_INDEXED.get((art, verzeichnis))
+    alt = _SHARED.get((art, basis, verzeichnis)) if basis and basis != head else None
+    if alt is None:
+        return None
+    changes = gh_compare(basis, head)
+    if changes is None:
+        return None
+    changes = [(p, sha) for p, sha in changes if _im_verzeichnis(p, verzeichnis, art)]
+    for p, sha in changes:
+        _remember_sha(_full_path(p), sha)
+    _LAST_INDEXED[(art, verzeichnis)] = head
+    # Größe geänderter Dateien liefert Compare nicht; bekannt wird sie beim nächsten vollen Listing
+    return _patched(alt, ((p, sha, 0) for p, sha in changes))
+
+def _load_index(head: str, verzeichnis: str = "") -> _Index:
+    index = _per_compare("tree", head, verzeichnis)
+    if index is not None:
+        return index
+    # Unterverzeichnis: nur dessen Tree ("<commit>:<pfad>"), die Kosten wachsen also mit der
+    # Sitzung, nicht mit allem, was je im Repo lag
+    pfad = _full_path(verzeichnis) if verzeichnis else _settings().base_path
+    ziel = f"{head}:{_encode_path(pfad)}" if verzeichnis else head
+    r = _request("GET", f"{_repo_url()}/git/trees/{ziel}", op="list", headers=_headers(),
+                 params={"recursive": "1"}, timeout=60)
+    if r.status_code == 404 and verzeichnis:
+        _LAST_INDEXED[("tree", verzeichnis)] = head
+        return _Index([], {}, True)  # Verzeichnis gibt es (noch) nicht
+    _raise_for(r, "tree list error")
+    tree = r.json()
+    if tree.get("truncated"):
+        eintraege = _list_contents_fallback(verzeichnis)
+    else:
+        # Pfade im Tree sind relativ zu dessen Wurzel: BASE_PATH bzw. dem Unterverzeichnis
+        if verzeichnis:
+            wurzel, basis = "", f"{verzeichnis}/"
+        else:
+            wurzel, basis = (f"{pfad}/" if pfad else ""), ""
+        eintraege = [
+            eintrag_aus_pfad(basis + it["path"][len(wurzel):], it["sha"], it.get("size", 0))
+            for it in tree.get("tree", [])
+            if it.get("type") == "blob" and it["path"].startswith(wurzel)
+        ]
+    eintraege.sort(key=lambda e: e.pfad)
+    for e in eintraege:
+        _remember_sha(_full_path(e.pfad), e.sha)
+    _LAST_INDEXED[("tree", verzeichnis)] = head
+    return _Index(eintraege, {e.pfad: e for e in eintraege}, not tree.get("truncated"))
+
+def _index(head: str, verzeichnis: str = "") -> _Index:
+    return _SHARED.get_or_load(("tree", head, verzeichnis), lambda: _load_index(head, verzeichnis))
+
+def _index_fuer(head: str, rel_path: str) -> _Index:
+    """
+    Index, der rel_path enthält: ein schon geladener des Verzeichnisses oder eines darüber,
+    sonst der des eigenen Verzeichnisses (für Dateien direkt im Datenordner nur dessen oberste
+    Ebene statt des ganzen Baums).
+    """
+    teile = rel_path.split("/")[:-1]
+    for tiefe in range(len(teile), -1, -1):
+        index = _SHARED.get(("tree", head, "/".join(teile[:tiefe])))
+        if index is not None:
+            return index
+    if not teile:
+        return _ebene(head, "")
+    return _index(head, "/".join(teile))
+
+def _advance_head(parent: Optional[str], commit_sha: str, written: Dict[str, Optional[bytes]]) -> None:
+    """
+    Nach einem eigenen Commit: Head für alle Sessions sofort weitersetzen. Sind Indizes des
+    Parents bekannt, entstehen die neuen ohne Tree-Request durch Einsetzen der geschriebenen
+    Dateien; deren Inhalt liegt gleich in der gemeinsamen Ablage (Lesen nach Schreiben ohne Download).
+    """
+    for art, verzeichnis in list(_LAST_INDEXED):
+        alt = _SHARED.get((art, parent, verzeichnis)) if parent else None
+        if alt is not None:
+            _SHARED.put((art, commit_sha, verzeichnis), _patched(alt, (
+                (p, None if d is None else git_blob_sha(d), 0 if d is None else len(d))
+                for p, d in ((p.strip("/"), d) for p, d in written.items())
+                if _im_verzeichnis(p, verzeichnis, art))))
+            _LAST_INDEXED[(art, verzeichnis)] = commit_sha
+    for d in written.values():
+        if d is not None:
+            _SHARED.put(("blob", git_blob_sha(d)), bytes(d))
+    with _HEAD_SEEN_LOCK:
+        _HEAD_SEEN.update(sha=commit_sha, at=time.monotonic())
+
+def gh_list_files(prefix: str = "") -> List[DateiEintrag]:
+    """
+    Alle Dateien unter BASE_PATH, deren Pfad mit prefix beginnt, als DateiEintrag (Gruppe,
+    Station, Art, Blob-sha, Größe). Nutzt die rekursive Git-Trees-API: ein Request ohne
+    1000er-Limit, bei einem prefix mit Verzeichnis (z. B. einer Sitzung '2025-26/8b/2025-10-18/')
+    nur für dessen Teilbaum. Die Liste liegt je Head in der gemeinsamen Ablage – alle Sessions
+    teilen sich eine Kopie.
+    """
+    return [e for e in _index(gh_current_head(), prefix.rpartition("/")[0]).entries if e.pfad.startswith(prefix)]
+
+def _load_ebene(head: str, verzeichnis: str) -> _Index:
+    index = _per_compare("ebene", head, verzeichnis)
+    if index is not None:
+        return index
+    pfad = _full_path(verzeichnis) if verzeichnis else _settings().base_path
+    ziel = f"{head}:{_encode_path(pfad)}" if pfad else head
+    r = _request("GET", f"{_repo_url()}/git/trees/{ziel}", op="list", headers=_headers(), timeout=30)
+    if r.status_code == 404:
+        _LAST_INDEXED[("ebene", verzeichnis)] = head
+        return _Index([], {}, True)
+    _raise_for(r, "tree list error")
+    basis = f"{verzeichnis}/" if verzeichnis else ""
+    eintraege = sorted((eintrag_aus_pfad(basis + it["path"], it["sha"], it.get("size", 0))
+                        for it in r.json().get("tree", []) if it.get("type") == "blob"),
+                       key=lambda e: e.pfad)
+    for e in eintraege:
+        _remember_sha(_full_path(e.pfad), e.sha)
+    _LAST_INDEXED[("ebene", verzeichnis)] = head
+    return _Index(eintraege, {e.pfad: e for e in eintraege}, True)
+
+def _ebene(head: str, verzeichnis: str) -> _Index:
+    return _SHARED.get_or_load(("ebene", head, verzeichnis), lambda: _load_ebene(head, verzeichnis))
 
-# Optional: einfacher Selbsttest, kann temporär im Lehrkraftmodus angezeigt werden
+def gh_list_verzeichnis(verzeichnis: str = "") -> List[DateiEintrag]:
+    """
+    Nur die Dateien direkt in verzeichnis ("" = BASE_PATH), ohne Unterverzeichnisse – z. B. der
+    Altbestand neben den Sitzungen. Ein nicht-rekursiver Tree-Request statt des ganzen Baums; liegt
+    ein rekursiver Index dieses Heads schon in der gemeinsamen Ablage, wird der gefiltert.
+    """
+    head, verzeichnis = gh_current_head(), verzeichnis.strip("/")
+    index = _SHARED.get(("tree", head, verzeichnis))
+    if index is None or not index.complete:
+        index = _ebene(head, verzeichnis)
+    return [e for e in index.entries if _im_verzeichnis(e.pfad, verzeichnis, "ebene")]
+
+def gh_cache_status() -> dict:
+    """Füllstand und Trefferquote der gemeinsamen Ablage (für das Diagnose-Panel)."""
+    status = _SHARED.stats()
+    status["head"] = _HEAD_SEEN["sha"]
+    status["head_age_s"] = round(time.monotonic() - _HEAD_SEEN["at"], 1) if _HEAD_SEEN["sha"] else None
+    return status
+
+def gh_list_csv(prefix: str = "", suffix: str = ".csv") -> List[str]:
+    """
+    Listet .csv-Dateien (bzw. Dateien mit suffix) im BASE_PATH – Namen aus gh_list_files, mit
+    dem Präfix einer Sitzung also nur deren Dateien.
+    """
+    return [e.pfad for e in gh_list_files(prefix) if e.pfad.lower().endswith(suffix)]
+
+# Selbsttest für das Diagnose-Panel im Lehrkraftmodus: Erreichbarkeit, Latenz, Rate-Limit-Stand
 def gh_self_test() -> dict:
-    r = requests.get(f"{API}/repos/{OWNER}/{REPO}/branches/{BRANCH}", headers=_headers(), timeout=15)
+    t0 = time.perf_counter()
+    c = _settings()
+    r = _request("GET", f"{_repo_url()}/branches/{c.branch}", op="self_test", headers=_headers(), timeout=15)
+    latency_ms = round((time.perf_counter() - t0) * 1000, 1)
     r.raise_for_status()
-    return {"ok": True, "branch": BRANCH, "head": r.json().get("commit", {}).get("sha")}
+    return {
+        "ok": True,
+        "api": c.api,
+        "branch": c.branch,
+        "head": r.json().get("commit", {}).get("sha"),
+        "latency_ms": latency_ms,
+        "rate_limit": METRICS.snapshot()["rate_limit"],
+    }
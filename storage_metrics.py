@@ -0,0 +1,178 @@
+# storage_metrics.py
+"""
+Messwerte aller GitHub-Aufrufe: Dauer, Ergebnis und Rate-Limit-Stand je Operation.
+
+storage_github meldet jeden HTTP-Versuch über record() und jede Wartezeit (Backoff und
+Scheduler) über record_wait(). Daraus lässt sich im Unterricht unterscheiden, ob Speichern
+langsam ist wegen Netzlatenz (Histogramm), 409/422-Konflikten (outcome "conflict") oder Rate-Limits
+(outcome "rate_limited", X-RateLimit-Remaining, Wartezeit).
+
+Export: snapshot() als dict (Diagnose-Panel, JSON), prometheus_text() im Prometheus-Textformat,
+und je Aufruf eine JSON-Zeile über den Logger "kalorik.github" (Level DEBUG).
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+log = logging.getLogger("kalorik.github")
+
+# Obergrenzen der Histogramm-Buckets in Sekunden (wie Prometheus "le")
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+def outcome_for(status: Optional[int], rate_limited: bool = False) -> str:
+    if status is None:
+        return "network_error"
+    if rate_limited:
+        return "rate_limited"
+    if status == 304:
+        return "not_modified"
+    if status in (409, 422):
+        return "conflict"
+    if status == 404:
+        return "not_found"
+    if status < 400:
+        return "ok"
+    return "error"
+
+
+class _OpStats:
+    __slots__ = ("outcomes", "buckets", "count", "total", "wait_total", "retries")
+
+    def __init__(self):
+        self.outcomes: Dict[str, int] = {}
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.wait_total = 0.0
+        self.retries = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Näherung aus dem Histogramm: Obergrenze des Buckets, in dem das Quantil liegt."""
+        if not self.count:
+            return None
+        ziel, summe = q * self.count, 0
+        for grenze, n in zip(BUCKETS, self.buckets):
+            summe += n
+            if summe >= ziel:
+                return grenze
+        return BUCKETS[-1]
+
+
+class ApiMetrics:
+    """Threadsichere Zähler/Histogramme je Operation plus zuletzt gesehener Rate-Limit-Stand."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops: Dict[str, _OpStats] = {}
+            self.rate = {"limit": None, "remaining": None, "reset": None, "used": None, "resource": None}
+            self.secondary_limits = 0
+            self.last_rate_limited: Optional[float] = None
+            self.started = time.time()
+
+    def _op(self, op: str) -> _OpStats:
+        stats = self._ops.get(op)
+        if stats is None:
+            stats = self._ops[op] = _OpStats()
+        return stats
+
+    def record(self, op: str, method: str, status: Optional[int], duration: float,
+               headers=None, attempt: int = 0, rate_limited: bool = False) -> None:
+        outcome = outcome_for(status, rate_limited)
+        with self._lock:
+            stats = self._op(op)
+            stats.outcomes[outcome] = stats.outcomes.get(outcome, 0) + 1
+            stats.count += 1
+            stats.total += duration
+            stats.retries += 1 if attempt else 0
+            for i, grenze in enumerate(BUCKETS):
+                if duration <= grenze:
+                    stats.buckets[i] += 1
+                    break
+            if headers is not None and headers.get("X-RateLimit-Remaining") is not None:
+                for key in ("limit", "remaining", "reset", "used"):
+                    value = headers.get(f"X-RateLimit-{key.title()}")
+                    if value is not None:
+                        try:
+                            self.rate[key] = int(value)
+                        except ValueError:
+                            pass
+                self.rate["resource"] = headers.get("X-RateLimit-Resource", self.rate["resource"])
+            if rate_limited:
+                self.last_rate_limited = time.time()
+                # sekundäres Limit: GitHub schickt Retry-After, obwohl das Kontingent nicht leer ist
+                if headers is not None and headers.get("X-RateLimit-Remaining") != "0":
+                    self.secondary_limits += 1
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(json.dumps({"op": op, "method": method, "status": status, "outcome": outcome,
+                                  "duration_ms": round(duration * 1000, 1), "attempt": attempt,
+                                  "rate_remaining": self.rate["remaining"]}))
+
+    def record_wait(self, op: str, seconds: float) -> None:
+        with self._lock:
+            self._op(op).wait_total += seconds
+
+    # ---------------------------------------------------------------- Export
+    def snapshot(self) -> dict:
+        with self._lock:
+            ops = {}
+            for op, s in sorted(self._ops.items()):
+                ops[op] = {
+                    "requests": s.count,
+                    "outcomes": dict(s.outcomes),
+                    "retries": s.retries,
+                    "mean_ms": round(1000 * s.total / s.count, 1) if s.count else None,
+                    "p50_le_s": s.quantile(0.5),
+                    "p95_le_s": s.quantile(0.95),
+                    "wait_s": round(s.wait_total, 2),
+                }
+            return {
+                "since": self.started,
+                "ops": ops,
+                "rate_limit": dict(self.rate),
+                "secondary_limits": self.secondary_limits,
+                "last_rate_limited": self.last_rate_limited,
+            }
+
+    def prometheus_text(self) -> str:
+        zeilen = [
+            "# HELP kalorik_github_requests_total GitHub API requests by operation and outcome.",
+            "# TYPE kalorik_github_requests_total counter",
+        ]
+        with self._lock:
+            ops = sorted(self._ops.items())
+            for op, s in ops:
+                for outcome, n in sorted(s.outcomes.items()):
+                    zeilen.append(f'kalorik_github_requests_total{{op="{op}",outcome="{outcome}"}} {n}')
+            zeilen += ["# HELP kalorik_github_request_duration_seconds GitHub API request duration.",
+                       "# TYPE kalorik_github_request_duration_seconds histogram"]
+            for op, s in ops:
+                summe = 0
+                for grenze, n in zip(BUCKETS, s.buckets):
+                    summe += n
+                    le = "+Inf" if grenze == float("inf") else repr(grenze)
+                    zeilen.append(f'kalorik_github_request_duration_seconds_bucket{{op="{op}",le="{le}"}} {summe}')
+                zeilen.append(f'kalorik_github_request_duration_seconds_sum{{op="{op}"}} {s.total:.6f}')
+                zeilen.append(f'kalorik_github_request_duration_seconds_count{{op="{op}"}} {s.count}')
+            zeilen += ["# HELP kalorik_github_wait_seconds_total Time spent waiting (scheduler and backoff).",
+                       "# TYPE kalorik_github_wait_seconds_total counter"]
+            for op, s in ops:
+                zeilen.append(f'kalorik_github_wait_seconds_total{{op="{op}"}} {s.wait_total:.3f}')
+            zeilen += ["# HELP kalorik_github_secondary_limits_total Secondary rate limit responses.",
+                       "# TYPE kalorik_github_secondary_limits_total counter",
+                       f"kalorik_github_secondary_limits_total {self.secondary_limits}"]
+            for key in ("limit", "remaining", "reset"):
+                if self.rate[key] is not None:
+                    zeilen += [f"# TYPE kalorik_github_ratelimit_{key} gauge",
+                               f"kalorik_github_ratelimit_{key} {self.rate[key]}"]
+        return "\n".join(zeilen) + "\n"
+
+
+# Prozessweit – alle Streamlit-Sessions teilen sich Session, Rate-Limit und damit die Messwerte
+METRICS = ApiMetrics()
@@ -0,0 +1,373 @@
+# storage_sqlite.py
+"""
+Offline-first-Speicher: eine lokale SQLite-Datenbank (WAL) ist der primäre Speicher für Messwerte,
+Auswertungen und Bilder, ein Hintergrund-Sync spiegelt sie mit einem entfernten Backend (GitHub).
+
+- Lesen und Schreiben treffen nur die lokale Datenbank – kein Netz, Sub-Millisekunden.
+- Je Datei drei Versionen (Blob-shas): lokaler Stand (version), Remote-Stand, auf dem er aufbaut
+  (basis), und zuletzt gesehener Remote-Stand (remote). dirty = noch nicht hochgeladen.
+- Ein Sync-Durchlauf holt zuerst fremde Änderungen (nur wenn sich remote.head() bewegt hat; wenn
+  möglich nur die seit dem letzten Pull geänderten Pfade über remote.aenderungen) und lädt dann
+  alle dirty-Dateien in wenigen Commits hoch.
+- Konflikt: lokal geändert und remote seit basis ebenfalls. Der lokale Stand gewinnt (er ist die
+  jüngste Eingabe in dieser App), der überschriebene Remote-Stand bleibt in der Tabelle konflikte.
+- Ohne Netz läuft die App weiter; der Sync wiederholt mit Backoff.
+- Lehnt remote eine Datei dauerhaft ab (z. B. zu groß), wird der Stapel einzeln wiederholt und nur
+  diese Datei mit dem Fehler markiert; sie bleibt liegen, bis sie neu gespeichert wird.
+- Bis der erste Pull einer frischen Datenbank durch ist, wird für fehlende Dateien remote
+  nachgelesen (und lokal abgelegt) – der erste Seitenaufbau wartet nicht auf die ganze Klasse.
+"""
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage_backend import DateiEintrag, DauerhafterFehler, StorageBackend, background_io, eintrag_aus_pfad, git_blob_sha
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dateien (
+    pfad      TEXT PRIMARY KEY,
+    daten     BLOB,                      -- NULL: lokal gelöscht, Löschung noch nicht hochgeladen
+    version   TEXT NOT NULL,             -- Blob-sha des lokalen Stands ('' = gelöscht)
+    basis     TEXT NOT NULL DEFAULT '',  -- Remote-Version, auf der der lokale Stand aufbaut
+    remote    TEXT NOT NULL DEFAULT '',  -- zuletzt gesehene Remote-Version ('' = remote nicht vorhanden)
+    dirty     INTEGER NOT NULL DEFAULT 0,
+    nachricht TEXT NOT NULL DEFAULT '',
+    geaendert REAL NOT NULL,
+    fehler    TEXT                       -- dauerhaft abgelehnt: Fehlertext, kein weiterer Push-Versuch
+);
+CREATE INDEX IF NOT EXISTS dateien_dirty ON dateien(dirty) WHERE dirty = 1;
+CREATE TABLE IF NOT EXISTS konflikte (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    pfad           TEXT NOT NULL,
+    lokal_version  TEXT NOT NULL,
+    remote_version TEXT NOT NULL,
+    remote_daten   BLOB,
+    zeit           REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (schluessel TEXT PRIMARY KEY, wert TEXT NOT NULL);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """Lokale SQLite-Datenbank als primärer Speicher, mit Hintergrund-Sync zu remote."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, remote: Optional[StorageBackend] = None,
+                 sync_interval: float = 5.0, batch_size: int = 50):
+        self.path = path
+        self.remote = remote
+        self.sync_interval = sync_interval
+        self.batch_size = max(1, batch_size)
+        self._local = threading.local()        # eine Verbindung je Thread
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._erster_pull = threading.Event()
+        self._last_error: Optional[str] = None
+        self._last_sync: Optional[float] = None
+        self._worker: Optional[threading.Thread] = None
+        self._conn().executescript(_SCHEMA)
+        if "fehler" not in {row[1] for row in self._conn().execute("PRAGMA table_info(dateien)")}:
+            self._conn().execute("ALTER TABLE dateien ADD COLUMN fehler TEXT")  # Datenbank von vor der Spalte
+        if remote is None or self._meta("remote_head") is not None:
+            self._erster_pull.set()  # vorhandene Datenbank: sofort lokal bedienen, Sync im Hintergrund
+        if remote is not None:
+            self._ensure_worker()
+
+    # ---------------------------------------------------------------- SQLite
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; Schreibtransaktionen werden in _transaktion explizit geöffnet
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaktion(self):
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # jede Änderung zählt die Generation hoch (head() für Übersicht und Caches)
+            conn.execute("INSERT INTO meta VALUES ('generation', '1') ON CONFLICT(schluessel) "
+                         "DO UPDATE SET wert = CAST(wert AS INTEGER) + 1")
+            conn.execute("COMMIT")
+
+    def _meta(self, schluessel: str) -> Optional[str]:
+        row = self._conn().execute("SELECT wert FROM meta WHERE schluessel = ?", (schluessel,)).fetchone()
+        return None if row is None else row[0]
+
+    # ---------------------------------------------------------------- Backend-Schnittstelle
+    def _durchlesen(self) -> bool:
+        """
+        True, solange fehlende Dateien remote gesucht werden (erster Pull läuft noch). Nicht bei
+        Sync-Fehlern: offline soll kein Lesezugriff auf Netz-Timeouts warten.
+        """
+        return self.remote is not None and not self._erster_pull.is_set() and self._last_error is None
+
+    def _ablegen(self, rel_path: str, data: bytes, version: str) -> None:
+        # remote nachgelesen: als synchronisierter Stand ablegen, lokale Änderungen nie überschreiben
+        with self._transaktion() as c:
+            c.execute("INSERT OR IGNORE INTO dateien (pfad, daten, version, basis, remote, dirty, geaendert) "
+                      "VALUES (?, ?, ?, ?, ?, 0, ?)", (rel_path, data, version, version, version, time.time()))
+
+    def head(self) -> Optional[str]:
+        if self._durchlesen():
+            return None
+        return f"sqlite-{self._meta('generation') or 0}"
+
+    def list_entries(self, prefix: str = "") -> List[DateiEintrag]:
+        return self._eintraege(prefix, rekursiv=True)
+
+    def list_verzeichnis(self, verzeichnis: str = "") -> List[DateiEintrag]:
+        return self._eintraege(verzeichnis, rekursiv=False)
+
+    def _eintraege(self, prefix: str, rekursiv: bool) -> List[DateiEintrag]:
+        # Bereichsabfrage über den Primärschlüssel: mit dem Präfix einer Sitzung nur deren Zeilen
+        rows = self._conn().execute(
+            "SELECT pfad, version, length(daten) FROM dateien WHERE pfad >= ? AND pfad < ? ORDER BY pfad",
+            (prefix, prefix + "\U0010ffff"),
+        ).fetchall()
+        if not rekursiv:
+            rows = [r for r in rows if "/" not in r[0][len(prefix):]]
+        eintraege = {p: eintrag_aus_pfad(p, v, n) for p, v, n in rows if v}
+        if self._durchlesen():
+            try:
+                remote = (self.remote.list_entries(prefix) if rekursiv
+                          else self.remote.list_verzeichnis(prefix))
+            except Exception:
+                remote = []  # offline: nur was lokal liegt
+            geloescht = {p for p, v, _ in rows if not v}
+            for e in remote:
+                if e.pfad not in eintraege and e.pfad not in geloescht:
+                    eintraege[e.pfad] = e
+        return sorted(eintraege.values(), key=lambda e: e.pfad)
+
+    def get(self, rel_path: str) -> Tuple[bytes, str]:
+        row = self._conn().execute("SELECT daten, version FROM dateien WHERE pfad = ?", (rel_path,)).fetchone()
+        if row is None and self._durchlesen():
+            data, version = self.remote.get(rel_path)
+            self._ablegen(rel_path, data, version)
+            return data, version
+        if row is None or row[0] is None:
+            raise FileNotFoundError(rel_path)
+        return bytes(row[0]), row[1]
+
+    def get_many(self, rel_paths: Iterable[str], max_workers: int = 0
+                 ) -> Iterator[Tuple[str, Optional[Tuple[bytes, str]], Optional[Exception]]]:
+        # Lokal reicht eine Abfrage je 500 Pfade, Threads brächten hier nichts
+        rel_paths = list(dict.fromkeys(rel_paths))
+        fehlend = []
+        for i in range(0, len(rel_paths), 500):
+            teil = rel_paths[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT pfad, daten, version FROM dateien WHERE pfad IN ({','.join('?' * len(teil))})", teil)
+            gefunden = {p: (None if d is None else (bytes(d), v)) for p, d, v in rows}
+            for p in teil:
+                if gefunden.get(p) is not None:
+                    yield p, gefunden[p], None
+                elif p not in gefunden and self._durchlesen():
+                    fehlend.append(p)
+                else:
+                    yield p, None, FileNotFoundError(p)
+        if fehlend:
+            for p, result, err in self.remote.get_many(fehlend, max_workers=max_workers):
+                if result is not None:
+                    self._ablegen(p, *result)
+                yield p, result, err
+
+    def put_many(self, files: Dict[str, Optional[bytes]], message: str) -> Dict[str, str]:
+        jetzt = time.time()
+        with self._transaktion() as c:
+            for rel_path, data in files.items():
+                version = "" if data is None else git_blob_sha(data)
+                # Rückkehr zum Remote-Stand ist keine Änderung mehr (dirty = 0)
+                c.execute(
+                    "INSERT INTO dateien (pfad, daten, version, dirty, nachricht, geaendert) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(pfad) DO UPDATE SET "
+                    "daten = excluded.daten, version = excluded.version, nachricht = excluded.nachricht, fehler = NULL, "
+                    "dirty = (excluded.version != dateien.remote), geaendert = excluded.geaendert",
+                    (rel_path, data, version, int(version != ""), message, jetzt),
+                )
+        with self._wakeup:
+            self._wakeup.notify()
+        return {p: git_blob_sha(d) for p, d in files.items() if d is not None}
+
+    # ---------------------------------------------------------------- Status
+    def status(self) -> dict:
+        c = self._conn()
+        return {
+            "pending": c.execute("SELECT count(*) FROM dateien WHERE dirty = 1 AND fehler IS NULL").fetchone()[0],
+            "conflicts": c.execute("SELECT count(*) FROM konflikte").fetchone()[0],
+            "failed": dict(c.execute("SELECT pfad, fehler FROM dateien WHERE dirty = 1 AND fehler IS NOT NULL "
+                                     "ORDER BY pfad")),
+            "last_error": self._last_error,
+            "last_sync": self._last_sync,
+            "remote": None if self.remote is None else self.remote.name,
+        }
+
+    def konflikte(self, limit: int = 100) -> List[dict]:
+        """Zuletzt erkannte Konflikte (neueste zuerst); remote_daten ist der überschriebene Remote-Stand."""
+        rows = self._conn().execute(
+            "SELECT pfad, lokal_version, remote_version, remote_daten, zeit FROM konflikte "
+            "ORDER BY id DESC LIMIT ?", (limit,))
+        return [{"pfad": p, "lokal_version": lv, "remote_version": rv,
+                 "remote_daten": None if d is None else bytes(d), "zeit": t} for p, lv, rv, d, t in rows]
+
+    # ---------------------------------------------------------------- Sync
+    def sync(self) -> dict:
+        """Ein Sync-Durchlauf: Pull, dann Push. Netzfehler werden weitergereicht."""
+        with self._sync_lock, background_io():
+            geholt, konflikte = self._pull()
+            self._erster_pull.set()
+            hochgeladen = self._push()
+        self._last_sync = time.time()
+        self._last_error = None
+        return {"pulled": geholt, "conflicts": konflikte, "pushed": hochgeladen}
+
+    def _lokal(self, pfade: Optional[List[str]] = None) -> Dict[str, Tuple[str, str, str, int]]:
+        # pfad -> (version, basis, remote, dirty); ohne pfade die ganze Tabelle
+        sql = "SELECT pfad, version, basis, remote, dirty FROM dateien"
+        if pfade is None:
+            return {p: (v, b, r, d) for p, v, b, r, d in self._conn().execute(sql)}
+        lokal = {}
+        for i in range(0, len(pfade), 500):
+            teil = pfade[i:i + 500]
+            rows = self._conn().execute(f"{sql} WHERE pfad IN ({','.join('?' * len(teil))})", teil)
+            lokal.update({p: (v, b, r, d) for p, v, b, r, d in rows})
+        return lokal
+
+    def _pull(self) -> Tuple[int, int]:
+        head = self.remote.head()
+        alt = self._meta("remote_head")
+        if head is not None and head == alt:
+            return 0, 0
+        # Remote geändert, hinzugekommen oder gelöscht seit dem letzten Pull
+        diff = self.remote.aenderungen(alt, head) if alt and head else None
+        if diff is not None:
+            # nur die Pfade aus dem Compare, nicht die ganze Remote-Liste
+            remote_diff = {p: sha or "" for p, sha in diff}
+            lokal = self._lokal(list(remote_diff))
+            geaendert = {p: sha for p, sha in remote_diff.items()
+                         if (lokal[p][2] if p in lokal else "") != sha}
+        else:
+            remote = {e.pfad: e.sha for e in self.remote.list_entries()}  # die Remote-Liste, nicht die eigene
+            lokal = self._lokal()
+            geaendert = {p: sha for p, sha in remote.items() if p not in lokal or lokal[p][2] != sha}
+            geaendert.update({p: "" for p, row in lokal.items() if row[2] and p not in remote})
+        # Inhalte nur holen, wo sie gebraucht werden: nicht lokal geändert, oder Konflikt fürs Protokoll
+        holen = [p for p, sha in geaendert.items()
+                 if sha and not (p in lokal and lokal[p][3] and lokal[p][0] == sha)]
+        inhalte, fehler = {}, 0
+        for p, result, err in self.remote.get_many(holen):
+            if result is None:
+                fehler += 1
+            else:
+                inhalte[p] = result[0]
+
+        geholt = konflikte = 0
+        jetzt = time.time()
+        with self._transaktion() as c:
+            for p, sha in geaendert.items():
+                if sha and p not in inhalte and p in holen:
+                    continue  # Download fehlgeschlagen, nächster Pull versucht es erneut
+                row = c.execute("SELECT version, basis, dirty FROM dateien WHERE pfad = ?", (p,)).fetchone()
+                if row is None or not row[2]:
+                    if sha:
+                        c.execute("INSERT OR REPLACE INTO dateien (pfad, daten, version, basis, remote, dirty, "
+                                  "geaendert) VALUES (?, ?, ?, ?, ?, 0, ?)", (p, inhalte[p], sha, sha, sha, jetzt))
+                    else:
+                        c.execute("DELETE FROM dateien WHERE pfad = ?", (p,))
+                    geholt += 1
+                elif row[0] == sha:
+                    c.execute("UPDATE dateien SET basis = ?, remote = ?, dirty = 0, fehler = NULL WHERE pfad = ?",
+                              (sha, sha, p))
+                elif row[1] == sha:
+                    c.execute("UPDATE dateien SET remote = ? WHERE pfad = ?", (sha, p))
+                else:
+                    # beidseitig geändert: Remote-Stand protokollieren, lokaler Stand wird hochgeladen
+                    c.execute("INSERT INTO konflikte (pfad, lokal_version, remote_version, remote_daten, zeit) "
+                              "VALUES (?, ?, ?, ?, ?)", (p, row[0], sha, inhalte.get(p), jetzt))
+                    c.execute("UPDATE dateien SET basis = ?, remote = ? WHERE pfad = ?", (sha, sha, p))
+                    konflikte += 1
+            if head is not None and not fehler:
+                c.execute("INSERT OR REPLACE INTO meta VALUES ('remote_head', ?)", (head,))
+        return geholt, konflikte
+
+    def _push(self) -> int:
+        hochgeladen = 0
+        while True:
+            rows = self._conn().execute(
+                "SELECT pfad, daten, version, remote, nachricht FROM dateien WHERE dirty = 1 AND fehler IS NULL "
+                "ORDER BY geaendert LIMIT ?", (self.batch_size,)).fetchall()
+            if not rows:
+                return hochgeladen
+            # Löschen, was es remote nie gab, braucht keinen Commit
+            files = {p: (None if d is None else bytes(d)) for p, d, _, r, _ in rows if d is not None or r}
+            nachrichten = {p: n for p, _, _, _, n in rows if p in files}
+            fehler = self._hochladen(files, nachrichten) if files else {}
+            with self._transaktion() as c:
+                for p, _, version, _, _ in rows:
+                    if p in fehler:
+                        # nicht mehr auswählen, bis die Datei neu gespeichert wird (put_many löscht die Markierung)
+                        c.execute("UPDATE dateien SET fehler = ? WHERE pfad = ? AND version = ?", (fehler[p], p, version))
+                        continue
+                    if p not in files:
+                        # Löschung ohne Remote-Gegenstück: erledigt, wenn nicht inzwischen neu gespeichert
+                        c.execute("UPDATE dateien SET dirty = 0 WHERE pfad = ? AND version = ?", (p, version))
+                        continue
+                    # hochgeladen ist jetzt remote, auch wenn seit dem Lesen erneut lokal gespeichert wurde
+                    # (sonst hielte der nächste Pull den eigenen Commit für eine fremde Änderung);
+                    # dirty bleibt nur, wenn version inzwischen weiter ist
+                    c.execute("UPDATE dateien SET basis = ?, remote = ?, dirty = (version != ?) WHERE pfad = ?",
+                              (version, version, version, p))
+                c.execute("DELETE FROM dateien WHERE daten IS NULL AND dirty = 0")
+            hochgeladen += len(files) - len(fehler)
+
+    def _hochladen(self, files: Dict[str, Optional[bytes]], nachrichten: Dict[str, str]) -> Dict[str, str]:
+        """Lädt files in einem Commit hoch; gibt die dauerhaft abgelehnten Pfade mit Fehlertext zurück."""
+        texte = set(nachrichten.values())
+        message = texte.pop() if len(texte) == 1 else f"Sync (offline-first): {len(files)} Dateien"
+        try:
+            self.remote.put_many(files, message=message)
+            return {}
+        except (DauerhafterFehler, ValueError) as e:
+            if len(files) == 1:
+                return {p: str(e) for p in files}
+        # eine Datei verdirbt den Stapel: einzeln hochladen, um sie zu finden (wie save_queue)
+        fehler = {}
+        for p, data in files.items():
+            fehler.update(self._hochladen({p: data}, {p: nachrichten[p]}))
+        return fehler
+
+    # ---------------------------------------------------------------- Worker
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="kalorik-sqlite-sync", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                self.sync()
+                attempt = 0
+                warten = self.sync_interval
+            except Exception as e:
+                self._last_error = str(e)
+                # ohne Netz: mit Jitter wiederholen, höchstens 60 s Pause
+                warten = random.uniform(0, min(60.0, 0.5 * 2 ** attempt))
+                attempt += 1
+            with self._wakeup:
+                self._wakeup.wait(timeout=warten)
@@ -1,65 +1,40 @@
-import os
-import pandas as pd
-from fpdf import FPDF
 from datetime import datetime
-from constants import DATENORDNER
+from cache_utils import LRUCache
+from data_utils import auswertung_dateiname, lade_viele
+from namensraum_utils import ALTBESTAND, Namensraum, eintraege as namensraum_eintraege
+from pdf_utils import BerichtPDF, clean_text
 
-def clean_text(text):
-    replacements = {
-        "📊": "Messwerte:", "🧠": "Auswertung:", "📄": "PDF:",
-        "–": "-", "°": " Grad", "ü": "ue", "ö": "oe", "ä": "ae", "ß": "ss"
-    }
-    for emoji, replacement in replacements.items():
-        text = text.replace(emoji, replacement)
-    return text.encode("latin1", "ignore").decode("latin1")
+# Aufbereitete Abschnitte je (Datei, CSV-sha, Auswertungs-sha) und fertige PDFs je Gesamtstand
+_ABSCHNITTE = LRUCache(max_entries=4096)
+_SUMMARY_PDF = LRUCache(max_entries=4)
 
-class SummaryPDF(FPDF):
-    def header(self):
-        logo_path = os.path.join("HPG-Header-Logo_v2.png")
-        if os.path.exists(logo_path):
-            self.image(logo_path, x=160, y=10, w=40)
-        self.set_font("Arial", "B", 14)
-        self.cell(0, 10, "Zusammenfassung aller Gruppen - Wärmeübertragung", ln=True)
-        self.ln(10)
+class SummaryPDF(BerichtPDF):
+    titel = "Zusammenfassung aller Gruppen - Wärmeübertragung"
 
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Seite {self.page_no()}", align="C")
+def _abschnitt(file: str, df, auswertung: str) -> dict:
+    """Aufbereiteter (bereinigter) Abschnitt einer Gruppe/Station; {} wenn nichts abgegeben wurde."""
+    if df.empty and not auswertung.strip():
+        return {}
+    name = file.rsplit("/", 1)[-1]
+    gruppe = name.split("_")[0]
+    station = "_".join(name.split("_")[1:]).replace(".csv", "")
+    return {
+        "Gruppe": clean_text(gruppe),
+        "Station": clean_text(station),
+        "Auswertung": clean_text(auswertung)
+    }
 
-def create_summary_pdf():
+def _render(daten: list, ns: Namensraum = ALTBESTAND) -> bytes:
     pdf = SummaryPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
 
+    if ns.praefix:
+        pdf.cell(0, 10, clean_text(f"Klasse {ns.klasse}, Sitzung {ns.sitzung} ({ns.schuljahr})"), ln=True)
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
     pdf.cell(0, 10, clean_text(f"Erstellt am: {timestamp}"), ln=True)
     pdf.ln(5)
 
-    daten = []
-    for file in os.listdir(DATENORDNER):
-        if file.endswith(".csv"):
-            pfad = os.path.join(DATENORDNER, file)
-            try:
-                df = pd.read_csv(pfad)
-                if df.empty or "Auswertung" not in df.columns:
-                    continue
-                gruppe = file.split("_")[0]
-                station = "_".join(file.split("_")[1:]).replace(".csv", "")
-                auswertung = df["Auswertung"].iloc[0]
-                daten.append({
-                    "Gruppe": clean_text(gruppe),
-                    "Station": clean_text(station),
-                    "Auswertung": clean_text(auswertung)
-                })
-            except pd.errors.EmptyDataError:
-                continue
-            except Exception as e:
-                print(f"Fehler beim Lesen von {file}: {e}")
-                continue
-
-    daten.sort(key=lambda x: x["Station"])
-
     aktuelle_station = ""
     for eintrag in daten:
         if eintrag["Station"] != aktuelle_station:
@@ -68,7 +43,37 @@ def create_summary_pdf():
             pdf.cell(0, 10, clean_text(f"Station: {aktuelle_station}"), ln=True)
             pdf.set_font("Arial", size=11)
 
-        pdf.multi_cell(0, 8, clean_text(f"Gruppe: {eintrag['Gruppe']}\nAuswertung: {eintrag['Auswertung']}"))
+        pdf.textblock(f"Gruppe: {eintrag['Gruppe']}\nAuswertung: {eintrag['Auswertung']}", 8)
         pdf.ln(3)
 
     return pdf.output(dest='S').encode('latin1')
+
+def create_summary_pdf(ns: Namensraum = ALTBESTAND):
+    """
+    Zusammenfassung aller Gruppen einer Sitzung. Abschnitte sind pro (Datei, CSV-sha,
+    Auswertungs-sha) gecacht: geladen und aufbereitet werden nur neue oder geänderte Abgaben,
+    und bei unverändertem Gesamtstand kommt das fertige PDF direkt aus dem Cache.
+    """
+    eintraege = namensraum_eintraege(ns)
+    shas = {e.pfad: e.sha for e in eintraege}
+    schluessel = {
+        e.pfad: (e.pfad, e.sha, shas.get(auswertung_dateiname(e.pfad), ""))
+        for e in eintraege if e.art == "csv"
+    }
+
+    # Gleicher Lesepfad wie Schüler- und Lehrkraftmodus (CSV + _auswertung.txt), parallel geladen
+    fehlend = [file for file, key in schluessel.items() if key not in _ABSCHNITTE]
+    for file, df, auswertung, fehler in lade_viele(fehlend):
+        if fehler is not None and not auswertung:
+            print(f"Fehler beim Lesen von {file}: {fehler}")
+            continue
+        _ABSCHNITTE.put(schluessel[file], _abschnitt(file, df, auswertung))
+
+    verwendet = tuple(key for key in schluessel.values() if key in _ABSCHNITTE)
+    pdf = _SUMMARY_PDF.get((ns.praefix, verwendet))
+    if pdf is None:
+        daten = [a for a in (_ABSCHNITTE.get(key) for key in verwendet) if a]
+        daten.sort(key=lambda x: (x["Station"], x["Gruppe"]))
+        pdf = _render(daten, ns)
+        _SUMMARY_PDF.put((ns.praefix, verwendet), pdf)
+    return pdf